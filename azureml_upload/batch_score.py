@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+ROI Batch Scorer
+----------------
+Scores ROI scenarios from a JSONL file against the /score endpoint.
+
+Each input line is a scenario: either the form payload itself or
+{"id": ..., "payload": {...}}. Scenarios are streamed from the file and
+sent by a bounded pool of concurrent requests over keep-alive connections.
+Failed requests (connection errors, timeouts, 429 and 5xx answers) are
+retried with exponential backoff and full jitter.
+
+Results are appended to the output JSONL file as they complete, one line
+per scenario, which doubles as the checkpoint: a rerun skips the scenarios
+already scored successfully and retries the others.
+
+    python batch_score.py scenarios.jsonl -o results.jsonl --concurrency 16
+    python roi_cache_proxy.py mock --delay 0.5
+    python batch_score.py scenarios.jsonl -o results.jsonl --url http://127.0.0.1:8083/score
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+from datetime import datetime
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URL = "https://hackathon2025-beta-dgese.eastus2.inference.ml.azure.com/score"
+DEFAULT_DEPLOYMENT = "hackathon2025-beta-dgese-1"
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RETRIES = 5
+DEFAULT_TIMEOUT_SECONDS = 120
+
+# Backoff before retry n is uniform in [0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** n)] seconds
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 30.0
+
+# Statuses worth retrying; other errors are final
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Seconds between progress reports
+PROGRESS_INTERVAL_SECONDS = 10
+
+
+class RetryableError(Exception):
+    """A failed attempt that may succeed when retried."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def scenario_id(record, id_field='id'):
+    """Return the id of a scenario: its id field, or a hash of its payload."""
+    if record.get(id_field) is not None:
+        return str(record[id_field])
+    return hashlib.sha1(json.dumps(record, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def scenario_payload(record, id_field='id'):
+    """Return the payload sent for a scenario."""
+    if isinstance(record.get('payload'), dict):
+        return record['payload']
+    return {key: value for key, value in record.items() if key != id_field}
+
+
+def load_checkpoint(output_path):
+    """
+    Return the ids of the scenarios already scored successfully.
+
+    A truncated last line (the run was killed while writing it) is ignored.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if result.get('status') == 'ok':
+                done.add(result['id'])
+    return done
+
+
+def percentile(values, fraction):
+    """Return the given percentile of a sorted list of numbers."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Seconds to wait before the given retry (1-based), honouring a Retry-After header."""
+    delay = random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, BACKOFF_CAP_SECONDS))
+    return delay
+
+
+class BatchScorer:
+    """Sends scenarios to the scoring endpoint with bounded concurrency and retries."""
+
+    def __init__(self, url=DEFAULT_URL, api_key=None, deployment=DEFAULT_DEPLOYMENT,
+                 concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT_SECONDS):
+        self.url = url
+        self.concurrency = concurrency
+        self.retries = retries
+        self.timeout = timeout
+        self.headers = {'Content-Type': 'application/json'}
+        if api_key:
+            self.headers['Authorization'] = f"Bearer {api_key}"
+        if deployment:
+            self.headers['azureml-model-deployment'] = deployment
+
+        self.latencies = []
+        self.stats = {'scored': 0, 'failed': 0, 'skipped': 0, 'retries': 0}
+
+    async def score_one(self, session, payload):
+        """
+        Score one payload, retrying transient failures.
+
+        Returns:
+            tuple: (response JSON or None, error message or None, attempts, latency of the last attempt in ms)
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            start = time.perf_counter()
+            try:
+                async with session.post(self.url, json=payload, headers=self.headers) as response:
+                    body = await response.text()
+                    latency = (time.perf_counter() - start) * 1000
+                    if response.status == 200:
+                        return json.loads(body), None, attempt, latency
+                    message = f"HTTP {response.status}: {body[:500]}"
+                    if response.status not in RETRY_STATUSES:
+                        return None, message, attempt, latency
+                    retry_after = response.headers.get('Retry-After')
+                    raise RetryableError(message, float(retry_after) if retry_after and retry_after.isdigit() else None)
+            except json.JSONDecodeError as e:
+                return None, f"Invalid JSON response: {str(e)}", attempt, (time.perf_counter() - start) * 1000
+            except (RetryableError, ClientError, asyncio.TimeoutError) as e:
+                message = str(e) or type(e).__name__
+                if attempt > self.retries:
+                    return None, message, attempt, (time.perf_counter() - start) * 1000
+                self.stats['retries'] += 1
+                delay = backoff_delay(attempt, getattr(e, 'retry_after', None))
+                logger.debug(f"Attempt {attempt} failed ({message}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def run(self, input_path, output_path, id_field='id', limit=None):
+        """
+        Score every scenario of the input file that is not yet in the output file.
+
+        Args:
+            input_path (str): JSONL file of scenarios
+            output_path (str): JSONL file results are appended to
+            id_field (str): Field identifying a scenario
+            limit (int, optional): Maximum number of scenarios to score in this run
+
+        Returns:
+            dict: Run statistics
+        """
+        done = load_checkpoint(output_path)
+        if done:
+            logger.info(f"Skipping {len(done)} scenarios already scored in {output_path}")
+
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        start_time = time.perf_counter()
+        connector = TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+
+        with open(output_path, 'a', encoding='utf-8') as output:
+            async def worker(session):
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        return
+                    sid, payload = item
+                    response, error, attempts, latency = await self.score_one(session, payload)
+                    result = {'id': sid, 'status': 'ok' if error is None else 'error', 'attempts': attempts,
+                              'latency_ms': round(latency, 1),
+                              'scored_at': datetime.now().isoformat(timespec='seconds')}
+                    if error is None:
+                        result['response'] = response
+                        self.stats['scored'] += 1
+                        self.latencies.append(latency)
+                    else:
+                        result['error'] = error
+                        self.stats['failed'] += 1
+                        logger.warning(f"Scenario {sid} failed after {attempts} attempt(s): {error}")
+                    # One complete line per result, flushed, so a killed run loses at most the lines in flight
+                    output.write(json.dumps(result, ensure_ascii=False) + '\n')
+                    output.flush()
+
+            async def report_progress():
+                while True:
+                    await asyncio.sleep(PROGRESS_INTERVAL_SECONDS)
+                    self._log_progress(time.perf_counter() - start_time)
+
+            async with ClientSession(connector=connector, timeout=ClientTimeout(total=self.timeout)) as session:
+                workers = [asyncio.create_task(worker(session)) for _ in range(self.concurrency)]
+                progress = asyncio.create_task(report_progress())
+                try:
+                    queued = 0
+                    with open(input_path, 'r', encoding='utf-8') as f:
+                        for line_number, line in enumerate(f, 1):
+                            if not line.strip():
+                                continue
+                            try:
+                                record = json.loads(line)
+                            except json.JSONDecodeError as e:
+                                logger.error(f"Skipping line {line_number} of {input_path}: {str(e)}")
+                                continue
+                            if not isinstance(record, dict):
+                                logger.error(f"Skipping line {line_number} of {input_path}: "
+                                             f"expected a JSON object, got {type(record).__name__}")
+                                continue
+                            sid = scenario_id(record, id_field)
+                            if sid in done:
+                                self.stats['skipped'] += 1
+                                continue
+                            done.add(sid)
+                            await queue.put((sid, scenario_payload(record, id_field)))
+                            queued += 1
+                            if limit and queued >= limit:
+                                break
+                    for _ in workers:
+                        await queue.put(None)
+                    await asyncio.gather(*workers)
+                finally:
+                    progress.cancel()
+                    for task in workers:
+                        task.cancel()
+
+        elapsed = time.perf_counter() - start_time
+        return self.summary(elapsed)
+
+    def _log_progress(self, elapsed):
+        completed = self.stats['scored'] + self.stats['failed']
+        logger.info(f"{completed} scenarios done ({self.stats['failed']} failed, {self.stats['retries']} retries), "
+                    f"{completed / elapsed if elapsed > 0 else 0:.2f}/s")
+
+    def summary(self, elapsed):
+        """Return the statistics of the run."""
+        latencies = sorted(self.latencies)
+        completed = self.stats['scored'] + self.stats['failed']
+        return dict(self.stats,
+                    seconds=round(elapsed, 3),
+                    throughput=round(completed / elapsed, 3) if elapsed > 0 else 0.0,
+                    latency_ms={name: round(percentile(latencies, fraction), 1) if latencies else None
+                                for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))})
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description='Score ROI scenarios from a JSONL file.')
+    parser.add_argument('input', help='JSONL file of scenarios (payloads, or {"id": ..., "payload": {...}})')
+    parser.add_argument('-o', '--output', default='roi_results.jsonl',
+                        help='JSONL file results are appended to; also the checkpoint (default: roi_results.jsonl)')
+    parser.add_argument('--url', default=os.getenv('ROI_SCORE_URL', DEFAULT_URL),
+                        help='Scoring endpoint (default: ROI_SCORE_URL or the Azure ML deployment)')
+    parser.add_argument('--deployment', default=os.getenv('ROI_DEPLOYMENT', DEFAULT_DEPLOYMENT),
+                        help='Value of the azureml-model-deployment header')
+    parser.add_argument('-c', '--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Requests in flight at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help=f'Retries of a failed request (default: {DEFAULT_RETRIES})')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT_SECONDS,
+                        help=f'Timeout of one request in seconds (default: {DEFAULT_TIMEOUT_SECONDS})')
+    parser.add_argument('--id-field', default='id',
+                        help='Field identifying a scenario (default: id; scenarios without it are identified by a hash)')
+    parser.add_argument('-l', '--limit', type=int, default=None,
+                        help='Maximum number of scenarios to score in this run')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log every retry')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    try:
+        if not os.path.exists(args.input):
+            raise FileNotFoundError(f"Input file {args.input} not found")
+        scorer = BatchScorer(args.url, os.getenv('AZURE_API_KEY'), args.deployment,
+                             args.concurrency, args.retries, args.timeout)
+        stats = asyncio.run(scorer.run(args.input, args.output, args.id_field, args.limit))
+        latency = stats['latency_ms']
+        logger.info(f"Scored {stats['scored']} scenarios ({stats['failed']} failed, {stats['skipped']} skipped, "
+                    f"{stats['retries']} retries) in {stats['seconds']:.1f}s, {stats['throughput']:.2f} scenarios/s")
+        logger.info(f"Latency ms: p50 {latency['p50']}, p90 {latency['p90']}, p99 {latency['p99']}, max {latency['max']}")
+        if stats['failed']:
+            sys.exit(2)
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
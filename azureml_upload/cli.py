@@ -1,19 +1,18 @@
 #!/usr/bin/env python3
 """
 Command-line interface for the McKinsey search scraper.
+
+Subcommands are registered lazily: each handler imports its own dependencies
+when it runs, so the export commands never load Selenium or the scraper.
 """
 
-import mckinsey_scraper
 import logging
 import argparse
+import os
+import re
+import subprocess
 import sys
-from datetime import datetime
 import time
-from database_utils import export_to_csv, export_content_to_csv
-from article_scraper import scrape_article_content, scrape_multiple_articles
-from mckinsey_scraper import create_webdriver  # Assuming this function exists
-import csv
-from mckinsey_scraper import get_session, Article
 
 # Set up logging
 logging.basicConfig(
@@ -23,100 +22,89 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def create_parser():
-    parser = argparse.ArgumentParser(description='McKinsey Article Scraper')
-    
-    subparsers = parser.add_subparsers(dest='command', help='Command to run')
-    
-    # Scrape command
-    scrape_parser = subparsers.add_parser('scrape', help='Scrape McKinsey search results')
-    scrape_parser.add_argument('-q', '--query', required=True, help='Search query')
-    scrape_parser.add_argument('--full', action='store_true', help='Scrape all pages (not just the first)')
-    scrape_parser.add_argument('--pages', type=int, default=5, help='Maximum number of pages to scrape (default: 5)')
-    scrape_parser.add_argument('--parallel', action='store_true', help='Use parallel scraping')
-    scrape_parser.add_argument('--workers', type=int, default=3, help='Number of parallel workers (default: 3)')
-    
-    # Process command
-    process_parser = subparsers.add_parser('process', help='Process articles')
-    process_parser.add_argument('--count', type=int, default=10, help='Number of articles to process')
-    
-    # Add export command
-    export_parser = subparsers.add_parser('export', help='Export search results to CSV')
-    export_parser.add_argument('--filename', default='mckinsey_articles.csv',
-                              help='Output CSV filename (default: mckinsey_articles.csv)')
-    
-    # Add export-content command
-    export_content_parser = subparsers.add_parser('export-content', help='Export article content to CSV')
-    export_content_parser.add_argument('--filename', default='articles_content.csv',
-                                      help='Output CSV filename (default: articles_content.csv)')
-    
-    # Add scrape-content command
-    scrape_content_parser = subparsers.add_parser('scrape-content', 
-                                               help='Scrape full content of articles')
-    scrape_content_parser.add_argument('--limit', type=int, default=5,
-                                    help='Maximum number of articles to scrape (0 for unlimited)')
-    
-    # Export command
-    export_parser = subparsers.add_parser('export', help='Export articles to CSV')
-    export_parser.add_argument('--output', '-o', default='mckinsey_articles.csv', 
-                              help='Output CSV file path (default: mckinsey_articles.csv)')
-    export_parser.add_argument('--limit', type=int, default=0, 
-                              help='Limit number of articles to export (0 for all)')
-    
-    return parser
+def add_scrape_arguments(parser):
+    parser.add_argument('-q', '--query', required=True, help='Search query')
+    parser.add_argument('--full', action='store_true', help='Scrape all pages (not just the first)')
+    parser.add_argument('--pages', type=int, default=5, help='Maximum number of pages to scrape (default: 5)')
+    parser.add_argument('--parallel', action='store_true', help='Use parallel scraping')
+    parser.add_argument('--workers', type=int, default=3, help='Number of parallel workers (default: 3)')
 
-def main():
-    parser = create_parser()
-    args = parser.parse_args()
-    
-    if args.command is None:
-        parser.print_help()
-        return
-        
-    elif args.command == 'scrape':
-        test_mode = not args.full
-        
-        # Start timing the operation
-        start_time = time.time()
-        
-        # Use parallel scraping
-        logger.info(f"Starting scraping for query: {args.query}")
-        article_count = mckinsey_scraper.scrape_mckinsey_search_parallel(
-            args.query, 
-            test_mode=test_mode, 
-            max_pages=args.pages,
-            max_workers=args.workers
-        )
-        
-        # Calculate elapsed time
-        elapsed_time = time.time() - start_time
-        logger.info(f"Scraping completed in {elapsed_time:.2f} seconds. Stored {article_count} articles.")
-        
-    elif args.command == 'process':
-        # This will need to be implemented with appropriate module functions
-        logger.info(f"Processing up to {args.count} articles")
-        # Process articles code here
-        
-    elif args.command == 'export':
-        logger.info(f"Exporting articles to CSV: {args.output}")
-        
-        # Get articles from database
-        with get_session() as session:
-            query = session.query(Article)
-            
-            if args.limit > 0:
-                query = query.limit(args.limit)
-                
-            articles = query.all()
-        
-        # Write to CSV
+def add_process_arguments(parser):
+    parser.add_argument('--count', type=int, default=10, help='Number of articles to process')
+
+def add_export_arguments(parser):
+    parser.add_argument('--output', '-o', '--filename', dest='output', default='mckinsey_articles.csv',
+                        help='Output CSV file path (default: mckinsey_articles.csv)')
+    parser.add_argument('--limit', type=int, default=0,
+                        help='Limit number of articles to export (0 for all)')
+
+def add_export_content_arguments(parser):
+    parser.add_argument('--filename', default='articles_content.csv',
+                        help='Output CSV filename (default: articles_content.csv)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only export contents added since the last export, to a new part file')
+
+def add_compact_export_arguments(parser):
+    parser.add_argument('--filename', default='articles_content.csv',
+                        help='CSV file whose incremental part files should be merged (default: articles_content.csv)')
+    parser.add_argument('--key', default=None,
+                        help='Header of the column identifying a row (default: the first column)')
+
+def add_scrape_content_arguments(parser):
+    parser.add_argument('--limit', type=int, default=5,
+                        help='Maximum number of articles to scrape (0 for unlimited)')
+
+def add_backfill_dates_arguments(parser):
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='Articles updated per batch (default: 500)')
+
+def run_scrape(args):
+    import mckinsey_scraper
+
+    test_mode = not args.full
+
+    # Start timing the operation
+    start_time = time.time()
+
+    # Use parallel scraping
+    logger.info(f"Starting scraping for query: {args.query}")
+    article_count = mckinsey_scraper.scrape_mckinsey_search_parallel(
+        args.query,
+        test_mode=test_mode,
+        max_pages=args.pages,
+        max_workers=args.workers
+    )
+
+    # Calculate elapsed time
+    elapsed_time = time.time() - start_time
+    logger.info(f"Scraping completed in {elapsed_time:.2f} seconds. Stored {article_count} articles.")
+
+def run_process(args):
+    # This will need to be implemented with appropriate module functions
+    logger.info(f"Processing up to {args.count} articles")
+    # Process articles code here
+
+def run_export(args):
+    import csv
+    from database_utils import get_session, Article
+
+    logger.info(f"Exporting articles to CSV: {args.output}")
+
+    # Get articles from database and write them while the session is open
+    with get_session() as session:
+        query = session.query(Article)
+
+        if args.limit > 0:
+            query = query.limit(args.limit)
+
+        count = 0
         with open(args.output, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['id', 'title', 'url', 'description', 'date_published', 
+            fieldnames = ['id', 'title', 'url', 'description', 'date_published',
                          'article_type', 'content', 'scraped_at']
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
+
             writer.writeheader()
-            for article in articles:
+            for article in query:
                 writer.writerow({
                     'id': article.id,
                     'title': article.title,
@@ -124,58 +112,181 @@ def main():
                     'description': article.description,
                     'date_published': article.date_published,
                     'article_type': article.article_type,
-                    'content': article.content,
+                    'content': article.content.full_content if article.content else '',
                     'scraped_at': article.scraped_at
                 })
-        
-        logger.info(f"Exported {len(articles)} articles to {args.output}")
-    
-    elif args.command == 'export-content':
-        logger.info(f"Exporting article content to CSV: {args.filename}")
-        try:
-            from database_utils import export_content_to_csv
-            result = export_content_to_csv(args.filename)
-            
-            # Check if result is boolean or numeric
-            if isinstance(result, bool):
-                if result:
-                    logger.info(f"Successfully exported articles to {args.filename}")
-                else:
-                    logger.warning(f"No articles were exported to {args.filename}")
+                count += 1
+
+    logger.info(f"Exported {count} articles to {args.output}")
+
+def run_export_content(args):
+    logger.info(f"Exporting article content to CSV: {args.filename}")
+    try:
+        from database_utils import export_content_to_csv
+        result = export_content_to_csv(args.filename, incremental=args.incremental)
+
+        # Check if result is boolean or numeric
+        if isinstance(result, bool):
+            if result:
+                logger.info(f"Successfully exported articles to {args.filename}")
             else:
-                # Result is a count
-                logger.info(f"Successfully exported {result} articles to {args.filename}")
-        except Exception as e:
-            logger.error(f"Error exporting content to CSV: {e}")
-    
-    elif args.command == 'scrape-content':
-        logger.info(f"Scraping content for up to {args.limit} articles")
-        driver = None
-        try:
-            # Create a WebDriver instance
-            logger.info("Creating WebDriver for article content scraping")
-            driver = create_webdriver()
-            if not driver:
-                logger.error("Failed to create WebDriver")
-                return
-            
-            # Scrape article content
-            limit = args.limit if args.limit > 0 else None
-            
-            # Use the multiple article scraper instead of the single article one
-            count = scrape_multiple_articles(driver, limit)
-            
-            logger.info(f"Successfully scraped content for {count} articles")
-        except Exception as e:
-            logger.error(f"Error scraping article content: {e}")
-        finally:
-            # Clean up resources
-            if driver:
-                try:
-                    driver.quit()
-                    logger.info("WebDriver closed")
-                except Exception as e:
-                    logger.warning(f"Error closing WebDriver: {e}")
+                logger.warning(f"No articles were exported to {args.filename}")
+        else:
+            # Result is a count
+            logger.info(f"Successfully exported {result} articles to {args.filename}")
+    except Exception as e:
+        logger.error(f"Error exporting content to CSV: {e}")
+
+def run_compact_export(args):
+    from database_utils import compact_csv_export
+
+    logger.info(f"Compacting incremental exports of {args.filename}")
+    count = compact_csv_export(args.filename, key_column=args.key)
+    if count < 0:
+        logger.error(f"Failed to compact {args.filename}")
+
+def run_scrape_content(args):
+    from mckinsey_scraper import create_webdriver
+    from article_scraper import scrape_multiple_articles
+
+    logger.info(f"Scraping content for up to {args.limit} articles")
+    driver = None
+    try:
+        # Create a WebDriver instance
+        logger.info("Creating WebDriver for article content scraping")
+        driver = create_webdriver()
+        if not driver:
+            logger.error("Failed to create WebDriver")
+            return
+
+        # Scrape article content
+        limit = args.limit if args.limit > 0 else None
+
+        # Use the multiple article scraper instead of the single article one
+        count = scrape_multiple_articles(driver, limit)
+
+        logger.info(f"Successfully scraped content for {count} articles")
+    except Exception as e:
+        logger.error(f"Error scraping article content: {e}")
+    finally:
+        # Clean up resources
+        if driver:
+            try:
+                driver.quit()
+                logger.info("WebDriver closed")
+            except Exception as e:
+                logger.warning(f"Error closing WebDriver: {e}")
+
+def run_backfill_dates(args):
+    from database_utils import backfill_published_on
+
+    logger.info("Parsing publication dates of articles stored without published_on")
+    result = backfill_published_on(batch_size=args.batch_size)
+    logger.info(f"Parsed {result['parsed']} of {result['scanned']} articles")
+
+# Subcommand registry: name -> (help, argument builder, handler, modules the handler imports)
+COMMANDS = {
+    'scrape': ('Scrape McKinsey search results', add_scrape_arguments, run_scrape,
+               ['mckinsey_scraper']),
+    'process': ('Process articles', add_process_arguments, run_process, []),
+    'export': ('Export articles to CSV', add_export_arguments, run_export,
+               ['csv', 'database_utils']),
+    'export-content': ('Export article content to CSV', add_export_content_arguments, run_export_content,
+                       ['database_utils']),
+    'compact-export': ('Merge the part files of incremental exports', add_compact_export_arguments,
+                       run_compact_export, ['database_utils']),
+    'scrape-content': ('Scrape full content of articles', add_scrape_content_arguments, run_scrape_content,
+                       ['mckinsey_scraper', 'article_scraper']),
+    'backfill-dates': ('Parse article dates into the indexed published_on column', add_backfill_dates_arguments,
+                       run_backfill_dates, ['database_utils']),
+}
+
+def create_parser():
+    parser = argparse.ArgumentParser(description='McKinsey Article Scraper')
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='Report import times for the selected command instead of running it')
+
+    subparsers = parser.add_subparsers(dest='command', help='Command to run')
+
+    for name, (help_text, add_arguments, handler, modules) in COMMANDS.items():
+        command_parser = subparsers.add_parser(name, help=help_text)
+        add_arguments(command_parser)
+        command_parser.set_defaults(handler=handler)
+
+    return parser
+
+def parse_importtime(stderr_text):
+    """
+    Parse the output of ``python -X importtime``.
+
+    Args:
+        stderr_text (str): Captured stderr of the profiled interpreter
+
+    Returns:
+        list: (module, self_us, cumulative_us, depth) tuples in import order
+    """
+    pattern = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+    entries = []
+    for line in stderr_text.splitlines():
+        match = pattern.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            depth = max(0, (len(indent) - 1) // 2)
+            entries.append((module, int(self_us), int(cumulative_us), depth))
+    return entries
+
+def profile_startup(command, top=15):
+    """
+    Import the CLI and one command's dependencies in a fresh interpreter
+    under ``-X importtime`` and print a summary.
+
+    Args:
+        command (str): Subcommand name, or None for the bare CLI
+        top (int): Number of slowest top-level imports to list
+
+    Returns:
+        int: Total cumulative import time in microseconds
+    """
+    modules = COMMANDS[command][3] if command else []
+    statements = ['import cli'] + [f'import {module}' for module in modules]
+    cli_dir = os.path.dirname(os.path.abspath(__file__))
+
+    start_time = time.time()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', '; '.join(statements)],
+        cwd=cli_dir, capture_output=True, text=True
+    )
+    elapsed_time = time.time() - start_time
+
+    entries = parse_importtime(result.stderr)
+    top_level = [entry for entry in entries if entry[3] == 0]
+    total_us = sum(entry[2] for entry in top_level)
+
+    print(f"Startup profile for '{command or 'cli'}' ({len(entries)} modules imported)")
+    print(f"  Total import time: {total_us / 1000:.1f} ms (interpreter wall time {elapsed_time * 1000:.1f} ms)")
+    print("  Slowest top-level imports:")
+    for module, self_us, cumulative_us, depth in sorted(top_level, key=lambda e: e[2], reverse=True)[:top]:
+        print(f"    {cumulative_us / 1000:9.1f} ms  {module}")
+
+    if result.returncode != 0:
+        error_lines = result.stderr.strip().splitlines()
+        logger.warning(f"Import of command dependencies failed: {error_lines[-1] if error_lines else 'unknown error'}")
+
+    return total_us
+
+def main():
+    parser = create_parser()
+    args = parser.parse_args()
+
+    if args.startup_profile:
+        profile_startup(args.command)
+        return
+
+    if args.command is None:
+        parser.print_help()
+        return
+
+    args.handler(args)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
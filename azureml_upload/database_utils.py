@@ -8,18 +8,61 @@ import json
 import sqlite3
 import logging
 import csv
-from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, ForeignKey, inspect
+import os
+import sys
+import threading
+import time
+from datetime import datetime, date
+from sqlalchemy import create_engine, event, Column, Integer, String, Text, DateTime, Date, Boolean, ForeignKey, inspect, or_, and_, text, tuple_
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker, scoped_session, relationship
 from contextlib import contextmanager
 
+# Date parsing and export part files are shared with scraperv2 through the scraper_common package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from scraper_common.metadata_extraction import parse_date
+from scraper_common.export_state import clear_parts, compact_csv_parts, next_part_path
+
 logger = logging.getLogger(__name__)
 
 # Define a single database file
 DB_FILE = 'mckinsey_data.db'
+DATABASE_URL = f'sqlite:///{DB_FILE}'
 Base = declarative_base()
 
+# Connection pool settings shared by every engine in the registry
+POOL_SETTINGS = {
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_timeout': 30,
+    'pool_recycle': 1800,
+    'pool_pre_ping': True,
+}
+
+# QueuePool sizing, not accepted by the SingletonThreadPool of in-memory SQLite
+QUEUE_POOL_SETTINGS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+# PRAGMAs applied to every new SQLite connection
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,  # 256 MB
+    'cache_size': -65536,    # 64 MB (negative values are KiB)
+    'busy_timeout': 5000,    # milliseconds
+    'temp_store': 'MEMORY',
+}
+
+# Process-wide engine registry keyed by database URL
+_engines = {}
+_session_factories = {}
+_initialized_schemas = set()
+_pool_stats = {}
+_registry_lock = threading.RLock()
+_session_state = threading.local()
+
 # Define models
 class Article(Base):
     __tablename__ = 'articles'
@@ -29,6 +72,8 @@ class Article(Base):
     url = Column(String(500), unique=True)
     description = Column(Text, nullable=True)
     date_published = Column(String(100), nullable=True)
+    published_on = Column(Date, nullable=True, index=True,
+                          info={'parsed_from': 'date_published'})  # Parsed from date_published
     article_type = Column(String(100), nullable=True)
     scraped_at = Column(DateTime, default=datetime.now)
     
@@ -58,6 +103,263 @@ class ArticleContent(Base):
     def __repr__(self):
         return f"<ArticleContent(id={self.id}, article_id={self.article_id})>"
 
+class ExportWatermark(Base):
+    __tablename__ = 'export_watermarks'
+    
+    target = Column(String(500), primary_key=True)  # Absolute path of the export file
+    source = Column(String(100))  # Table the export reads from
+    last_scraped_at = Column(DateTime, nullable=True)
+    last_id = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, default=datetime.now)
+    
+    def __repr__(self):
+        return f"<ExportWatermark(target='{self.target}', last_scraped_at={self.last_scraped_at}, last_id={self.last_id})>"
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune a freshly opened SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def _track_pool_events(engine, stats):
+    """Attach pool listeners that keep connection and checkout counters."""
+    lock = threading.Lock()
+
+    def on_connect(dbapi_connection, connection_record):
+        with lock:
+            stats['connections_opened'] += 1
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checkout_time'] = time.perf_counter()
+        with lock:
+            stats['checkouts'] += 1
+            stats['checked_out'] += 1
+            stats['peak_checked_out'] = max(stats['peak_checked_out'], stats['checked_out'])
+
+    def on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop('checkout_time', None)
+        with lock:
+            stats['checkins'] += 1
+            stats['checked_out'] = max(0, stats['checked_out'] - 1)
+            if started is not None:
+                stats['total_checkout_seconds'] += time.perf_counter() - started
+
+    event.listen(engine, 'connect', on_connect)
+    event.listen(engine, 'checkout', on_checkout)
+    event.listen(engine, 'checkin', on_checkin)
+
+def _is_memory_url(url):
+    """Return True for in-memory SQLite URLs (sqlite://, sqlite:///:memory:, ?mode=memory)."""
+    parsed = make_url(url)
+    return parsed.database in (None, '', ':memory:') or parsed.query.get('mode') == 'memory'
+
+def get_engine(url=None, metadata=None):
+    """
+    Get the shared engine for a database URL, creating it on first use.
+    
+    Engines are cached for the lifetime of the process, so the connection pool
+    is reused by every session. The schema for ``metadata`` is created once per
+    engine the first time it is requested.
+    
+    Args:
+        url (str, optional): Database URL (default: the local SQLite file)
+        metadata (MetaData, optional): Metadata whose tables should exist
+        
+    Returns:
+        sqlalchemy.engine.Engine: Database engine
+    """
+    url = url or DATABASE_URL
+    with _registry_lock:
+        engine = _engines.get(url)
+        if engine is None:
+            is_sqlite = url.startswith('sqlite')
+            kwargs = dict(POOL_SETTINGS)
+            if is_sqlite and _is_memory_url(url):
+                for name in QUEUE_POOL_SETTINGS:
+                    del kwargs[name]
+            if is_sqlite:
+                kwargs['connect_args'] = {'check_same_thread': False}
+            engine = create_engine(url, **kwargs)
+            if is_sqlite:
+                event.listen(engine, 'connect', _apply_sqlite_pragmas)
+            stats = {
+                'connections_opened': 0,
+                'checkouts': 0,
+                'checkins': 0,
+                'checked_out': 0,
+                'peak_checked_out': 0,
+                'total_checkout_seconds': 0.0,
+            }
+            _track_pool_events(engine, stats)
+            _engines[url] = engine
+            _pool_stats[url] = stats
+            logger.info(f"Created database engine for {engine.url!r}")
+        
+        if metadata is not None and (url, id(metadata)) not in _initialized_schemas:
+            metadata.create_all(engine)
+            _add_missing_columns(engine, metadata)
+            _initialized_schemas.add((url, id(metadata)))
+            logger.info(f"Database schema initialized for {engine.url!r}")
+        
+        return engine
+
+def _add_missing_columns(engine, metadata):
+    """
+    Add model columns (and their indexes) that are missing from existing tables.
+    
+    create_all() only creates missing tables, so tables created before a
+    nullable column was added to a model would otherwise never get it.
+    Date columns parsed from another column (info={'parsed_from': ...}) are
+    filled for the existing rows, so queries on them see every row.
+    
+    Columns are only added automatically on SQLite. Other databases (e.g.
+    Azure SQL, whose ALTER TABLE has no ADD COLUMN) are left unchanged and
+    the missing columns are logged, to be added by a migration.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    is_sqlite = engine.dialect.name == 'sqlite'
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            missing_columns = set()
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable:
+                    continue
+                if not is_sqlite:
+                    missing_columns.add(column.name)
+                    logger.warning(f"Column {table.name}.{column.name} is missing; "
+                                   f"add it with a migration to use it on {engine.dialect.name}")
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                logger.info(f"Added column {table.name}.{column.name}")
+                source = column.info.get('parsed_from')
+                if source is not None:
+                    filled = _fill_parsed_dates(connection, table, column, table.columns[source])
+                    logger.info(f"Parsed {filled} dates into {table.name}.{column.name}")
+            for index in table.indexes:
+                if not missing_columns.intersection(column.name for column in index.columns):
+                    index.create(connection, checkfirst=True)
+
+def _fill_parsed_dates(connection, table, column, source, batch_size=500):
+    """
+    Fill an empty date column by parsing the dates of another column.
+    
+    Args:
+        connection: Connection inside the migration transaction
+        table (Table): Table to update
+        column (Column): Date column to fill
+        source (Column): Column holding the raw date text
+        batch_size (int): Rows read per batch
+        
+    Returns:
+        int: Number of rows with a parsed date
+    """
+    key = list(table.primary_key.columns)[0]
+    filled = 0
+    last_key = None
+    while True:
+        query = table.select().with_only_columns(key, source).where(
+            column.is_(None), source.isnot(None)
+        ).order_by(key).limit(batch_size)
+        if last_key is not None:
+            query = query.where(key > last_key)
+        rows = connection.execute(query).fetchall()
+        if not rows:
+            break
+        for row_key, value in rows:
+            parsed = to_date(value)
+            if parsed is not None:
+                connection.execute(table.update().where(key == row_key).values({column.name: parsed}))
+                filled += 1
+        last_key = rows[-1][0]
+    return filled
+
+def to_date(value):
+    """
+    Convert a publication date to a date object.
+    
+    Args:
+        value: date, datetime, ISO string or scraped date text ("March 12, 2024")
+        
+    Returns:
+        date: Parsed date, or None if the value is empty or not a recognizable date
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    parsed = parse_date(str(value))
+    return date.fromisoformat(parsed) if parsed else None
+
+def get_session_factory(url=None, metadata=None):
+    """
+    Get the thread-local session registry for a database URL.
+    
+    Args:
+        url (str, optional): Database URL (default: the local SQLite file)
+        metadata (MetaData, optional): Metadata whose tables should exist
+        
+    Returns:
+        scoped_session: Thread-local session registry
+    """
+    url = url or DATABASE_URL
+    engine = get_engine(url, metadata)
+    with _registry_lock:
+        factory = _session_factories.get(url)
+        if factory is None:
+            factory = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
+            _session_factories[url] = factory
+        return factory
+
+def get_pool_stats(url=None):
+    """
+    Get connection pool and checkout statistics for an engine.
+    
+    Args:
+        url (str, optional): Database URL (default: the local SQLite file)
+        
+    Returns:
+        dict: Pool statistics, or an empty dict if the engine was never created
+    """
+    url = url or DATABASE_URL
+    with _registry_lock:
+        engine = _engines.get(url)
+        if engine is None:
+            return {}
+        stats = dict(_pool_stats[url])
+    
+    pool = engine.pool
+    stats['pool_class'] = type(pool).__name__
+    stats['pool_status'] = pool.status()
+    for attr in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, attr, None)
+        if callable(method):
+            stats[f'pool_{attr}'] = method()
+    if stats['checkins']:
+        stats['avg_checkout_ms'] = stats['total_checkout_seconds'] * 1000 / stats['checkins']
+    return stats
+
+def dispose_engines():
+    """Close all pooled connections and clear the engine registry."""
+    with _registry_lock:
+        for factory in _session_factories.values():
+            factory.remove()
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _session_factories.clear()
+        _initialized_schemas.clear()
+        _pool_stats.clear()
+
 def create_database():
     """
     Create the database and tables if they don't exist.
@@ -66,9 +368,7 @@ def create_database():
         sqlalchemy.engine.Engine: Database engine
     """
     try:
-        engine = create_engine(f'sqlite:///{DB_FILE}')
-        # Create all tables defined by the Base metadata
-        Base.metadata.create_all(engine)
+        engine = get_engine(DATABASE_URL, Base.metadata)
         logger.info(f"Database initialized in {DB_FILE}")
         return engine
     except Exception as e:
@@ -76,16 +376,27 @@ def create_database():
         return None
 
 @contextmanager
-def get_session():
+def session_scope(url=None, metadata=None):
     """
-    Get a database session.
+    Provide a transactional scope around the calling thread's session.
     
+    Nested scopes in the same thread share one session; the session is only
+    released back to the registry when the outermost scope exits.
+    
+    Args:
+        url (str, optional): Database URL (default: the local SQLite file)
+        metadata (MetaData, optional): Metadata whose tables should exist
+        
     Yields:
         Session: Database session
     """
-    engine = create_database()
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    url = url or DATABASE_URL
+    factory = get_session_factory(url, metadata)
+    depths = getattr(_session_state, 'depths', None)
+    if depths is None:
+        depths = _session_state.depths = {}
+    depths[url] = depths.get(url, 0) + 1
+    session = factory()
     try:
         yield session
         session.commit()
@@ -93,7 +404,20 @@ def get_session():
         session.rollback()
         raise e
     finally:
-        session.close()
+        depths[url] -= 1
+        if depths[url] == 0:
+            factory.remove()
+
+@contextmanager
+def get_session():
+    """
+    Get a database session.
+    
+    Yields:
+        Session: Database session
+    """
+    with session_scope(DATABASE_URL, Base.metadata) as session:
+        yield session
 
 def store_article(article_data):
     """
@@ -119,6 +443,7 @@ def store_article(article_data):
                 url=article_data['url'],
                 description=article_data.get('description', ''),
                 date_published=article_data.get('date_published', ''),
+                published_on=to_date(article_data.get('published_on') or article_data.get('date_published')),
                 article_type=article_data.get('article_type', 'Article'),
                 scraped_at=datetime.now()
             )
@@ -143,9 +468,10 @@ def get_unscrapped_articles(limit=None):
     """
     try:
         with get_session() as session:
-            # Get articles that don't have corresponding content
+            # Get articles that don't have corresponding content, newest first
             subquery = session.query(ArticleContent.article_id)
-            query = session.query(Article).filter(~Article.id.in_(subquery))
+            query = session.query(Article).filter(~Article.id.in_(subquery)).order_by(
+                Article.published_on.is_(None), Article.published_on.desc(), Article.id)
             
             if limit:
                 query = query.limit(limit)
@@ -222,6 +548,75 @@ def get_articles(limit=10, offset=0):
         logger.error(f"Error getting articles: {e}")
         return []
 
+def get_articles_by_date(date_from=None, date_to=None, limit=10, after=None):
+    """
+    Get articles newest first, optionally within a publication date range.
+    
+    Uses keyset pagination on the published_on index: pass the cursor returned
+    with a page as ``after`` to get the next page. Articles without a parsed
+    publication date are not returned.
+    
+    Args:
+        date_from: Earliest publication date (inclusive; date or date string)
+        date_to: Latest publication date (inclusive; date or date string)
+        limit (int): Maximum number of articles to return
+        after (tuple, optional): (published_on, id) cursor of the previous page
+        
+    Returns:
+        tuple: (list of Article objects, cursor for the next page or None)
+    """
+    try:
+        with get_session() as session:
+            query = session.query(Article).filter(Article.published_on.isnot(None))
+            if date_from is not None:
+                query = query.filter(Article.published_on >= to_date(date_from))
+            if date_to is not None:
+                query = query.filter(Article.published_on <= to_date(date_to))
+            if after is not None:
+                query = query.filter(tuple_(Article.published_on, Article.id) < tuple_(to_date(after[0]), after[1]))
+            articles = query.order_by(Article.published_on.desc(), Article.id.desc()).limit(limit).all()
+            cursor = (articles[-1].published_on, articles[-1].id) if len(articles) == limit else None
+            return articles, cursor
+    except Exception as e:
+        logger.error(f"Error getting articles by date: {e}")
+        return [], None
+
+def backfill_published_on(batch_size=500):
+    """
+    Parse date_published into published_on for articles stored without it.
+    
+    Args:
+        batch_size (int): Articles updated per batch
+        
+    Returns:
+        dict: Number of articles scanned and parsed
+    """
+    scanned = parsed = 0
+    last_id = 0
+    try:
+        with get_session() as session:
+            while True:
+                rows = session.query(Article.id, Article.date_published).filter(
+                    Article.published_on.is_(None), Article.id > last_id
+                ).order_by(Article.id).limit(batch_size).all()
+                if not rows:
+                    break
+                updates = []
+                for article_id, date_published in rows:
+                    published_on = to_date(date_published)
+                    if published_on is not None:
+                        updates.append({'id': article_id, 'published_on': published_on})
+                if updates:
+                    session.bulk_update_mappings(Article, updates)
+                session.commit()
+                scanned += len(rows)
+                parsed += len(updates)
+                last_id = rows[-1][0]
+        logger.info(f"Parsed publication dates of {parsed} of {scanned} articles")
+    except Exception as e:
+        logger.error(f"Error backfilling publication dates: {e}")
+    return {'scanned': scanned, 'parsed': parsed}
+
 def get_article_contents(limit=10, offset=0):
     """
     Get a list of article contents from the database.
@@ -241,99 +636,191 @@ def get_article_contents(limit=10, offset=0):
         logger.error(f"Error getting article contents: {e}")
         return []
 
-def export_to_csv(filename='mckinsey_articles.csv'):
+def _export_model_to_csv(session, model, filename, header, to_row, incremental=False, row_filter=None):
+    """
+    Stream the rows of a model to CSV, optionally only those added since the last export.
+    
+    The export position is tracked as a (scraped_at, id) watermark per output
+    file in the export_watermarks table. Incremental exports write the new
+    rows to a part file next to the output (articles.part-00001.csv, ...);
+    compact_csv_export() merges the parts back into the output file.
+    
+    Args:
+        session (Session): Database session
+        model: Article or ArticleContent
+        filename (str): Output CSV filename
+        header (list): CSV header row
+        to_row (callable): Converts a model instance to a CSV row
+        incremental (bool): Only export rows added since the last export
+        row_filter (callable, optional): Returns False for rows that should be skipped
+        
+    Returns:
+        tuple: (rows written, path written to)
+    """
+    target = os.path.abspath(filename)
+    watermark = session.get(ExportWatermark, target)
+    if watermark is None:
+        watermark = ExportWatermark(target=target, source=model.__tablename__)
+        session.add(watermark)
+    
+    query = session.query(model)
+    is_part = incremental and watermark.last_id is not None
+    if is_part:
+        # Rows scraped after the mark, plus rows scraped in the same instant with a higher id
+        query = query.filter(or_(
+            model.scraped_at > watermark.last_scraped_at,
+            and_(model.scraped_at == watermark.last_scraped_at, model.id > watermark.last_id)
+        ))
+    query = query.order_by(model.scraped_at, model.id).yield_per(500)
+    
+    output_path = next_part_path(filename) if is_part else filename
+    temp_path = output_path + '.tmp'
+    count = 0
+    last = None
+    with open(temp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        
+        for row in query:
+            last = row
+            if row_filter and not row_filter(row):
+                continue
+            writer.writerow(to_row(row))
+            count += 1
+    
+    if last is None and is_part:
+        # Nothing new; don't leave an empty part file behind
+        os.remove(temp_path)
+        return 0, None
+    
+    os.replace(temp_path, output_path)
+    if not is_part:
+        # A full export supersedes any earlier part files
+        clear_parts(filename)
+    
+    if last is not None:
+        watermark.source = model.__tablename__
+        watermark.last_scraped_at = last.scraped_at
+        watermark.last_id = last.id
+        watermark.updated_at = datetime.now()
+    return count, output_path
+
+def export_to_csv(filename='mckinsey_articles.csv', incremental=False):
     """
     Export all articles to a CSV file.
     
     Args:
         filename (str): Output CSV filename
+        incremental (bool): Only export articles added since the last export, to a new part file
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
         with get_session() as session:
-            articles = session.query(Article).all()
-            
-            if not articles:
+            if not incremental and session.query(Article).count() == 0:
                 logger.warning("No articles found to export")
                 return False
             
-            # Write to CSV
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['ID', 'Title', 'URL', 'Description', 'Date Published', 'Article Type', 'Scraped At'])
-                
-                for article in articles:
-                    writer.writerow([
-                        article.id,
-                        article.title,
-                        article.url,
-                        article.description,
-                        article.date_published,
-                        article.article_type,
-                        article.scraped_at
-                    ])
+            count, path = _export_model_to_csv(
+                session, Article, filename,
+                ['ID', 'Title', 'URL', 'Description', 'Date Published', 'Article Type', 'Scraped At'],
+                lambda article: [
+                    article.id,
+                    article.title,
+                    article.url,
+                    article.description,
+                    article.date_published,
+                    article.article_type,
+                    article.scraped_at
+                ],
+                incremental=incremental
+            )
+            
+            if path is None:
+                logger.info(f"No new articles since the last export to {filename}")
+                return False
             
-            logger.info(f"Exported {len(articles)} articles to {filename}")
+            logger.info(f"Exported {count} articles to {path}")
             return True
     
     except Exception as e:
         logger.error(f"Error exporting articles to CSV: {e}")
         return False
 
-def export_content_to_csv(filename='articles_content.csv'):
+def _is_valid_content(content):
+    """Filter out entries with template placeholders or 'Access Denied'."""
+    if "{{" in content.url or "}}" in content.url:
+        logger.warning(f"Skipping invalid article: {content.title} with URL {content.url}")
+        return False
+    if content.full_content and "Access Denied" in content.full_content[:20]:
+        logger.warning(f"Skipping article with access denied: {content.title}")
+        return False
+    return True
+
+def export_content_to_csv(filename='articles_content.csv', incremental=False):
     """
     Export all article contents to a CSV file.
     
     Args:
         filename (str): Output CSV filename
+        incremental (bool): Only export contents added since the last export, to a new part file
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
         with get_session() as session:
-            contents = session.query(ArticleContent).all()
-            
-            if not contents:
+            if not incremental and session.query(ArticleContent).count() == 0:
                 logger.warning("No article contents found to export. Run 'scrape-content' command first.")
                 return False
             
-            # Filter out entries with template placeholders or 'Access Denied'
-            valid_contents = []
-            for content in contents:
-                if "{{" in content.url or "}}" in content.url:
-                    logger.warning(f"Skipping invalid article: {content.title} with URL {content.url}")
-                    continue
-                if content.full_content and "Access Denied" in content.full_content[:20]:
-                    logger.warning(f"Skipping article with access denied: {content.title}")
-                    continue
-                valid_contents.append(content)
+            count, path = _export_model_to_csv(
+                session, ArticleContent, filename,
+                ['Article ID', 'Title', 'URL', 'Authors', 'Full Content', 'Article Metadata', 'Scraped At'],
+                lambda content: [
+                    content.article_id,
+                    content.title,
+                    content.url,
+                    content.authors or '',  # Include authors in CSV
+                    content.full_content,
+                    content.article_metadata,
+                    content.scraped_at
+                ],
+                incremental=incremental,
+                row_filter=_is_valid_content
+            )
             
-            # Write to CSV
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['Article ID', 'Title', 'URL', 'Authors', 'Full Content', 'Article Metadata', 'Scraped At'])
-                
-                for content in valid_contents:
-                    writer.writerow([
-                        content.article_id,
-                        content.title,
-                        content.url,
-                        content.authors or '',  # Include authors in CSV
-                        content.full_content,
-                        content.article_metadata,
-                        content.scraped_at
-                    ])
+            if path is None:
+                logger.info(f"No new article contents since the last export to {filename}")
+                return False
             
-            logger.info(f"Exported {len(valid_contents)} valid article contents to {filename}")
+            logger.info(f"Exported {count} valid article contents to {path}")
             return True
     
     except Exception as e:
         logger.error(f"Error exporting article contents to CSV: {e}")
         return False
 
+def compact_csv_export(filename, key_column=None):
+    """
+    Merge the part files of incremental exports into the main CSV file.
+    
+    When a row was exported more than once, only its newest version is kept.
+    
+    Args:
+        filename (str): Output CSV filename of the full export
+        key_column (str, optional): Header of the column identifying a row (default: the first column)
+        
+    Returns:
+        int: Number of rows in the compacted file, or -1 on error
+    """
+    try:
+        return compact_csv_parts(filename, key_column=key_column, encoding='utf-8')
+    except Exception as e:
+        logger.error(f"Error compacting {filename}: {e}")
+        return -1
+
 def get_database_stats():
     """
     Get statistics about the database.
@@ -397,7 +884,7 @@ def check_database_tables():
         tuple: (articles_exists, contents_exists)
     """
     try:
-        engine = create_engine(f'sqlite:///{DB_FILE}')
+        engine = get_engine(DATABASE_URL)
         inspector = inspect(engine)
         
         articles_exists = 'articles' in inspector.get_table_names()
@@ -10,23 +10,33 @@ import sqlite3
 import logging
 import csv
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, ForeignKey, inspect
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, inspect
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import relationship
 from contextlib import contextmanager
 from dotenv import load_dotenv
 from key_vault_utils import get_secret
+from database_utils import get_engine, session_scope, get_pool_stats
 
 logger = logging.getLogger(__name__)
 
-# Load database connection from Azure Key Vault
-try:
-    connection_string = get_secret("DB-CONNECTION-STRING")
-    logger.info("Successfully loaded database connection string from Azure Key Vault")
-except Exception as e:
-    logger.warning(f"Could not load connection string from Key Vault: {str(e)}")
-    logger.warning("Falling back to local connection string")
-    connection_string = 'sqlite:///mckinsey_data.db'
+# Local connection string used when Key Vault is unavailable
+LOCAL_CONNECTION_STRING = 'sqlite:///mckinsey_data.db'
+
+_connection_string = None
+
+def get_connection_string():
+    """Load the database connection string from Azure Key Vault on first use."""
+    global _connection_string
+    if _connection_string is None:
+        try:
+            _connection_string = get_secret("DB-CONNECTION-STRING")
+            logger.info("Successfully loaded database connection string from Azure Key Vault")
+        except Exception as e:
+            logger.warning(f"Could not load connection string from Key Vault: {str(e)}")
+            logger.warning("Falling back to local connection string")
+            _connection_string = LOCAL_CONNECTION_STRING
+    return _connection_string
 
 Base = declarative_base()
 
@@ -70,22 +80,16 @@ def create_database():
     """Creates the database and tables if they don't exist."""
     logger.info("Creating database...")
     
-    engine = create_engine(connection_string)
-    Base.metadata.create_all(engine)
+    engine = get_engine(get_connection_string(), Base.metadata)
     
     logger.info("Database created successfully.")
     return engine
 
 @contextmanager
 def get_session():
-    """Creates and returns a session to interact with the database."""
-    try:
-        engine = create_engine(connection_string)
-        Session = sessionmaker(bind=engine)
-        session = Session()
+    """Returns a thread-local session from the shared engine for the configured database."""
+    with session_scope(get_connection_string(), Base.metadata) as session:
         yield session
-    finally:
-        session.close()
 
 def get_database_stats():
     """Get statistics about the database tables."""
@@ -96,4 +100,8 @@ def get_database_stats():
         return {
             "articles": article_count,
             "article_contents": content_count
-        } 
\ No newline at end of file
+        }
+
+def get_connection_stats():
+    """Get connection pool statistics for the configured database."""
+    return get_pool_stats(get_connection_string())
@@ -0,0 +1,259 @@
+"""
+Debug Snapshot Capture
+----------------------
+Saves rendered search pages for debugging without slowing down scraping.
+
+Pages are captured when parsing fails, or for a sampled fraction of all
+pages, and written as gzip-compressed HTML by a background thread, so the
+scraping threads never wait for the disk. Snapshots are stored in a
+rotating directory capped by total size: when the cap is exceeded the
+oldest snapshots are removed. File names are
+
+    <timestamp>-<url hash>-<reason>.html.gz
+
+so the directory listing is in capture order and all snapshots of one URL
+can be found with a glob on its hash (see url_hash()).
+
+Configured through environment variables:
+
+    DEBUG_CAPTURE_MODE    off, failure (default), sample or always
+    DEBUG_CAPTURE_RATE    fraction of successful pages captured in sample mode (default 0.05)
+    DEBUG_CAPTURE_DIR     snapshot directory (default debug_snapshots)
+    DEBUG_CAPTURE_MAX_MB  total size cap of the directory in MB (default 50)
+"""
+
+import os
+import gzip
+import atexit
+import random
+import hashlib
+import logging
+import threading
+from queue import Queue, Empty, Full
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+MODES = ('off', 'failure', 'sample', 'always')
+DEFAULT_MODE = 'failure'
+DEFAULT_RATE = 0.05
+DEFAULT_DIRECTORY = 'debug_snapshots'
+DEFAULT_MAX_MB = 50
+
+# Snapshots waiting to be written; further captures are dropped while it is full.
+# Sampled pages may only fill half of it, so failed pages still get through
+DEFAULT_QUEUE_SIZE = 16
+
+SNAPSHOT_SUFFIX = '.html.gz'
+
+
+def url_hash(url):
+    """Short, stable hash of a URL used in snapshot file names."""
+    return hashlib.sha1((url or '').encode('utf-8')).hexdigest()[:12]
+
+
+class DebugCapture:
+    """Decides which pages to capture and writes them from a background thread."""
+
+    def __init__(self, mode=DEFAULT_MODE, rate=DEFAULT_RATE, directory=DEFAULT_DIRECTORY,
+                 max_bytes=DEFAULT_MAX_MB * 1024 * 1024, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        Args:
+            mode (str): 'off', 'failure' (only failed pages), 'sample' (failed pages
+                        and a fraction of the others) or 'always'
+            rate (float): Fraction of successful pages captured in 'sample' mode
+            directory (str): Snapshot directory
+            max_bytes (int): Total size cap of the snapshot directory
+            queue_size (int): Maximum number of snapshots waiting to be written
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown debug capture mode: {mode} (expected one of {', '.join(MODES)})")
+        self.mode = mode
+        self.rate = min(max(rate, 0.0), 1.0)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self.written = 0
+        self._queue = Queue(maxsize=queue_size)
+        self._sample_limit = max(queue_size // 2, 1)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._snapshots = None  # [(name, size)] oldest first, loaded by the writer thread
+        self._total_bytes = 0
+
+    @classmethod
+    def from_env(cls):
+        """Create a capture configured from the DEBUG_CAPTURE_* environment variables."""
+        return cls(
+            mode=os.environ.get("DEBUG_CAPTURE_MODE", DEFAULT_MODE).lower(),
+            rate=float(os.environ.get("DEBUG_CAPTURE_RATE", DEFAULT_RATE)),
+            directory=os.environ.get("DEBUG_CAPTURE_DIR", DEFAULT_DIRECTORY),
+            max_bytes=int(float(os.environ.get("DEBUG_CAPTURE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024),
+        )
+
+    def wants(self, failed=False):
+        """
+        Decide whether a page should be captured.
+
+        Args:
+            failed (bool): Whether extracting data from the page failed
+
+        Returns:
+            bool: True if the page should be captured
+        """
+        if self.mode == 'off':
+            return False
+        if failed or self.mode == 'always':
+            return True
+        return self.mode == 'sample' and random.random() < self.rate
+
+    def capture(self, html, url=None, reason='page', failed=False):
+        """
+        Queue a page for writing if it is selected for capture.
+
+        Never blocks: when the writer is behind, the snapshot is dropped
+        (sampled snapshots first, see DEFAULT_QUEUE_SIZE).
+
+        Args:
+            html (str): Page HTML
+            url (str, optional): Page URL
+            reason (str): Short label stored in the file name
+            failed (bool): Whether extracting data from the page failed
+
+        Returns:
+            bool: True if the snapshot was queued
+        """
+        if not html or not self.wants(failed):
+            return False
+        self._ensure_thread()
+        try:
+            if not failed and self._queue.qsize() >= self._sample_limit:
+                raise Full
+            self._queue.put_nowait((datetime.now(), url, reason, html))
+        except Full:
+            self.dropped += 1
+            logger.debug(f"Debug capture queue full, dropped snapshot of {url}")
+            return False
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until the queued snapshots have been written (or the timeout expires)."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+
+        def wait():
+            self._queue.join()
+            done.set()
+
+        threading.Thread(target=wait, daemon=True).start()
+        done.wait(timeout)
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    thread = threading.Thread(target=self._run, name="debug-capture", daemon=True)
+                    thread.start()
+                    self._thread = thread
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=1)
+            except Empty:
+                continue
+            try:
+                self._write(*item)
+            except Exception as e:
+                logger.warning(f"Failed to write debug snapshot: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _load_snapshots(self):
+        os.makedirs(self.directory, exist_ok=True)
+        snapshots = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(SNAPSHOT_SUFFIX):
+                try:
+                    snapshots.append((name, os.path.getsize(os.path.join(self.directory, name))))
+                except OSError:
+                    continue
+        self._snapshots = snapshots
+        self._total_bytes = sum(size for _, size in snapshots)
+
+    def _write(self, captured_at, url, reason, html):
+        if self._snapshots is None:
+            self._load_snapshots()
+
+        safe_reason = ''.join(c if c.isalnum() or c in '-_' else '_' for c in reason)[:40]
+        name = f"{captured_at:%Y%m%dT%H%M%S%f}-{url_hash(url)}-{safe_reason}{SNAPSHOT_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        header = f"<!-- url: {url or 'unknown'} | reason: {reason} | captured: {captured_at.isoformat()} -->\n"
+        data = gzip.compress((header + html).encode('utf-8'), compresslevel=6)
+
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        self._snapshots.append((name, len(data)))
+        self._total_bytes += len(data)
+        self.written += 1
+        logger.info(f"Saved debug snapshot {path} ({len(data):,} bytes)")
+        self._rotate()
+
+    def _rotate(self):
+        # Keep at least the newest snapshot, even if it alone exceeds the cap
+        while self._total_bytes > self.max_bytes and len(self._snapshots) > 1:
+            name, size = self._snapshots.pop(0)
+            self._total_bytes -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError as e:
+                logger.warning(f"Failed to remove old debug snapshot {name}: {e}")
+
+
+_capture = None
+_capture_lock = threading.Lock()
+
+
+def _flush_at_exit():
+    if _capture is not None:
+        _capture.flush(timeout=5)
+
+
+atexit.register(_flush_at_exit)
+
+
+def get_capture():
+    """Get the process-wide debug capture, creating it from the environment on first use."""
+    global _capture
+    if _capture is None:
+        with _capture_lock:
+            if _capture is None:
+                _capture = DebugCapture.from_env()
+    return _capture
+
+
+def set_capture(capture):
+    """Replace the process-wide debug capture (e.g. DebugCapture(mode='off') for benchmarks)."""
+    global _capture
+    with _capture_lock:
+        _capture = capture
+
+
+def capture(html, url=None, reason='page', failed=False):
+    """
+    Capture a page with the process-wide debug capture (see DebugCapture.capture).
+
+    Args:
+        html (str): Page HTML
+        url (str, optional): Page URL
+        reason (str): Short label stored in the file name
+        failed (bool): Whether extracting data from the page failed
+
+    Returns:
+        bool: True if the snapshot was queued
+    """
+    return get_capture().capture(html, url, reason, failed)
@@ -1,6 +1,6 @@
 import os
 import logging
-from database_utils import Base, DB_FILE, create_engine
+from database_utils import Base, DB_FILE, DATABASE_URL, get_engine, dispose_engines
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -8,14 +8,21 @@ logger = logging.getLogger(__name__)
 def initialize_database():
     """Create a fresh database with all required tables."""
     try:
+        # Release pooled connections before the file is removed
+        dispose_engines()
+        
         # Remove existing database if it exists
         if os.path.exists(DB_FILE):
             os.remove(DB_FILE)
             logger.info(f"Removed existing database file: {DB_FILE}")
-        
+
+        # Remove WAL side files left behind by the previous database
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(DB_FILE + suffix):
+                os.remove(DB_FILE + suffix)
+
         # Create new database with all tables
-        engine = create_engine(f'sqlite:///{DB_FILE}')
-        Base.metadata.create_all(engine)
+        get_engine(DATABASE_URL, Base.metadata)
         logger.info(f"Successfully created new database with all tables in {DB_FILE}")
         return True
     except Exception as e:
@@ -2,29 +2,294 @@
 Azure Key Vault Utilities
 ------------------------
 Provides functions to securely retrieve secrets from Azure Key Vault.
+
+Secrets are served through a cached provider: values are kept in-process for
+a TTL, refreshed in the background shortly before they expire, and the Azure
+credential is only created when a secret is first fetched. Set
+SECRETS_BACKEND=env or SECRETS_BACKEND=file (with SECRETS_FILE) to use
+environment variables or a local JSON file instead of Key Vault.
 """
 
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
 import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Default cache lifetime for a secret, in seconds
+DEFAULT_TTL_SECONDS = 3600
+
+# Fraction of the TTL after which a cached secret is refreshed in the background
+REFRESH_AHEAD_RATIO = 0.8
+
+
+class KeyVaultBackend:
+    """Fetches secrets from Azure Key Vault, creating the client on first use."""
+
+    def __init__(self, key_vault_name=None):
+        self.key_vault_name = key_vault_name or os.environ.get("KEY_VAULT_NAME")
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    # Imported here so that importing this module stays cheap
+                    from azure.identity import DefaultAzureCredential
+                    from azure.keyvault.secrets import SecretClient
+
+                    kv_uri = f"https://{self.key_vault_name}.vault.azure.net"
+                    credential = DefaultAzureCredential()
+                    self._client = SecretClient(vault_url=kv_uri, credential=credential)
+        return self._client
+
+    def fetch(self, secret_name):
+        return self._get_client().get_secret(secret_name).value
+
+
+class EnvBackend:
+    """Reads secrets from environment variables (DB-CONNECTION-STRING -> DB_CONNECTION_STRING)."""
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+
+    def fetch(self, secret_name):
+        env_name = self.prefix + secret_name.replace("-", "_").upper()
+        value = os.environ.get(env_name)
+        if value is None:
+            raise KeyError(f"Secret {secret_name} not found in environment variable {env_name}")
+        return value
+
+
+class FileBackend:
+    """Reads secrets from a local JSON file mapping secret names to values."""
+
+    def __init__(self, path):
+        self.path = path
+        self._secrets = None
+        self._lock = threading.Lock()
+
+    def fetch(self, secret_name):
+        with self._lock:
+            if self._secrets is None:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._secrets = json.load(f)
+        if secret_name not in self._secrets:
+            raise KeyError(f"Secret {secret_name} not found in {self.path}")
+        return self._secrets[secret_name]
+
+
+class SecretProvider:
+    """In-process TTL cache with refresh-ahead in front of a secret backend."""
+
+    def __init__(self, backend, ttl=DEFAULT_TTL_SECONDS, refresh_ahead=REFRESH_AHEAD_RATIO, max_workers=4):
+        """
+        Initialize a secret provider.
+
+        Args:
+            backend: Object with a fetch(secret_name) method
+            ttl (float): Seconds a cached value stays valid
+            refresh_ahead (float): Fraction of the TTL after which a background refresh starts
+            max_workers (int): Maximum concurrent fetches during prefetch
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.max_workers = max_workers
+        self._cache = {}
+        self._refreshing = set()
+        self._inflight = {}  # secret name -> Future of the backend fetch in progress
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0, "errors": 0}
+
+    def get(self, secret_name):
+        """
+        Get a secret, fetching it from the backend only when not cached.
+
+        Concurrent misses of the same secret share one backend fetch.
+
+        Args:
+            secret_name (str): The name of the secret to retrieve
+
+        Returns:
+            str: The secret value
+        """
+        with self._lock:
+            entry = self._cache.get(secret_name)
+            age = time.monotonic() - entry[1] if entry is not None else None
+            if age is not None and age < self.ttl:
+                self._stats["hits"] += 1
+            else:
+                self._stats["misses"] += 1
+                entry = None
+
+        if entry is None:
+            return self._fetch(secret_name)
+        if age >= self.ttl * self.refresh_ahead:
+            self._refresh_in_background(secret_name)
+        return entry[0]
+
+    def prefetch(self, secret_names):
+        """
+        Fetch several secrets concurrently and cache them.
+
+        Args:
+            secret_names (list): Names of the secrets to load
+
+        Returns:
+            dict: Mapping of secret name to value for every secret that could be loaded
+        """
+        names = list(dict.fromkeys(secret_names))
+        if not names:
+            return {}
+
+        def load(name):
+            try:
+                return name, self.get(name)
+            except Exception as e:
+                self._count("errors")
+                logger.warning(f"Could not prefetch secret {name}: {e}")
+                return name, None
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(names))) as executor:
+            results = list(executor.map(load, names))
+        return {name: value for name, value in results if value is not None}
+
+    def invalidate(self, secret_name=None):
+        """Drop one cached secret, or the whole cache when no name is given."""
+        with self._lock:
+            if secret_name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(secret_name, None)
+
+    def get_stats(self):
+        """Get cache hit, miss, coalesced fetch, refresh and error counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached"] = len(self._cache)
+        return stats
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _fetch(self, secret_name):
+        # Only one thread fetches a secret at a time; the others wait for its result
+        with self._lock:
+            future = self._inflight.get(secret_name)
+            leader = future is None
+            if leader:
+                future = self._inflight[secret_name] = Future()
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            value = self.backend.fetch(secret_name)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[secret_name]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._cache[secret_name] = (value, time.monotonic())
+            del self._inflight[secret_name]
+        future.set_result(value)
+        return value
+
+    def _refresh_in_background(self, secret_name):
+        with self._lock:
+            if secret_name in self._refreshing:
+                return
+            self._refreshing.add(secret_name)
+
+        thread = threading.Thread(target=self._refresh, args=(secret_name,), daemon=True)
+        thread.start()
+
+    def _refresh(self, secret_name):
+        try:
+            self._fetch(secret_name)
+            self._count("refreshes")
+        except Exception as e:
+            # Keep serving the cached value until it expires
+            self._count("errors")
+            logger.warning(f"Background refresh of secret {secret_name} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(secret_name)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def create_backend(name=None):
+    """
+    Create a secret backend by name.
+
+    Args:
+        name (str, optional): 'keyvault', 'env' or 'file' (default: SECRETS_BACKEND or 'keyvault')
+
+    Returns:
+        Secret backend instance
+    """
+    name = (name or os.environ.get("SECRETS_BACKEND", "keyvault")).lower()
+    if name == "keyvault":
+        return KeyVaultBackend()
+    if name == "env":
+        return EnvBackend()
+    if name == "file":
+        return FileBackend(os.environ.get("SECRETS_FILE", "secrets.json"))
+    raise ValueError(f"Unknown secrets backend: {name}")
+
+
+def get_provider():
+    """Get the process-wide secret provider, creating it on first use."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                ttl = float(os.environ.get("SECRETS_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+                _provider = SecretProvider(create_backend(), ttl=ttl)
+    return _provider
+
+
+def set_provider(provider):
+    """Replace the process-wide secret provider (e.g. with a local stand-in in tests)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
+
+
 def get_secret(secret_name):
     """Get a secret from Azure Key Vault.
-    
+
     Args:
         secret_name (str): The name of the secret to retrieve
-        
+
     Returns:
         str: The secret value
     """
-    key_vault_name = os.environ.get("KEY_VAULT_NAME")
-    kv_uri = f"https://{key_vault_name}.vault.azure.net"
-    
-    credential = DefaultAzureCredential()
-    client = SecretClient(vault_url=kv_uri, credential=credential)
-    
-    return client.get_secret(secret_name).value 
\ No newline at end of file
+    return get_provider().get(secret_name)
+
+
+def prefetch_secrets(secret_names):
+    """Load several secrets concurrently into the cache.
+
+    Args:
+        secret_names (list): Names of the secrets to load
+
+    Returns:
+        dict: Mapping of secret name to value for every secret that could be loaded
+    """
+    return get_provider().prefetch(secret_names)
@@ -6,15 +6,19 @@ It uses Selenium WebDriver to render JavaScript content before scraping.
 """
 
 import os
+import re
+import sys
 import time
 import random
 import logging
 import requests
 from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
+from lxml.cssselect import CSSSelector
 from fake_useragent import UserAgent
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 import threading
 from queue import Queue
@@ -30,7 +34,16 @@ from selenium.common.exceptions import TimeoutException, WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
 
 # Update import at the top:
-from database_utils import store_article, get_session, Article
+from database_utils import store_article, get_session, get_engine, Article, to_date
+from debug_capture import capture as capture_debug_snapshot
+from page_readiness import wait_for_results
+
+# Author and date extraction is shared with scraperv2 through the scraper_common package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from scraper_common.metadata_extraction import extract_result_date
+from scraper_common.selector_stats import get_stats as get_selector_stats
 
 # Setup logging
 logging.basicConfig(
@@ -44,6 +57,27 @@ logger = logging.getLogger(__name__)
 BASE_URL = "https://www.mckinsey.com/search"
 SEARCH_QUERY = "change management"
 
+# Broad selectors for search result containers, tried until one matches.
+# The selector that usually matches is tried first (see selector_stats.py)
+SEARCH_RESULT_SELECTORS = [
+    'article', '.search-result', '.result-item', '.card',
+    'div[role="article"]', '.tile', '.article-preview',
+    'li.listing', '.list-item', '.item', '.hit', '.result'
+]
+SEARCH_RESULT_CSS = {
+    selector: CSSSelector(selector, translator='html') for selector in SEARCH_RESULT_SELECTORS
+}
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+# A single rendered search result, waited for before reading the page
+RESULT_ITEM_SELECTOR = '.item, .search-result, .searchResult'
+
+# Text outside script, style and template elements (what BeautifulSoup's get_text() returns)
+VISIBLE_TEXT = etree.XPath('.//text()[not(ancestor::script or ancestor::style or ancestor::template)]')
+
+# "1-10 of 150 results" or "Showing 1-10 of about 150 results"
+RESULT_COUNT_PATTERN = re.compile(r'of\s+(?:about\s+)?(\d+)')
+
 # Database setup
 Base = declarative_base()
 
@@ -56,6 +90,8 @@ class Article(Base):
     url = Column(String(500), unique=True, nullable=False)
     description = Column(Text, nullable=True)
     date_published = Column(String(100), nullable=True)
+    published_on = Column(Date, nullable=True, index=True,
+                          info={'parsed_from': 'date_published'})  # Parsed from date_published
     article_type = Column(String(100), nullable=True)
     scraped_at = Column(DateTime, default=datetime.now)
     
@@ -64,10 +100,8 @@ class Article(Base):
 
 
 def create_database():
-    """Create database and tables."""
-    engine = create_engine('sqlite:///mckinsey_articles.db')
-    Base.metadata.create_all(engine)
-    return engine
+    """Create database and tables (once per process, via the shared engine registry)."""
+    return get_engine('sqlite:///mckinsey_articles.db', Base.metadata)
 
 
 def get_user_agent():
@@ -230,32 +264,22 @@ def fetch_page_with_selenium(url, params=None):
         
         logger.info("Waiting for page to load and JavaScript to execute...")
         try:
-            # Wait for initial page load
-            time.sleep(5)  # Initial wait for JavaScript to start
-            
-            # Wait for the search results to appear
-            WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, ".search-results, .results, .items"))
-            )
-            
-            # Check if we see template placeholders
+            # Wait in the browser until the results are rendered and their
+            # template placeholders are filled in
+            state = wait_for_results(driver, RESULT_ITEM_SELECTOR, timeout=35)
             html = driver.page_source
-            if "{{" in html and "}}" in html:
-                logger.info("Detected template placeholders, waiting for actual content...")
-                # Wait longer for JavaScript to replace templates
-                for i in range(10):
-                    time.sleep(2)
-                    html = driver.page_source
-                    if "{{" not in html:
-                        logger.info("Templates have been replaced with actual content.")
-                        break
+            if not state['ready']:
+                logger.warning(f"Search results not ready after {state['elapsed']} ms "
+                               f"({state['results']} rendered, {state['pending']} with template placeholders)")
+                capture_debug_snapshot(html, full_url, 'load_timeout', failed=True)
+                return driver, html
+            logger.info(f"{state['results']} search results rendered after {state['elapsed']} ms")
             
             # Get page title for debugging
             logger.info(f"Page title: {driver.title}")
             
-            # Save final HTML for debugging
-            with open('mckinsey_search_debug.html', 'w', encoding='utf-8') as f:
-                f.write(html)
+            # Sampled snapshot of the final HTML for debugging
+            capture_debug_snapshot(html, full_url, 'fetch')
             
             return driver, html
             
@@ -264,7 +288,9 @@ def fetch_page_with_selenium(url, params=None):
             
             # Still try to return what we have
             if driver:
-                return driver, driver.page_source
+                html = driver.page_source
+                capture_debug_snapshot(html, full_url, 'load_error', failed=True)
+                return driver, html
             return None, None
             
     except Exception as e:
@@ -277,12 +303,21 @@ def fetch_page_with_selenium(url, params=None):
         return None, None
 
 
-def parse_articles(html_content):
+def element_text(element):
+    """Get the visible text of an lxml element."""
+    return ''.join(VISIBLE_TEXT(element))
+
+
+def parse_articles(html_content, page_url=None):
     """
     Parse article information from HTML content.
     
+    Pages without articles (and a sample of the others, see debug_capture.py)
+    are saved as debug snapshots.
+    
     Args:
         html_content (str): HTML content to parse
+        page_url (str, optional): URL of the page, recorded with debug snapshots
         
     Returns:
         list: List of article dictionaries
@@ -290,7 +325,14 @@ def parse_articles(html_content):
     if not html_content:
         return []
     
-    soup = BeautifulSoup(html_content, 'lxml')
+    try:
+        document = lxml.html.document_fromstring(html_content)
+    except ValueError:
+        # lxml only accepts an XML encoding declaration in bytes
+        document = lxml.html.document_fromstring(html_content.encode('utf-8'))
+    except etree.ParserError as e:
+        logger.warning(f"Could not parse search results page: {e}")
+        return []
     articles = []
     
     logger.info("Analyzing search results page structure")
@@ -299,43 +341,34 @@ def parse_articles(html_content):
     if "{{" in html_content and "}}" in html_content:
         logger.warning("Page contains unreplaced template placeholders. JavaScript may not have executed fully.")
     
-    # Log the entire HTML to a file for debugging
-    with open("mckinsey_search_debug.html", "w", encoding="utf-8") as f:
-        f.write(html_content)
-    logger.info("Wrote HTML to mckinsey_search_debug.html for debugging")
-    
     # Try various selectors based on common article patterns
     # This is a broad approach to catch whatever structure is being used
-    search_selectors = [
-        'article', '.search-result', '.result-item', '.card', 
-        'div[role="article"]', '.tile', '.article-preview',
-        'li.listing', '.list-item', '.item', '.hit', '.result'
-    ]
-    
-    for selector in search_selectors:
-        search_results = soup.select(selector)
+    selector_stats = get_selector_stats()
+    search_results = []
+    for selector in selector_stats.order('search_results', SEARCH_RESULT_SELECTORS):
+        search_results = SEARCH_RESULT_CSS[selector](document)
+        selector_stats.record('search_results', selector, bool(search_results))
         if search_results:
             logger.info(f"Found {len(search_results)} results with selector '{selector}'")
             break
     else:
-        search_results = []
         logger.warning("No search results found with any selector")
     
     if not search_results:
         # As a fallback, look for any links that might be search results
-        all_links = soup.find_all('a', href=True)
-        insightful_links = [link for link in all_links if '/insights/' in link.get('href', '')]
+        insightful_links = [link for link in document.iter('a')
+                            if link.get('href') is not None and '/insights/' in link.get('href')]
         
         if insightful_links:
             logger.info(f"Found {len(insightful_links)} possible links to insights as fallback")
             
             for link in insightful_links:
                 try:
-                    url = link['href']
+                    url = link.get('href')
                     if not url.startswith('http'):
                         url = "https://www.mckinsey.com" + (url if url.startswith('/') else '/' + url)
                     
-                    title = link.get_text().strip() or "No title"
+                    title = element_text(link).strip() or "No title"
                     
                     if url and '/insights/' in url:  # Only add if we have a URL to an insight
                         article = {
@@ -343,6 +376,7 @@ def parse_articles(html_content):
                             'url': url,
                             'description': "",
                             'date_published': "",
+                            'published_on': None,
                             'article_type': "Article",
                         }
                         
@@ -355,11 +389,12 @@ def parse_articles(html_content):
     for result in search_results:
         try:
             # Look for any link within the result element
-            link_elem = result.find('a', href=True)
-            if not link_elem:
+            link_elem = next((link for link in result.iterdescendants('a')
+                              if link.get('href') is not None), None)
+            if link_elem is None:
                 continue
                 
-            url = link_elem['href']
+            url = link_elem.get('href')
             
             # Skip URLs with template placeholders
             if "{{" in url or "}}" in url:
@@ -370,22 +405,15 @@ def parse_articles(html_content):
                 url = "https://www.mckinsey.com" + (url if url.startswith('/') else '/' + url)
             
             # Get title from link text or any heading inside the result
-            title_elem = result.find(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']) or link_elem
-            title = title_elem.get_text().strip() if title_elem else "No title"
+            title_elem = next(result.iterdescendants(*HEADING_TAGS), link_elem)
+            title = element_text(title_elem).strip()
             
             # Look for any paragraph that might be a description
-            description_elem = result.find('p')
-            description = description_elem.get_text().strip() if description_elem else ""
+            description_elem = next(result.iterdescendants('p'), None)
+            description = element_text(description_elem).strip() if description_elem is not None else ""
             
             # Look for any date-like text
-            date_published = ""
-            date_patterns = [r'\b\d{1,2}\s+\w+\s+\d{4}\b', r'\b\w+\s+\d{1,2},\s+\d{4}\b']
-            for pattern in date_patterns:
-                import re
-                date_match = re.search(pattern, result.get_text())
-                if date_match:
-                    date_published = date_match.group(0)
-                    break
+            date_published, published_on = extract_result_date(element_text(result))
             
             if url:  # Only add if we have a URL
                 article = {
@@ -393,6 +421,7 @@ def parse_articles(html_content):
                     'url': url,
                     'description': description,
                     'date_published': date_published,
+                    'published_on': published_on,
                     'article_type': "Article",  # Default type
                 }
                 
@@ -402,6 +431,12 @@ def parse_articles(html_content):
             logger.error(f"Error parsing article: {e}")
     
     logger.info(f"Found {len(articles)} articles in search results")
+    
+    # Snapshot failed pages (and a sample of the others) in the background
+    if articles:
+        capture_debug_snapshot(html_content, page_url, 'parsed')
+    else:
+        capture_debug_snapshot(html_content, page_url, 'no_articles', failed=True)
     return articles
 
 
@@ -489,6 +524,7 @@ def store_articles(articles):
                     url=article['url'],
                     description=article.get('description', ''),
                     date_published=article.get('date_published', None),
+                    published_on=to_date(article.get('published_on')),
                     article_type=article.get('article_type', '')
                 )
                 
@@ -541,8 +577,7 @@ def get_total_results_and_pages(html_content):
     
     if result_count_text:
         # Try to extract total results from text using regex
-        import re
-        matches = re.search(r'of\s+(?:about\s+)?(\d+)', result_count_text)
+        matches = RESULT_COUNT_PATTERN.search(result_count_text)
         if matches:
             total_results = int(matches.group(1))
     
@@ -685,41 +720,19 @@ class ScrapeWorker(threading.Thread):
             except Exception as e:
                 logger.warning(f"Worker {self.worker_id} error handling cookie popup: {e}")
         
-        # Wait for search results
-        try:
-            # Wait for any search result item to appear
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, ".item, .search-result, .searchResult"))
-            )
-            
-            # Wait for multiple results
-            def has_multiple_results(driver):
-                items = driver.find_elements(By.CSS_SELECTOR, ".item, .search-result, .searchResult")
-                return len(items) >= 3
-            
-            WebDriverWait(self.driver, 5).until(has_multiple_results)
-            logger.info(f"Worker {self.worker_id} search results loaded")
-        except Exception as e:
-            logger.warning(f"Worker {self.worker_id} timeout waiting for results: {e}")
+        # Wait in the browser for multiple results with their template placeholders filled in
+        state = wait_for_results(self.driver, RESULT_ITEM_SELECTOR, min_results=3, timeout=20)
+        if state['ready']:
+            logger.info(f"Worker {self.worker_id} search results loaded after {state['elapsed']} ms")
+        else:
+            logger.warning(f"Worker {self.worker_id} timeout waiting for results "
+                           f"({state['results']} rendered, {state['pending']} with template placeholders)")
         
         # Get page content
         html_content = self.driver.page_source
         
-        # Check for template placeholders
-        if "{{" in html_content and "}}" in html_content:
-            logger.info(f"Worker {self.worker_id} waiting for templates to resolve...")
-            
-            max_wait_seconds = 8
-            start_time = time.time()
-            
-            while time.time() - start_time < max_wait_seconds:
-                time.sleep(0.5)
-                html_content = self.driver.page_source
-                if "{{" not in html_content:
-                    break
-        
         # Parse the search results
-        articles = parse_articles(html_content)
+        articles = parse_articles(html_content, full_url)
         
         # Store articles immediately instead of just putting in queue
         if articles:
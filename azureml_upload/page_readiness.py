@@ -0,0 +1,116 @@
+"""
+Page Readiness
+--------------
+Waits for JavaScript-rendered search results inside the browser.
+
+Instead of repeatedly fetching driver.page_source (the whole serialized DOM)
+to look for unreplaced "{{ }}" template placeholders, a MutationObserver is
+installed with execute_async_script. It re-checks the result nodes whenever
+the DOM changes and returns as soon as enough results are rendered and none
+of them still contains a placeholder, or when the timeout expires. Only a
+small status object is sent back to Python.
+
+Result templates kept in the page (e.g. <div class="item result-template">
+inside .search-result-templates) always contain placeholders, so they are
+ignored.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Containers of result templates, ignored when looking for rendered results
+TEMPLATE_SELECTOR = 'template, script, .search-result-templates, .result-template'
+
+# Finishes with {ready, results, pending, elapsed} when the results are rendered or the timeout expires
+WAIT_FOR_RESULTS_SCRIPT = """
+var selector = arguments[0], minResults = arguments[1], quietMs = arguments[2],
+    timeoutMs = arguments[3], excluded = arguments[4], done = arguments[arguments.length - 1];
+var start = Date.now(), finished = false, observer = null, timeoutTimer = null, quietTimer = null;
+
+function check() {
+    var nodes = document.querySelectorAll(selector), results = 0, pending = 0;
+    for (var i = 0; i < nodes.length; i++) {
+        if (nodes[i].closest(excluded)) continue;
+        if (nodes[i].outerHTML.indexOf('{{') >= 0) pending++; else results++;
+    }
+    return {results: results, pending: pending};
+}
+
+function finish(ready, state) {
+    if (finished) return;
+    finished = true;
+    if (observer) observer.disconnect();
+    clearTimeout(timeoutTimer);
+    clearTimeout(quietTimer);
+    state = state || check();
+    state.ready = ready;
+    state.elapsed = Date.now() - start;
+    done(state);
+}
+
+function quiet() {
+    // Fewer results than expected (e.g. the last page), but nothing has changed for a while
+    var state = check();
+    if (state.results > 0 && state.pending === 0) finish(true, state);
+}
+
+function evaluate() {
+    var state = check();
+    if (state.results >= minResults && state.pending === 0) {
+        finish(true, state);
+        return;
+    }
+    clearTimeout(quietTimer);
+    quietTimer = setTimeout(quiet, quietMs);
+}
+
+evaluate();
+if (!finished) {
+    observer = new MutationObserver(function () {
+        if (!finished) evaluate();
+    });
+    observer.observe(document.documentElement,
+                     {childList: true, subtree: true, attributes: true, characterData: true});
+    timeoutTimer = setTimeout(function () { finish(false); }, timeoutMs);
+}
+"""
+
+
+def wait_for_results(driver, result_selector, min_results=1, timeout=15, quiet_seconds=1.0,
+                     template_selector=TEMPLATE_SELECTOR):
+    """
+    Wait until search results are rendered and their template placeholders are filled in.
+
+    The page counts as ready when at least min_results nodes match result_selector
+    (outside template containers) and none of them contains "{{", or when at least
+    one result is rendered and the DOM has not changed for quiet_seconds.
+
+    Args:
+        driver: Selenium WebDriver on the search page
+        result_selector (str): CSS selector of a single search result
+        min_results (int): Number of rendered results to wait for
+        timeout (float): Maximum number of seconds to wait
+        quiet_seconds (float): Seconds without DOM changes after which fewer results are accepted
+        template_selector (str): CSS selector of template containers to ignore
+
+    Returns:
+        dict: ready (bool), results (rendered results), pending (results still
+              containing placeholders) and elapsed (milliseconds)
+    """
+    try:
+        # The browser enforces the script timeout, so leave room for the in-page timeout
+        driver.set_script_timeout(timeout + 5)
+        state = driver.execute_async_script(
+            WAIT_FOR_RESULTS_SCRIPT, result_selector, min_results,
+            int(quiet_seconds * 1000), int(timeout * 1000), template_selector
+        )
+    except Exception as e:
+        logger.warning(f"Error waiting for search results: {e}")
+        return {'ready': False, 'results': 0, 'pending': 0, 'elapsed': int(timeout * 1000)}
+    return {
+        'ready': bool(state.get('ready')),
+        'results': int(state.get('results', 0)),
+        'pending': int(state.get('pending', 0)),
+        'elapsed': int(state.get('elapsed', 0)),
+    }
@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+ROI Scoring Cache Proxy
+-----------------------
+Caching proxy in front of the Azure ML ROI /score deployment.
+
+Every form submission of the frontend is forwarded to the ROI model, which
+takes seconds to answer. This proxy:
+
+- canonicalizes the form payload (case, whitespace, number and date
+  formats, department order) into a cache key, so equivalent submissions
+  share one result;
+- coalesces concurrent identical requests into a single upstream call;
+- stores successful responses in SQLite with a TTL, so repeated scenarios
+  are answered instantly, also after a restart.
+
+    python roi_cache_proxy.py serve --port 8082
+    python roi_cache_proxy.py mock --port 8083 --delay 2
+    python roi_cache_proxy.py serve --upstream http://127.0.0.1:8083/score
+
+Point the frontend at it with ROI_PROXY_URL=http://127.0.0.1:8082.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+import sqlite3
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import ClientSession, ClientTimeout, web
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UPSTREAM_URL = "https://hackathon2025-beta-dgese.eastus2.inference.ml.azure.com/score"
+DEFAULT_DEPLOYMENT = "hackathon2025-beta-dgese-1"
+DEFAULT_CACHE_PATH = "roi_cache.db"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_TIMEOUT_SECONDS = 120
+DEFAULT_PORT = 8082
+DEFAULT_MOCK_PORT = 8083
+
+# Significant digits kept of numeric form fields (budgets, percentages, counts).
+# 0 keeps them exact: rounding lets different forms share a cached result, so it is opt-in
+DEFAULT_NUMERIC_PRECISION = 0
+
+# Bumped when the canonical form changes, so old cache entries are not reused
+KEY_VERSION = 1
+
+NUMERIC_FIELDS = ('min_budget', 'max_budget', 'employee_retraining_percent',
+                  'num_affected_employees', 'employee_morale')
+DATE_FIELDS = ('start_date', 'end_date')
+LIST_FIELDS = ('department',)
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+NUMBER_PATTERN = re.compile(r"^[-+]?(\d+(\.\d*)?|\.\d+)(e[-+]?\d+)?$")
+NUMBER_SUFFIXES = {'k': 1e3, 'm': 1e6, 'mm': 1e6, 'b': 1e9, 'bn': 1e9}
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d.%m.%Y', '%B %d, %Y', '%b %d, %Y', '%Y/%m/%d')
+
+
+def normalize_text(value):
+    """Lowercase a text value and collapse its whitespace."""
+    return WHITESPACE_PATTERN.sub(' ', str(value)).strip().lower()
+
+
+def normalize_number(value, precision=DEFAULT_NUMERIC_PRECISION):
+    """
+    Parse a number as entered in the form ("50,000", "$1.2M", "15%") and round it.
+
+    Returns:
+        float, or the normalized text when the value is not a number
+    """
+    if isinstance(value, bool):
+        return normalize_text(value)
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        text = normalize_text(value).replace(',', '').replace('$', '').replace('%', '').replace(' ', '')
+        scale = 1.0
+        for suffix in sorted(NUMBER_SUFFIXES, key=len, reverse=True):
+            if text.endswith(suffix) and NUMBER_PATTERN.match(text[:-len(suffix)] or 'x'):
+                text, scale = text[:-len(suffix)], NUMBER_SUFFIXES[suffix]
+                break
+        if not NUMBER_PATTERN.match(text):
+            return normalize_text(value)
+        number = float(text) * scale
+
+    if number and precision:
+        number = float(f"{number:.{precision}g}")
+    return number
+
+
+def normalize_date(value):
+    """Return a date form value in ISO format (the normalized text if it is not a date)."""
+    text = normalize_text(value)
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return text
+
+
+def canonicalize_payload(payload, precision=DEFAULT_NUMERIC_PRECISION):
+    """
+    Return the canonical form of a scoring payload.
+
+    Empty fields are dropped, texts are lowercased with collapsed whitespace,
+    numbers are parsed (and rounded to ``precision`` significant digits if given), dates
+    are converted to ISO format and list fields are sorted and deduplicated.
+
+    Args:
+        payload (dict): Form payload sent to /score
+        precision (int): Significant digits kept of numeric fields (0 keeps them exact)
+
+    Returns:
+        dict: Canonical payload
+    """
+    canonical = {}
+    for name, value in payload.items():
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        if name in NUMERIC_FIELDS:
+            canonical[name] = normalize_number(value, precision)
+        elif name in DATE_FIELDS:
+            canonical[name] = normalize_date(value)
+        elif name in LIST_FIELDS or isinstance(value, (list, tuple)):
+            items = value if isinstance(value, (list, tuple)) else str(value).split(',')
+            canonical[name] = sorted({normalize_text(item) for item in items if normalize_text(item)})
+        elif isinstance(value, dict):
+            canonical[name] = canonicalize_payload(value, precision)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            canonical[name] = normalize_number(value, precision)
+        else:
+            canonical[name] = normalize_text(value)
+    return canonical
+
+
+def cache_key(payload, precision=DEFAULT_NUMERIC_PRECISION, credentials=None):
+    """
+    Return the cache key (SHA-256 hex digest) of a scoring payload.
+
+    Args:
+        payload (dict): Form payload sent to /score
+        precision (int): Significant digits kept of numeric fields (0 keeps them exact)
+        credentials (str, optional): Authorization header the upstream call is made with,
+            when it comes from the client; responses are then only shared by clients sending it
+
+    Returns:
+        str: Cache key
+    """
+    canonical = canonicalize_payload(payload, precision)
+    key = {'v': KEY_VERSION, 'payload': canonical}
+    if credentials is not None:
+        key['credentials'] = hashlib.sha256(credentials.encode('utf-8')).hexdigest()
+    data = json.dumps(key, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """SQLite store of upstream responses with a time-to-live."""
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL_SECONDS):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript('''
+        CREATE TABLE IF NOT EXISTS roi_responses (
+            key TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_roi_responses_expires ON roi_responses (expires_at);
+        ''')
+        self.conn.commit()
+
+    def get(self, key):
+        """Return the cached response body (str) for a key, or None if missing or expired."""
+        row = self.conn.execute("SELECT response FROM roi_responses WHERE key = ? AND expires_at > ?",
+                                (key, time.time())).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE roi_responses SET hits = hits + 1 WHERE key = ?", (key,))
+        return row[0]
+
+    def put(self, key, payload, response):
+        """Store a response body for a key."""
+        now = time.time()
+        with self.conn:
+            self.conn.execute('''
+            INSERT OR REPLACE INTO roi_responses (key, payload, response, created_at, expires_at, hits)
+            VALUES (?, ?, ?, ?, ?, 0)
+            ''', (key, json.dumps(payload, sort_keys=True), response, now, now + self.ttl))
+
+    def purge(self):
+        """Delete expired responses; returns the number of rows deleted."""
+        with self.conn:
+            return self.conn.execute("DELETE FROM roi_responses WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def get_stats(self):
+        """Return entry counts of the cache."""
+        now = time.time()
+        total, live, hits = self.conn.execute(
+            "SELECT COUNT(*), SUM(expires_at > ?), SUM(hits) FROM roi_responses", (now,)).fetchone()
+        return {'entries': total, 'live_entries': live or 0, 'stored_hits': hits or 0}
+
+    def close(self):
+        self.conn.close()
+
+
+class UpstreamError(Exception):
+    """Raised when the upstream scorer answers with an error status."""
+
+    def __init__(self, status, body):
+        super().__init__(f"Upstream returned {status}")
+        self.status = status
+        self.body = body
+
+
+class ScoringProxy:
+    """Caches and coalesces calls to the upstream /score endpoint."""
+
+    def __init__(self, cache, upstream_url=DEFAULT_UPSTREAM_URL, api_key=None, deployment=DEFAULT_DEPLOYMENT,
+                 timeout=DEFAULT_TIMEOUT_SECONDS, precision=DEFAULT_NUMERIC_PRECISION):
+        self.cache = cache
+        self.upstream_url = upstream_url
+        self.api_key = api_key
+        self.deployment = deployment
+        self.timeout = timeout
+        self.precision = precision
+        self.session = None
+        self._pending = {}
+        # The SQLite connection is only used from this thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='roi-cache')
+        self.stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'upstream_calls': 0,
+                      'upstream_errors': 0, 'upstream_seconds': 0.0}
+
+    async def start(self):
+        self.session = ClientSession(timeout=ClientTimeout(total=self.timeout))
+        removed = await self._run(self.cache.purge)
+        if removed:
+            logger.info(f"Removed {removed} expired cache entries")
+
+    async def stop(self):
+        if self.session:
+            await self.session.close()
+        self._executor.submit(self.cache.close).result()
+        self._executor.shutdown(wait=True)
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def score(self, payload, authorization=None):
+        """
+        Return the upstream response body for a payload.
+
+        Args:
+            payload (dict): Form payload
+            authorization (str, optional): Authorization header of the client, used when
+                the proxy has no API key of its own
+
+        Returns:
+            tuple: (response body as str, 'hit', 'coalesced' or 'miss')
+        """
+        self.stats['requests'] += 1
+        # Without a key of its own the proxy calls upstream with the client's credentials,
+        # so a client must not get results paid for (or authorized) by another client's key
+        credentials = None if self.api_key else (authorization or '')
+        key = cache_key(payload, self.precision, credentials)
+
+        body = await self._run(self.cache.get, key)
+        if body is not None:
+            self.stats['cache_hits'] += 1
+            return body, 'hit'
+
+        if key in self._pending:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(self._pending[key]), 'coalesced'
+
+        # The upstream call runs as its own task, so it still resolves for the
+        # coalesced requests when the request that started it is cancelled
+        task = asyncio.ensure_future(self._fetch(key, payload, authorization))
+        self._pending[key] = task
+        task.add_done_callback(lambda done: self._finish_fetch(key, done))
+        return await asyncio.shield(task), 'miss'
+
+    async def _fetch(self, key, payload, authorization=None):
+        body = await self._call_upstream(payload, authorization)
+        await self._run(self.cache.put, key, canonicalize_payload(payload, self.precision), body)
+        return body
+
+    def _finish_fetch(self, key, task):
+        if self._pending.get(key) is task:
+            del self._pending[key]
+        # Mark the exception as retrieved when no request was waiting for it
+        if not task.cancelled():
+            task.exception()
+
+    async def _call_upstream(self, payload, authorization=None):
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+        elif authorization:
+            headers['Authorization'] = authorization
+        if self.deployment:
+            headers['azureml-model-deployment'] = self.deployment
+
+        self.stats['upstream_calls'] += 1
+        start = time.perf_counter()
+        try:
+            async with self.session.post(self.upstream_url, json=payload, headers=headers) as response:
+                body = await response.text()
+                if response.status != 200:
+                    raise UpstreamError(response.status, body)
+                # Only well-formed JSON responses are cached
+                json.loads(body)
+                return body
+        except Exception:
+            self.stats['upstream_errors'] += 1
+            raise
+        finally:
+            self.stats['upstream_seconds'] += time.perf_counter() - start
+
+
+async def handle_score(request):
+    proxy = request.app['proxy']
+    try:
+        payload = await request.json()
+    except json.JSONDecodeError:
+        return web.json_response({'error': 'Request body must be JSON'}, status=400)
+    if not isinstance(payload, dict):
+        return web.json_response({'error': 'Request body must be a JSON object'}, status=400)
+
+    start = time.perf_counter()
+    try:
+        body, source = await proxy.score(payload, request.headers.get('Authorization'))
+    except UpstreamError as e:
+        logger.error(f"Upstream error {e.status}: {e.body[:500]}")
+        return web.Response(text=e.body, status=e.status, content_type='application/json')
+    except Exception as e:
+        logger.error(f"Error scoring payload: {str(e)}")
+        return web.json_response({'error': 'Upstream request failed', 'details': str(e)}, status=502)
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"/score {source} in {elapsed * 1000:.1f} ms")
+    return web.Response(text=body, content_type='application/json',
+                        headers={'X-Cache': source.upper(), 'Server-Timing': f"proxy;dur={elapsed * 1000:.1f}"})
+
+
+async def handle_stats(request):
+    proxy = request.app['proxy']
+    stats = dict(proxy.stats)
+    stats.update(await proxy._run(proxy.cache.get_stats))
+    stats['hit_rate'] = round((stats['cache_hits'] + stats['coalesced']) / stats['requests'], 3) if stats['requests'] else 0.0
+    stats['avg_upstream_seconds'] = (round(stats['upstream_seconds'] / stats['upstream_calls'], 3)
+                                     if stats['upstream_calls'] else None)
+    return web.json_response(stats)
+
+
+async def handle_health(request):
+    return web.json_response({'status': 'ok'})
+
+
+def create_app(proxy):
+    """Create the aiohttp application serving a ScoringProxy."""
+    app = web.Application()
+    app['proxy'] = proxy
+    app.router.add_post('/score', handle_score)
+    app.router.add_get('/stats', handle_stats)
+    app.router.add_get('/health', handle_health)
+
+    async def on_startup(app):
+        await proxy.start()
+
+    async def on_cleanup(app):
+        await proxy.stop()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def mock_score(payload):
+    """
+    Build a deterministic response in the shape of the ROI model output.
+
+    Returns:
+        dict: coceqn/conceqn formulas with their cocvar/concvar variables
+    """
+    def number(name, default):
+        value = normalize_number(payload.get(name, default), 0)
+        return value if isinstance(value, float) else float(default)
+
+    min_budget = number('min_budget', 100000)
+    max_budget = number('max_budget', 2 * min_budget)
+    employees = number('num_affected_employees', 100)
+    retraining = number('employee_retraining_percent', 20) / 100
+
+    return {
+        'coceqn': '\\[ \\text{CoC} = B + E \\times R \\times T \\]',
+        'cocvar': [
+            ['B', 'Implementation budget', str((min_budget + max_budget) / 2)],
+            ['E', 'Affected employees', str(employees)],
+            ['R', 'Share of employees needing retraining', str(retraining)],
+            ['T', 'Training cost per employee', '2500'],
+        ],
+        'conceqn': '\\[ \\text{CoNC} = E \\times P \\times L \\]',
+        'concvar': [
+            ['E', 'Affected employees', str(employees)],
+            ['P', 'Annual productivity loss per employee', '4000'],
+            ['L', 'Years until the change is forced', '3'],
+        ],
+    }
+
+
+def create_mock_app(delay=2.0, failure_rate=0.0):
+    """Create a local stand-in for the /score endpoint, answering after ``delay`` seconds."""
+    app = web.Application()
+    app['calls'] = 0
+
+    async def handle_mock_score(request):
+        app['calls'] += 1
+        # Taken before the delay, while concurrent requests still see different counts
+        call = app['calls']
+        payload = await request.json()
+        await asyncio.sleep(delay)
+        if failure_rate and (call * 0.6180339887) % 1 < failure_rate:
+            return web.json_response({'error': 'Mock scorer failure'}, status=503)
+        return web.json_response(mock_score(payload))
+
+    async def handle_mock_stats(request):
+        return web.json_response({'calls': app['calls']})
+
+    app.router.add_post('/score', handle_mock_score)
+    app.router.add_get('/stats', handle_mock_stats)
+    return app
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description='Caching proxy for the Azure ML ROI scoring endpoint.')
+    subparsers = parser.add_subparsers(dest='command', help='Command to run')
+
+    serve_parser = subparsers.add_parser('serve', help='Run the caching proxy')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    serve_parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT,
+                              help=f'Port to listen on (default: {DEFAULT_PORT})')
+    serve_parser.add_argument('--upstream', default=os.getenv('ROI_UPSTREAM_URL', DEFAULT_UPSTREAM_URL),
+                              help='Scoring endpoint (default: ROI_UPSTREAM_URL or the Azure ML deployment)')
+    serve_parser.add_argument('--deployment', default=os.getenv('ROI_DEPLOYMENT', DEFAULT_DEPLOYMENT),
+                              help='Value of the azureml-model-deployment header')
+    serve_parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                              help=f'SQLite cache file (default: {DEFAULT_CACHE_PATH})')
+    serve_parser.add_argument('--ttl', type=float, default=DEFAULT_TTL_SECONDS,
+                              help=f'Seconds a response stays cached (default: {DEFAULT_TTL_SECONDS})')
+    serve_parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT_SECONDS,
+                              help=f'Upstream request timeout in seconds (default: {DEFAULT_TIMEOUT_SECONDS})')
+    serve_parser.add_argument('--precision', type=int, default=DEFAULT_NUMERIC_PRECISION,
+                              help='Round numeric fields in the cache key to this many significant digits '
+                                   '(default: 0, keeps them exact)')
+
+    mock_parser = subparsers.add_parser('mock', help='Run a local mock of the scoring endpoint')
+    mock_parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    mock_parser.add_argument('-p', '--port', type=int, default=DEFAULT_MOCK_PORT,
+                             help=f'Port to listen on (default: {DEFAULT_MOCK_PORT})')
+    mock_parser.add_argument('--delay', type=float, default=2.0, help='Seconds per response (default: 2)')
+    mock_parser.add_argument('--failure-rate', type=float, default=0.0,
+                             help='Share of requests answered with 503 (default: 0)')
+
+    purge_parser = subparsers.add_parser('purge', help='Delete expired cache entries')
+    purge_parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                              help=f'SQLite cache file (default: {DEFAULT_CACHE_PATH})')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command is None:
+        parser.print_help()
+        return
+
+    try:
+        if args.command == 'serve':
+            api_key = os.getenv('AZURE_API_KEY')
+            if not api_key:
+                logger.warning("AZURE_API_KEY is not set; forwarding the Authorization header of each request "
+                               "and caching responses per header")
+            proxy = ScoringProxy(ResponseCache(args.cache, args.ttl), args.upstream, api_key, args.deployment,
+                                 args.timeout, args.precision)
+            logger.info(f"Proxying {args.upstream} on http://{args.host}:{args.port} (cache: {args.cache})")
+            web.run_app(create_app(proxy), host=args.host, port=args.port, print=None)
+        elif args.command == 'mock':
+            logger.info(f"Mock scorer on http://{args.host}:{args.port}/score ({args.delay}s per response)")
+            web.run_app(create_mock_app(args.delay, args.failure_rate), host=args.host, port=args.port, print=None)
+        elif args.command == 'purge':
+            cache = ResponseCache(args.cache)
+            try:
+                removed = cache.purge()
+            finally:
+                cache.close()
+            logger.info(f"Removed {removed} expired cache entries")
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+ROI Formula Evaluator
+---------------------
+Parses the output of the ROI prompt flow and evaluates its formulas locally.
+
+The model answers with four bracketed blocks (see "prompt flow backup/pflow.txt"):
+
+    [Name: description : value, ...]     variables of the cost of change
+    [LaTeX expression]                   cost of change
+    [Name: description : value, ...]     variables of the cost of not changing
+    [LaTeX expression]                   cost of not changing
+
+The formulas are converted from LaTeX to Python expressions, checked
+against a whitelist of syntax nodes (numbers, variables, arithmetic and a
+few functions) and compiled once. Re-evaluating them with other variable
+values then takes microseconds instead of another model call, and
+evaluate_many() computes whole arrays of variable sets with NumPy.
+
+The net ROI is the cost of not changing minus the cost of change, as in
+the dashboard.
+
+    python roi_formulas.py model_output.txt --set Users_per_application=40000
+"""
+
+import re
+import ast
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+from functools import reduce
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Longest formula accepted, in characters
+MAX_FORMULA_LENGTH = 4000
+
+# Largest constant exponent accepted (x ** 1e9 is almost certainly a parsing error)
+MAX_EXPONENT = 100
+
+# LaTeX commands replaced by Python operators, longest first
+LATEX_OPERATORS = (
+    ('\\times', '*'), ('\\cdot', '*'), ('\\ast', '*'), ('\\div', '/'),
+    ('\\left', ''), ('\\right', ''), ('\\,', ' '), ('\\;', ' '), ('\\!', ''), ('\\quad', ' '),
+    ('\\_', '_'), ('\\{', '('), ('\\}', ')'),
+    ('\u00d7', '*'), ('\u22c5', '*'), ('\u00b7', '*'), ('\u00f7', '/'), ('\u2212', '-'),
+)
+
+# Functions a formula may call, as (scalar, vectorized) implementations
+FUNCTIONS = {
+    'sqrt': (math.sqrt, np.sqrt),
+    'exp': (math.exp, np.exp),
+    'log': (math.log, np.log),
+    'ln': (math.log, np.log),
+    'abs': (abs, np.abs),
+    # Like the vector versions, max(x) and min(x) of a single argument return it
+    'max': (lambda *args: max(args), lambda *args: reduce(np.maximum, args)),
+    'min': (lambda *args: min(args), lambda *args: reduce(np.minimum, args)),
+}
+
+ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant,
+                 ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd)
+
+TEXT_COMMAND_PATTERN = re.compile(r"\\(?:text|mathrm|mathit|textit|textbf|mathbf|operatorname)\s*\{([^{}]*)\}")
+SUBSCRIPT_PATTERN = re.compile(r"_\{([^{}]*)\}")
+FUNCTION_COMMAND_PATTERN = re.compile(r"\\(sqrt|exp|log|ln|max|min)\b")
+THINK_PATTERN = re.compile(r"<think>.*?(?:</think>|$)", re.DOTALL)
+BLOCK_PATTERN = re.compile(r"\[([^\[\]]*)\]")
+LEFT_SIDE_PATTERN = re.compile(r"^[^=(),]*=(?!=)")
+
+
+class FormulaError(ValueError):
+    """Raised when model output or a formula cannot be parsed or is not allowed."""
+
+
+def remove_think(text):
+    """Remove the <think>...</think> reasoning sections of a model answer."""
+    return THINK_PATTERN.sub('', text)
+
+
+def split_blocks(text):
+    """
+    Return the four bracketed blocks of a model answer.
+
+    Raises:
+        FormulaError: When the answer is "ERROR" or does not have exactly four blocks
+    """
+    text = remove_think(text).strip()
+    if text == 'ERROR':
+        raise FormulaError("The model rejected the input as not being an organizational change")
+    blocks = BLOCK_PATTERN.findall(text)
+    if len(blocks) != 4:
+        raise FormulaError(f"Expected 4 bracketed blocks in the model output, found {len(blocks)}")
+    return blocks
+
+
+def parse_variables(block):
+    """
+    Parse a variable block ("Name: description : value, ...").
+
+    Returns:
+        list: (name, description, value) tuples, value as float
+    """
+    variables = []
+    for item in block.split(','):
+        if not item.strip():
+            continue
+        name, separator, rest = item.partition(':')
+        description, separator2, value = rest.rpartition(':')
+        if not separator or not separator2:
+            raise FormulaError(f"Variable '{item.strip()}' is not in 'name: description : value' form")
+        try:
+            number = float(value.strip().replace('$', ''))
+        except ValueError:
+            raise FormulaError(f"Value of variable {name.strip()} is not a number: '{value.strip()}'")
+        variables.append((name.strip(), description.strip(), number))
+    return variables
+
+
+def _replace_frac(expression):
+    """Rewrite \\frac{a}{b} (possibly nested) as ((a)/(b))."""
+    while True:
+        start = expression.find('\\frac')
+        if start == -1:
+            return expression
+        groups = []
+        position = start + len('\\frac')
+        for _ in range(2):
+            while position < len(expression) and expression[position].isspace():
+                position += 1
+            if position >= len(expression) or expression[position] != '{':
+                raise FormulaError("\\frac must be followed by two {...} groups")
+            depth = 0
+            for end in range(position, len(expression)):
+                if expression[end] == '{':
+                    depth += 1
+                elif expression[end] == '}':
+                    depth -= 1
+                    if depth == 0:
+                        break
+            else:
+                raise FormulaError("Unbalanced braces in \\frac")
+            groups.append(expression[position + 1:end])
+            position = end + 1
+        expression = f"{expression[:start]}(({groups[0]})/({groups[1]})){expression[position:]}"
+
+
+def latex_to_python(latex):
+    """
+    Convert a LaTeX formula to Python expression syntax.
+
+    Handles \\frac, \\times/\\cdot/\\div, ^ powers, \\text{...} names, _{...}
+    subscripts, \\left/\\right and the functions in FUNCTIONS.
+    """
+    expression = latex.strip()
+    for delimiter in ('\\[', '\\]', '\\(', '\\)', '$$', '$'):
+        expression = expression.replace(delimiter, ' ')
+    # A leading "Cost =" is dropped (the prompt asks for the expression only)
+    expression = LEFT_SIDE_PATTERN.sub('', expression)
+
+    expression = TEXT_COMMAND_PATTERN.sub(r"\1", expression)
+    expression = SUBSCRIPT_PATTERN.sub(r"_\1", expression)
+    for command, replacement in LATEX_OPERATORS:
+        expression = expression.replace(command, replacement)
+    expression = _replace_frac(expression)
+    expression = FUNCTION_COMMAND_PATTERN.sub(r"\1", expression)
+    expression = expression.replace('^', '**').replace('{', '(').replace('}', ')')
+    if '\\' in expression:
+        command = re.search(r"\\[A-Za-z]*", expression).group(0)
+        raise FormulaError(f"Unsupported LaTeX command {command} in formula")
+    return ' '.join(expression.split())
+
+
+def validate(tree, names):
+    """
+    Check that a parsed expression only uses whitelisted syntax.
+
+    Args:
+        tree (ast.Expression): Parsed expression
+        names (set): Variable identifiers the expression may use
+
+    Raises:
+        FormulaError: For any other node, unknown names or unsupported calls
+    """
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise FormulaError(f"Formula contains unsupported syntax: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+            raise FormulaError(f"Formula contains a non-numeric constant: {node.value!r}")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+                raise FormulaError("Formula calls an unsupported function")
+        elif isinstance(node, ast.Name) and node.id not in names and node.id not in FUNCTIONS:
+            raise FormulaError(f"Formula uses unknown variable {node.id}")
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+            if isinstance(node.right, ast.Constant) and abs(node.right.value) > MAX_EXPONENT:
+                raise FormulaError(f"Exponent {node.right.value} is too large")
+
+
+def to_float_constants(tree):
+    """
+    Make every numeric constant of a validated expression a float.
+
+    Python ints have unbounded size, so a nested power such as 9 ** (9 ** 9)
+    would run practically forever; with floats it overflows immediately.
+    """
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant):
+            node.value = float(node.value)
+    return tree
+
+
+class Formula:
+    """A validated formula compiled into scalar and vectorized functions."""
+
+    def __init__(self, latex, variable_names):
+        """
+        Compile a formula.
+
+        Args:
+            latex (str): Formula as returned by the model
+            variable_names (list): Names of the variables the formula may use
+
+        Raises:
+            FormulaError: When the formula cannot be converted or is not allowed
+        """
+        if len(latex) > MAX_FORMULA_LENGTH:
+            raise FormulaError(f"Formula is longer than {MAX_FORMULA_LENGTH} characters")
+        self.latex = latex
+        self.expression = latex_to_python(latex)
+        if not self.expression:
+            raise FormulaError("Formula is empty")
+
+        # Replace variable names by safe identifiers, longest first so that
+        # a name that is a prefix of another is not replaced inside it
+        identifiers = {}
+        expression = self.expression
+        for index, name in enumerate(sorted(set(variable_names), key=len, reverse=True)):
+            identifier = f"_v{index}"
+            pattern = re.compile(r"(?<![A-Za-z0-9_])" + re.escape(name) + r"(?![A-Za-z0-9_])")
+            expression, count = pattern.subn(identifier, expression)
+            if count:
+                identifiers[identifier] = name
+
+        try:
+            tree = ast.parse(expression, mode='eval')
+        except SyntaxError as e:
+            raise FormulaError(f"Formula '{self.expression}' is not a valid expression: {e.msg}")
+        validate(tree, set(identifiers))
+        to_float_constants(tree)
+
+        # Only the variables the formula uses become arguments, in a fixed order
+        used = sorted({node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and node.id in identifiers})
+        self.variables = [identifiers[identifier] for identifier in used]
+
+        function = ast.Expression(body=ast.Lambda(
+            args=ast.arguments(posonlyargs=[], args=[ast.arg(arg=identifier) for identifier in used],
+                               kwonlyargs=[], kw_defaults=[], defaults=[]),
+            body=tree.body))
+        code = compile(ast.fix_missing_locations(function), '<formula>', 'eval')
+        builtins = {'__builtins__': {}}
+        self._scalar = eval(code, dict(builtins, **{name: pair[0] for name, pair in FUNCTIONS.items()}))
+        self._vector = eval(code, dict(builtins, **{name: pair[1] for name, pair in FUNCTIONS.items()}))
+
+    def __call__(self, values):
+        """
+        Evaluate the formula for one set of variable values.
+
+        Args:
+            values (dict): Value of every variable the formula uses
+
+        Returns:
+            float: The result (nan when it divides by zero or is not finite)
+        """
+        try:
+            result = float(self._scalar(*[float(values[name]) for name in self.variables]))
+            return result if math.isfinite(result) else math.nan
+        except KeyError as e:
+            raise FormulaError(f"No value for variable {e.args[0]}")
+        except (ZeroDivisionError, OverflowError, ValueError, TypeError):
+            # TypeError: a complex result (fractional power of a negative value) has no float
+            return math.nan
+
+    def evaluate_many(self, values):
+        """
+        Evaluate the formula for many sets of variable values at once.
+
+        Args:
+            values (dict): Variable name -> array of values (or a scalar used for every set)
+
+        Returns:
+            numpy.ndarray: One result per set (nan where a set divides by zero or is not finite)
+        """
+        try:
+            arguments = [np.asarray(values[name], dtype=np.float64) for name in self.variables]
+        except KeyError as e:
+            raise FormulaError(f"No value for variable {e.args[0]}")
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            try:
+                result = np.asarray(self._vector(*arguments), dtype=np.float64)
+            except (ZeroDivisionError, OverflowError, ValueError):
+                # Raised by parts that only involve constants (plain Python floats)
+                shape = np.broadcast(*arguments).shape if arguments else ()
+                result = np.full(shape, np.nan)
+        return np.where(np.isfinite(result), result, np.nan)
+
+    def __repr__(self):
+        return f"Formula({self.expression!r})"
+
+
+class ROIModel:
+    """Cost of change and cost of not changing formulas with their variables."""
+
+    def __init__(self, change_variables, change_formula, no_change_variables, no_change_formula):
+        """
+        Args:
+            change_variables (list): (name, description, value) of the cost of change variables
+            change_formula (str): LaTeX cost of change formula
+            no_change_variables (list): (name, description, value) of the cost of not changing variables
+            no_change_formula (str): LaTeX cost of not changing formula
+        """
+        self.change_variables = list(change_variables)
+        self.no_change_variables = list(no_change_variables)
+
+        # Variables of both blocks share one namespace, as in the dashboard
+        self.defaults = {}
+        self.descriptions = {}
+        for name, description, value in self.change_variables + self.no_change_variables:
+            self.defaults[name] = float(value)
+            self.descriptions[name] = description
+
+        names = list(self.defaults)
+        self.cost_of_change = Formula(change_formula, names)
+        self.cost_of_no_change = Formula(no_change_formula, names)
+
+    @classmethod
+    def from_text(cls, text):
+        """Parse a raw model answer (with or without its <think> section)."""
+        blocks = split_blocks(text)
+        return cls(parse_variables(blocks[0]), blocks[1], parse_variables(blocks[2]), blocks[3])
+
+    @classmethod
+    def from_response(cls, response):
+        """Build the model from a /score response (coceqn, cocvar, conceqn, concvar)."""
+        def variables(rows):
+            try:
+                return [(row[0], row[1], float(row[2])) for row in rows]
+            except (IndexError, TypeError, ValueError):
+                raise FormulaError("Variables must be [name, description, value] rows with numeric values")
+
+        try:
+            return cls(variables(response['cocvar']), response['coceqn'],
+                       variables(response['concvar']), response['conceqn'])
+        except KeyError as e:
+            raise FormulaError(f"Response has no {e.args[0]} field")
+
+    def unused_variables(self):
+        """Return the names of variables neither formula uses."""
+        used = set(self.cost_of_change.variables) | set(self.cost_of_no_change.variables)
+        return [name for name in self.defaults if name not in used]
+
+    def evaluate(self, overrides=None):
+        """
+        Compute the costs and net ROI.
+
+        Args:
+            overrides (dict, optional): Variable values replacing the model's estimates
+
+        Returns:
+            dict: cost_of_change, cost_of_no_change and roi
+        """
+        values = dict(self.defaults, **overrides) if overrides else self.defaults
+        change = self.cost_of_change(values)
+        no_change = self.cost_of_no_change(values)
+        return {'cost_of_change': change, 'cost_of_no_change': no_change, 'roi': no_change - change}
+
+    def evaluate_many(self, samples):
+        """
+        Compute the costs and net ROI for many variable sets at once.
+
+        Args:
+            samples (dict): Variable name -> array of values; variables that are
+                missing keep their default value
+
+        Returns:
+            dict: Arrays cost_of_change, cost_of_no_change and roi
+        """
+        values = dict(self.defaults, **samples)
+        change = self.cost_of_change.evaluate_many(values)
+        no_change = self.cost_of_no_change.evaluate_many(values)
+        size = max([np.size(value) for value in samples.values()] or [1])
+        change = np.broadcast_to(change, (size,)) if np.ndim(change) == 0 else change
+        no_change = np.broadcast_to(no_change, (size,)) if np.ndim(no_change) == 0 else no_change
+        return {'cost_of_change': change, 'cost_of_no_change': no_change, 'roi': no_change - change}
+
+
+def load_model(path):
+    """Load a model answer (text) or a /score response (JSON) from a file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return ROIModel.from_text(content)
+    if isinstance(data, dict) and 'response' in data and isinstance(data['response'], dict):
+        # A line of batch_score.py output
+        data = data['response']
+    return ROIModel.from_response(data)
+
+
+def benchmark(model, count=100000):
+    """Return (microseconds per scalar evaluation, microseconds per vectorized evaluation)."""
+    overrides = {name: value * 1.1 for name, value in model.defaults.items()}
+    start = time.perf_counter()
+    for _ in range(10000):
+        model.evaluate(overrides)
+    scalar = (time.perf_counter() - start) / 10000 * 1e6
+
+    rng = np.random.default_rng(0)
+    samples = {name: value * rng.uniform(0.5, 1.5, count) for name, value in model.defaults.items()}
+    start = time.perf_counter()
+    model.evaluate_many(samples)
+    vector = (time.perf_counter() - start) / count * 1e6
+    return scalar, vector
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description='Evaluate the ROI formulas of a prompt flow answer.')
+    parser.add_argument('input', help='Model answer (text with four bracketed blocks) or /score response (JSON)')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help='Override a variable value (can be repeated)')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    parser.add_argument('--bench', action='store_true', help='Measure evaluation speed')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    try:
+        model = load_model(args.input)
+        overrides = {}
+        for assignment in args.set:
+            name, separator, value = assignment.partition('=')
+            if not separator or name.strip() not in model.defaults:
+                raise FormulaError(f"--set {assignment}: expected NAME=VALUE with a variable of the model")
+            overrides[name.strip()] = float(value)
+
+        results = model.evaluate(overrides)
+        if args.json:
+            print(json.dumps(dict(results, variables=dict(model.defaults, **overrides)), indent=2))
+        else:
+            print(f"Cost of change:      {model.cost_of_change.expression}")
+            print(f"Cost of no change:   {model.cost_of_no_change.expression}")
+            for name, value in dict(model.defaults, **overrides).items():
+                print(f"  {name} = {value:g}  ({model.descriptions[name]})")
+            print(f"Cost of change:      {results['cost_of_change']:,.2f}")
+            print(f"Cost of no change:   {results['cost_of_no_change']:,.2f}")
+            print(f"Net ROI:             {results['roi']:,.2f}")
+        unused = model.unused_variables()
+        if unused:
+            logger.warning(f"Variables not used by either formula: {', '.join(unused)}")
+
+        if args.bench:
+            scalar, vector = benchmark(model)
+            logger.info(f"Scalar evaluation: {scalar:.2f} us, vectorized: {vector:.4f} us per variable set")
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+ROI Sensitivity Analysis
+------------------------
+Monte Carlo ranges and tornado sensitivity for the ROI formulas.
+
+The prompt flow gives a point estimate for every variable. Here each
+variable gets a distribution instead (by default a triangular one within
+--spread of the estimate), the cost of change and cost of not changing
+formulas (see roi_formulas.py) are evaluated for many samples at once with
+NumPy, in chunks so memory stays bounded, and the results are summarized:
+
+- percentiles, mean and standard deviation of both costs and the net ROI,
+  and the probability that the ROI is positive;
+- per variable, the Spearman rank correlation between the variable and
+  the ROI, and the ROI swing when only that variable moves from its 10th
+  to its 90th percentile (the bars of a tornado chart).
+
+    python roi_sensitivity.py model_output.txt -n 1000000
+    python roi_sensitivity.py model_output.txt --dist Employees=uniform:100:300 --fix Months_per_year
+"""
+
+import sys
+import json
+import time
+import logging
+import argparse
+
+import numpy as np
+
+from roi_formulas import FormulaError, load_model
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLES = 100000
+DEFAULT_CHUNK_SIZE = 65536
+DEFAULT_SPREAD = 0.2
+DEFAULT_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+# Samples kept to compute rank correlations and variable percentiles
+SENSITIVITY_SAMPLES = 50000
+
+# Percentiles of a variable used as the low and high ends of its tornado bar
+TORNADO_PERCENTILES = (10, 90)
+
+OUTPUTS = ('cost_of_change', 'cost_of_no_change', 'roi')
+
+
+class Distribution:
+    """Distribution of one variable."""
+
+    KINDS = {'fixed': 1, 'uniform': 2, 'triangular': 3, 'normal': 2, 'lognormal': 2}
+
+    def __init__(self, kind, *params):
+        """
+        Args:
+            kind (str): 'fixed' (value), 'uniform' (low, high), 'triangular' (low, mode, high),
+                'normal' (mean, standard deviation) or 'lognormal' (median, sigma of the log)
+            *params (float): Parameters of the distribution
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown distribution {kind}; expected one of {', '.join(self.KINDS)}")
+        if len(params) != self.KINDS[kind]:
+            raise ValueError(f"A {kind} distribution takes {self.KINDS[kind]} parameter(s), got {len(params)}")
+        self.kind = kind
+        self.params = tuple(float(param) for param in params)
+        if kind == 'uniform' and self.params[0] > self.params[1]:
+            raise ValueError("Uniform distribution needs low <= high")
+        if kind == 'triangular' and not self.params[0] <= self.params[1] <= self.params[2]:
+            raise ValueError("Triangular distribution needs low <= mode <= high")
+        # Normal samples of non-negative estimates are clipped at zero
+        self.non_negative = kind == 'normal' and self.params[0] >= 0
+
+    @classmethod
+    def around(cls, value, spread=DEFAULT_SPREAD):
+        """Triangular distribution within +-spread (relative) of a point estimate."""
+        if not value or not spread:
+            return cls('fixed', value)
+        low, high = sorted((value * (1 - spread), value * (1 + spread)))
+        return cls('triangular', low, value, high)
+
+    @classmethod
+    def parse(cls, text):
+        """Parse 'kind:param:param...' (for example 'uniform:100:300')."""
+        kind, *params = text.split(':')
+        try:
+            return cls(kind.strip().lower(), *[float(param) for param in params])
+        except ValueError as e:
+            raise ValueError(f"Invalid distribution '{text}': {str(e)}")
+
+    def sample(self, rng, size):
+        """Draw size samples."""
+        kind, params = self.kind, self.params
+        if kind == 'fixed':
+            return np.full(size, params[0])
+        if kind == 'uniform':
+            return rng.uniform(params[0], params[1], size)
+        if kind == 'triangular':
+            if params[0] == params[2]:
+                return np.full(size, params[0])
+            return rng.triangular(params[0], params[1], params[2], size)
+        if kind == 'normal':
+            values = rng.normal(params[0], params[1], size)
+            return np.maximum(values, 0, out=values) if self.non_negative else values
+        return params[0] * np.exp(rng.normal(0, params[1], size))
+
+    def __repr__(self):
+        return f"{self.kind}({', '.join(f'{param:g}' for param in self.params)})"
+
+
+def default_distributions(model, spread=DEFAULT_SPREAD, fixed=()):
+    """Return a distribution around the point estimate of every model variable."""
+    return {name: Distribution('fixed', value) if name in fixed else Distribution.around(value, spread)
+            for name, value in model.defaults.items()}
+
+
+def rank(values):
+    """Return the ranks of a 1-d array (ties broken by position)."""
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[np.argsort(values, kind='stable')] = np.arange(len(values))
+    return ranks
+
+
+def spearman(x, y):
+    """Spearman rank correlation of two arrays (nan when either is constant)."""
+    rx, ry = rank(x), rank(y)
+    rx -= rx.mean()
+    ry -= ry.mean()
+    denominator = np.sqrt((rx * rx).sum() * (ry * ry).sum())
+    return float((rx * ry).sum() / denominator) if denominator else float('nan')
+
+
+def summarize(values, percentiles):
+    """Return mean, standard deviation and percentiles of the finite values of an array."""
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return {'mean': None, 'std': None, 'invalid': int(len(values)), 'percentiles': {}}
+    return {
+        'mean': float(finite.mean()),
+        'std': float(finite.std()),
+        'invalid': int(len(values) - len(finite)),
+        'percentiles': {f"p{p:g}": float(value) for p, value in zip(percentiles, np.percentile(finite, percentiles))},
+    }
+
+
+def simulate(model, distributions=None, samples=DEFAULT_SAMPLES, chunk_size=DEFAULT_CHUNK_SIZE,
+             percentiles=DEFAULT_PERCENTILES, seed=0):
+    """
+    Run a Monte Carlo simulation of the ROI model.
+
+    Args:
+        model (roi_formulas.ROIModel): Parsed model
+        distributions (dict, optional): Variable name -> Distribution; variables without one
+            get default_distributions()
+        samples (int): Number of samples
+        chunk_size (int): Samples evaluated at once (bounds the memory of the inputs)
+        percentiles (tuple): Percentiles to report
+        seed (int): Random seed
+
+    Returns:
+        dict: Summary of each output, probability of a positive ROI and per-variable sensitivity
+    """
+    start = time.perf_counter()
+    distributions = dict(default_distributions(model), **(distributions or {}))
+    unknown = set(distributions) - set(model.defaults)
+    if unknown:
+        raise FormulaError(f"Distributions given for unknown variables: {', '.join(sorted(unknown))}")
+
+    rng = np.random.default_rng(seed)
+    outputs = {name: np.empty(samples, dtype=np.float64) for name in OUTPUTS}
+    kept = min(samples, SENSITIVITY_SAMPLES)
+    kept_inputs = {name: np.empty(kept, dtype=np.float64) for name in distributions}
+
+    for offset in range(0, samples, chunk_size):
+        size = min(chunk_size, samples - offset)
+        values = {name: distribution.sample(rng, size) for name, distribution in distributions.items()}
+        results = model.evaluate_many(values)
+        for name in OUTPUTS:
+            outputs[name][offset:offset + size] = results[name]
+        # Samples are independent, so the first ones are a fair subsample
+        if offset < kept:
+            count = min(size, kept - offset)
+            for name, value in values.items():
+                kept_inputs[name][offset:offset + count] = value[:count]
+
+    summary = {name: summarize(outputs[name], percentiles) for name in OUTPUTS}
+    roi = outputs['roi']
+    finite_roi = np.isfinite(roi)
+    probability_positive = float((roi[finite_roi] > 0).mean()) if finite_roi.any() else None
+
+    sensitivity = tornado(model, distributions, kept_inputs)
+    kept_roi = roi[:kept]
+    valid = np.isfinite(kept_roi)
+    for entry in sensitivity:
+        values = kept_inputs[entry['variable']]
+        entry['spearman'] = spearman(values[valid], kept_roi[valid]) if np.ptp(values) > 0 else 0.0
+
+    return {
+        'samples': samples,
+        'seconds': time.perf_counter() - start,
+        'base': model.evaluate(),
+        'summary': summary,
+        'probability_positive_roi': probability_positive,
+        'sensitivity': sensitivity,
+        'distributions': {name: repr(distribution) for name, distribution in distributions.items()},
+    }
+
+
+def tornado(model, distributions, inputs):
+    """
+    One-at-a-time sensitivity of the ROI.
+
+    Each variable is moved to the low and high TORNADO_PERCENTILES of its
+    sampled values while the others keep their point estimates. All
+    2 * n scenarios are evaluated as one batch.
+
+    Returns:
+        list: Dicts with variable, low, high, roi_at_low, roi_at_high and swing,
+              largest swing first
+    """
+    names = [name for name in distributions if name in model.defaults]
+    count = len(names)
+    if not count:
+        return []
+    values = {name: np.full(2 * count, model.defaults[name]) for name in names}
+    bounds = {}
+    for index, name in enumerate(names):
+        low, high = np.percentile(inputs[name], TORNADO_PERCENTILES)
+        bounds[name] = (float(low), float(high))
+        values[name][2 * index] = low
+        values[name][2 * index + 1] = high
+    roi = model.evaluate_many(values)['roi']
+
+    entries = []
+    for index, name in enumerate(names):
+        at_low, at_high = float(roi[2 * index]), float(roi[2 * index + 1])
+        entries.append({
+            'variable': name,
+            'low': bounds[name][0],
+            'high': bounds[name][1],
+            'roi_at_low': at_low,
+            'roi_at_high': at_high,
+            'swing': abs(at_high - at_low) if np.isfinite(at_high - at_low) else float('nan'),
+        })
+    entries.sort(key=lambda entry: -entry['swing'] if np.isfinite(entry['swing']) else 0)
+    return entries
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description='Monte Carlo ranges and sensitivity of the ROI formulas.')
+    parser.add_argument('input', help='Model answer (text with four bracketed blocks) or /score response (JSON)')
+    parser.add_argument('-n', '--samples', type=int, default=DEFAULT_SAMPLES,
+                        help=f'Number of samples (default: {DEFAULT_SAMPLES})')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'Samples evaluated at once (default: {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--spread', type=float, default=DEFAULT_SPREAD,
+                        help=f'Relative range of the default triangular distributions (default: {DEFAULT_SPREAD})')
+    parser.add_argument('--dist', action='append', default=[], metavar='NAME=KIND:PARAMS',
+                        help='Distribution of a variable, e.g. Employees=uniform:100:300 '
+                             '(kinds: fixed, uniform, triangular, normal, lognormal; can be repeated)')
+    parser.add_argument('--fix', action='append', default=[], metavar='NAME',
+                        help='Keep a variable at its estimate, e.g. a unit conversion (can be repeated)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    try:
+        model = load_model(args.input)
+        distributions = default_distributions(model, args.spread, set(args.fix))
+        for assignment in args.dist:
+            name, separator, spec = assignment.partition('=')
+            if not separator:
+                raise ValueError(f"--dist {assignment}: expected NAME=KIND:PARAMS")
+            distributions[name.strip()] = Distribution.parse(spec)
+
+        result = simulate(model, distributions, args.samples, args.chunk_size, seed=args.seed)
+        if args.json:
+            print(json.dumps(result, indent=2))
+            return
+
+        print(f"{result['samples']} samples in {result['seconds']:.3f}s")
+        for name in OUTPUTS:
+            stats = result['summary'][name]
+            if stats['mean'] is None:
+                print(f"{name}: no finite results")
+                continue
+            ranges = ', '.join(f"{key} {value:,.2f}" for key, value in stats['percentiles'].items())
+            print(f"{name}: base {result['base'][name]:,.2f}, mean {stats['mean']:,.2f}, {ranges}")
+        if result['probability_positive_roi'] is not None:
+            print(f"P(ROI > 0): {result['probability_positive_roi']:.1%}")
+        print("Sensitivity (ROI swing between the 10th and 90th percentile of each variable):")
+        for entry in result['sensitivity']:
+            print(f"  {entry['variable']:<32} swing {entry['swing']:>16,.2f}  "
+                  f"({entry['roi_at_low']:,.2f} .. {entry['roi_at_high']:,.2f}), spearman {entry['spearman']:+.2f}")
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
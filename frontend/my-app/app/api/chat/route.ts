@@ -14,9 +14,58 @@ const azureClient = createClient(
   new AzureKeyCredential(process.env.AZURE_LLM_KEY)
 );
 
+// Optional local retrieval service (scraperv2/retrieval_service.py) grounding answers in the article corpus
+const retrievalServiceUrl = process.env.RETRIEVAL_SERVICE_URL;
+const retrievalTimeoutMs = Number(process.env.RETRIEVAL_TIMEOUT_MS || 800);
+
+type Passage = {
+  title: string;
+  url: string;
+  heading: string | null;
+  text: string;
+  score: number;
+};
+
+async function fetchPassages(formData: Record<string, unknown>): Promise<Passage[]> {
+  if (!retrievalServiceUrl) {
+    return [];
+  }
+
+  // Answer without passages rather than exceed the request budget
+  const controller = new AbortController();
+  const timeout = setTimeout(() => controller.abort(), retrievalTimeoutMs);
+  try {
+    const response = await fetch(`${retrievalServiceUrl}/retrieve`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ formData, k: 5 }),
+      signal: controller.signal
+    });
+    if (!response.ok) {
+      console.error("Retrieval service error:", response.status, await response.text());
+      return [];
+    }
+    const result = await response.json();
+    return result.passages ?? [];
+  } catch (error) {
+    console.error("Retrieval service unavailable:", error instanceof Error ? error.message : String(error));
+    return [];
+  } finally {
+    clearTimeout(timeout);
+  }
+}
+
 export async function POST(request: Request) {
   try {
     const { messages, formData } = await request.json();
+    const passages = await fetchPassages(formData);
+    const references = passages.length
+      ? `
+Relevant excerpts from McKinsey articles (cite the article title when you use them):
+${passages.map((passage, index) => `[${index + 1}] ${passage.title}${passage.heading ? ` - ${passage.heading}` : ""} (${passage.url})
+${passage.text}`).join('\n\n')}
+`
+      : "";
     
     // Create system prompt with form data
     const systemPrompt = `You are an AI agent designed specifically to give advice on a particular change management scenario.
@@ -35,7 +84,7 @@ Percentage of employees needing retraining? : ${formData.employee_retraining_per
 Number of affected employees: ${formData.num_affected_employees}
 Employee morale (1-10): ${formData.employee_morale}
 Change details: ${formData.change_details}
-Based on this data, the user is expected to ask a few questions. Answer them to the best of your ability.
+${references}Based on this data, the user is expected to ask a few questions. Answer them to the best of your ability.
 You can use markdown formatting to make your responses more readable. Use:
 - Headers (##) for section titles
 - Bullet points (-) for lists
@@ -1,9 +1,12 @@
 import { NextResponse } from 'next/server';
 
+// Optional caching proxy (azureml_upload/roi_cache_proxy.py) in front of the scoring endpoint
+const roiProxyUrl = process.env.ROI_PROXY_URL;
+
 export async function POST(request: Request) {
   const apiKey = process.env.AZURE_API_KEY;
   
-  if (!apiKey) {
+  if (!apiKey && !roiProxyUrl) {
     console.error("AZURE_API_KEY is not defined in environment variables");
     return NextResponse.json(
       { error: "API key is not configured" }, 
@@ -18,10 +21,14 @@ export async function POST(request: Request) {
     
     // Set up request to Azure
     const requestHeaders = new Headers({"Content-Type": "application/json"});
-    requestHeaders.append("Authorization", "Bearer " + apiKey);
+    if (apiKey) {
+      requestHeaders.append("Authorization", "Bearer " + apiKey);
+    }
     requestHeaders.append("azureml-model-deployment", "hackathon2025-beta-dgese-1");
     
-    const url = "https://hackathon2025-beta-dgese.eastus2.inference.ml.azure.com/score";
+    const url = roiProxyUrl
+      ? `${roiProxyUrl}/score`
+      : "https://hackathon2025-beta-dgese.eastus2.inference.ml.azure.com/score";
     console.log("Making request to Azure ML endpoint:", url);
     
     // Forward the request to Azure
@@ -0,0 +1,7 @@
+"""
+Modules shared by the scraperv2 and azureml_upload scrapers.
+
+Both directories add the repository root to sys.path and import these as
+scraper_common.<module>, so neither has to put the other directory (with
+its own mckinsey_scraper.py) on the path.
+"""
@@ -0,0 +1,232 @@
+"""
+Watermark tracking for incremental exports.
+
+Every export target (an output file) has a small JSON sidecar,
+<output>.state.json, holding the high-water mark of the rows already
+exported. Incremental exports only select rows above the mark and write
+them to a new part file next to the output (<stem>.part-00001.csv, ...).
+compact_csv_parts() merges the output and its parts back into one file,
+keeping the newest version of every row.
+
+The part file helpers are also used by azureml_upload/database_utils.py,
+which keeps its watermarks in the database instead of a sidecar file.
+"""
+
+import csv
+import glob
+import json
+import os
+import sys
+
+
+def get_watermark_column(cursor, table_name, preferred=None):
+    """
+    Pick the column used as the export high-water mark.
+
+    Args:
+        cursor: SQLite cursor
+        table_name (str): Table being exported
+        preferred (str, optional): Column requested by the caller
+
+    Returns:
+        str: 'scraped_at' when the table tracks modification times, otherwise 'rowid'
+    """
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    columns = [column[1] for column in cursor.fetchall()]
+    if preferred:
+        if preferred != 'rowid' and preferred not in columns:
+            raise ValueError(f"Column {preferred} not found in table {table_name}")
+        return preferred
+    return 'scraped_at' if 'scraped_at' in columns else 'rowid'
+
+
+def get_key_column(cursor, table_name):
+    """Return the primary key column of a table (falls back to rowid)."""
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    for column in cursor.fetchall():
+        if column[5]:
+            return column[1]
+    return 'rowid'
+
+
+def build_selection(cursor, table_name, watermark_column, watermark=None):
+    """
+    Build the WHERE clause selecting rows above a high-water mark.
+
+    The upper bound is fixed before any rows are read, so rows written while
+    the export runs are picked up by the next export instead of being lost.
+
+    Args:
+        cursor: SQLite cursor
+        table_name (str): Table being exported
+        watermark_column (str): Column holding the high-water mark
+        watermark (optional): Mark of the previous export (None selects everything)
+
+    Returns:
+        tuple: (where clause, parameters, new high-water mark)
+    """
+    cursor.execute(f"SELECT MAX({watermark_column}) FROM {table_name}")
+    high_mark = cursor.fetchone()[0]
+
+    if high_mark is None:
+        return "WHERE 0", [], watermark
+    if watermark is None:
+        return f"WHERE {watermark_column} <= ? OR {watermark_column} IS NULL", [high_mark], high_mark
+    return (f"WHERE {watermark_column} > ? AND {watermark_column} <= ?",
+            [watermark, high_mark], high_mark)
+
+
+def part_paths(output_path):
+    """Return the existing part files of an export in the order they were written."""
+    stem, extension = os.path.splitext(output_path)
+    return sorted(glob.glob(f"{glob.escape(stem)}.part-[0-9][0-9][0-9][0-9][0-9]{extension}"))
+
+
+def next_part_path(output_path):
+    """Return the path for the next part file of an export."""
+    stem, extension = os.path.splitext(output_path)
+    parts = part_paths(output_path)
+    index = int(parts[-1][len(stem) + len('.part-'):len(parts[-1]) - len(extension)]) + 1 if parts else 1
+    return f"{stem}.part-{index:05d}{extension}"
+
+
+def clear_parts(output_path):
+    """Delete all part files of an export (after a full export or compaction)."""
+    for path in part_paths(output_path):
+        os.remove(path)
+
+
+class ExportState:
+    """High-water mark of one export target, persisted in a JSON sidecar file."""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.state_path = output_path + '.state.json'
+        self.table = None
+        self.watermark_column = None
+        self.watermark = None
+        self.key_column = None
+
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.table = data.get('table')
+            self.watermark_column = data.get('watermark_column')
+            self.watermark = data.get('watermark')
+            self.key_column = data.get('key_column')
+
+    def selection(self, cursor, table_name, watermark_column, incremental):
+        """
+        Build the WHERE clause selecting the rows for this export.
+
+        Returns:
+            tuple: (where clause, parameters, new high-water mark, whether this is a part export)
+        """
+        if not incremental or self.watermark is None:
+            return build_selection(cursor, table_name, watermark_column) + (False,)
+        if self.table != table_name or self.watermark_column != watermark_column:
+            raise ValueError(f"Export state for {self.output_path} tracks {self.table}.{self.watermark_column}; "
+                             f"run a full export to reset it")
+        return build_selection(cursor, table_name, watermark_column, self.watermark) + (True,)
+
+    def part_paths(self):
+        """Return the existing part files of this target in the order they were written."""
+        return part_paths(self.output_path)
+
+    def next_part_path(self):
+        """Return the path for the next part file."""
+        return next_part_path(self.output_path)
+
+    def clear_parts(self):
+        """Delete all part files (after a full export or compaction)."""
+        clear_parts(self.output_path)
+
+    def save(self, table_name, watermark_column, watermark, key_column):
+        """Persist the new high-water mark atomically."""
+        self.table = table_name
+        self.watermark_column = watermark_column
+        self.watermark = watermark
+        self.key_column = key_column
+
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'table': table_name,
+                'watermark_column': watermark_column,
+                'watermark': watermark,
+                'key_column': key_column,
+            }, f, indent=2)
+        os.replace(temp_path, self.state_path)
+
+
+def compact_csv_parts(output_path, key_column=None, encoding='utf-8-sig', **csv_options):
+    """
+    Merge an export and its incremental part files into a single CSV file.
+
+    When a row appears more than once (it changed between exports), only
+    its newest version is kept, at the position of that newest version.
+
+    Args:
+        output_path (str): Path of the full export
+        key_column (str, optional): Column identifying a row (default: the one in the
+            export state, or the first column when there is no export state)
+        encoding (str): File encoding of the export and its parts
+        **csv_options: csv.reader/csv.writer options the export was written with
+
+    Returns:
+        int: Number of rows in the merged file
+    """
+    state = ExportState(output_path)
+    key_column = key_column or state.key_column
+    first_column_key = key_column is None
+    sources = ([output_path] if os.path.exists(output_path) else []) + state.part_paths()
+    if not sources:
+        print(f"Nothing to compact for {output_path}", flush=True)
+        return 0
+
+    csv.field_size_limit(sys.maxsize)
+
+    # First pass: remember where the newest version of every key lives
+    header = None
+    latest = {}
+    for source_index, path in enumerate(sources):
+        with open(path, newline='', encoding=encoding) as f:
+            reader = csv.reader(f, **csv_options)
+            file_header = next(reader, None)
+            if file_header is None:
+                continue
+            if header is None:
+                header = file_header
+                if first_column_key:
+                    key_column = header[0]
+            elif file_header != header:
+                raise ValueError(f"{path} has different columns than {sources[0]}")
+            key_index = header.index(key_column) if key_column in header else None
+            for row_index, row in enumerate(reader):
+                key = row[key_index] if key_index is not None else (source_index, row_index)
+                latest[key] = (source_index, row_index)
+
+    if header is None:
+        return 0
+
+    # Second pass: write only the newest version of every row
+    key_index = header.index(key_column) if key_column in header else None
+    temp_path = output_path + '.compact.tmp'
+    written = 0
+    with open(temp_path, 'w', newline='', encoding=encoding) as out:
+        writer = csv.writer(out, **csv_options)
+        writer.writerow(header)
+        for source_index, path in enumerate(sources):
+            with open(path, newline='', encoding=encoding) as f:
+                reader = csv.reader(f, **csv_options)
+                next(reader, None)
+                for row_index, row in enumerate(reader):
+                    key = row[key_index] if key_index is not None else (source_index, row_index)
+                    if latest.get(key) == (source_index, row_index):
+                        writer.writerow(row)
+                        written += 1
+
+    os.replace(temp_path, output_path)
+    state.clear_parts()
+    print(f"Compacted {len(sources)} files into {output_path} ({written} rows)", flush=True)
+    return written
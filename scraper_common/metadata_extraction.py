@@ -0,0 +1,242 @@
+"""
+Author and date extraction from search listing text.
+
+Shared by scraperv2/link_extractor.py and azureml_upload/mckinsey_scraper.py. All
+patterns are compiled once. Month name dates are found in a single scan per
+text: the scan looks for the rare ", YYYY" tail of a date (a fast literal
+search) and checks the text before each hit, instead of searching the whole
+text once per month name. Dates are returned both as the matched text and
+as an ISO date.
+
+The results are the same as the original link_extractor functions:
+
+- authors: the text after the first "By " up to the end of its line (when
+  it contains no period), otherwise the first line starting with "By "
+- listing dates: the first "| Month D, YYYY" style date, otherwise the first
+  date starting with a month name, earlier months of the year first
+- search result dates: the first "D Month YYYY" date, otherwise the first
+  "Month D, YYYY" date
+"""
+
+import re
+import datetime
+
+NOT_SPECIFIED = "Not specified"
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+
+# Month names and abbreviations (lowercase) -> month number, for parse_date()
+MONTH_NUMBERS = {}
+for _number, _name in enumerate(MONTHS, 1):
+    MONTH_NUMBERS[_name.lower()] = _number
+    MONTH_NUMBERS[_name[:3].lower()] = _number
+MONTH_NUMBERS['sept'] = 9
+
+# "By Jane Doe and John Smith" up to the end of the line
+AUTHOR_PATTERN = re.compile(r'By\s+([^\.]+?)\n')
+
+# "By " followed by more text on the same line (fallback when the byline contains a period)
+BYLINE_PATTERN = re.compile(r'By (?=[^\n]*\S)')
+
+# "Category | Type | Month D, YYYY"
+LISTED_DATE_PATTERN = re.compile(r'\|\s*(\w+\s+\d{1,2},\s*\d{4})')
+
+# End of a "Month D, YYYY" date
+DATE_TAIL_PATTERN = re.compile(r',\s*\d{4}')
+
+# "D Month YYYY", or "Month D, YYYY"
+RESULT_DATE_PATTERN = re.compile(
+    r'\b(?P<day_first>\d{1,2}\s+\w+\s+\d{4})\b'
+    r'|\b(?P<month_first>\w+\s+\d{1,2},\s+\d{4})\b'
+)
+
+# Date formats understood by parse_date(): "Month D, YYYY", "D Month YYYY",
+# "YYYY-MM-DD", "Month YYYY" and "YYYY" (partial dates are the first day)
+DATE_PARTS_PATTERN = re.compile(
+    r'(?:(?P<month>[^\W\d_]+)\.?\s+(?P<day>\d{1,2}),?\s*'
+    r'|(?P<day_first>\d{1,2})\s+(?P<month_second>[^\W\d_]+)\.?,?\s+'
+    r'|(?P<month_only>[^\W\d_]+)\.?,?\s+'
+    r'|)'
+    r'(?P<year>\d{4})'
+)
+ISO_DATE_PATTERN = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+
+
+def find_authors(text):
+    """
+    Find the authors in a listing text.
+
+    Args:
+        text (str): Text of the listing container
+
+    Returns:
+        str: Authors, or NOT_SPECIFIED
+    """
+    match = AUTHOR_PATTERN.search(text)
+    if match:
+        return match.group(1).strip()
+
+    # First line that starts with "By " after optional whitespace
+    for match in BYLINE_PATTERN.finditer(text):
+        start = match.start()
+        line_start = text.rfind('\n', 0, start) + 1
+        if line_start == start or text[line_start:start].isspace():
+            line_end = text.find('\n', start)
+            line = text[line_start:line_end] if line_end >= 0 else text[line_start:]
+            return line.replace('By ', '').strip()
+
+    return NOT_SPECIFIED
+
+
+def find_listing_date(text):
+    """
+    Find the publication date in a listing text.
+
+    Args:
+        text (str): Text of the listing container
+
+    Returns:
+        str: Matched date text, or None
+    """
+    match = LISTED_DATE_PATTERN.search(text)
+    if match:
+        return match.group(1).strip()
+
+    # First date of the earliest month, checking the text before each ", YYYY"
+    best = None
+    best_index = len(MONTHS)
+    for tail in DATE_TAIL_PATTERN.finditer(text):
+        # One or two digit day, preceded by whitespace
+        day_end = tail.start()
+        day_start = day_end
+        while day_start > 0 and day_end - day_start < 3 and text[day_start - 1].isdecimal():
+            day_start -= 1
+        if not 1 <= day_end - day_start <= 2:
+            continue
+        word_end = day_start
+        while word_end > 0 and text[word_end - 1].isspace():
+            word_end -= 1
+        if word_end == day_start:
+            continue
+        for index in range(best_index):
+            name = MONTHS[index]
+            if text.endswith(name, 0, word_end):
+                best, best_index = text[word_end - len(name):tail.end()], index
+                break
+    return best
+
+
+def find_result_date(text):
+    """
+    Find the publication date in the text of a search result.
+
+    Args:
+        text (str): Text of the search result element
+
+    Returns:
+        str: Matched date text, or None
+    """
+    fallback = None
+    for match in RESULT_DATE_PATTERN.finditer(text):
+        day_first = match.group('day_first')
+        if day_first is not None:
+            return day_first
+        if fallback is None:
+            fallback = match.group('month_first')
+    return fallback
+
+
+def parse_date(text):
+    """
+    Parse a date ("January 22, 2020", "22 January 2020", "Jan 22, 2020", "2020-01-22").
+
+    "Month YYYY" and "YYYY" are parsed as the first day of the month or year.
+
+    Args:
+        text (str): Date text
+
+    Returns:
+        str: ISO date (YYYY-MM-DD), or None if the text is not a valid date
+    """
+    if not text:
+        return None
+    text = text.strip()
+    match = ISO_DATE_PATTERN.fullmatch(text)
+    if match:
+        year, month, day = (int(part) for part in match.groups())
+    else:
+        match = DATE_PARTS_PATTERN.fullmatch(text)
+        if not match:
+            return None
+        name = match.group('month') or match.group('month_second') or match.group('month_only')
+        month = MONTH_NUMBERS.get(name.lower()) if name else 1
+        if not month:
+            return None
+        year = int(match.group('year'))
+        day = int(match.group('day') or match.group('day_first') or 1)
+    try:
+        return datetime.date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def extract_metadata(text):
+    """
+    Extract the authors and publication date from a listing text.
+
+    Args:
+        text (str): Text of the listing container (None or empty for unknown)
+
+    Returns:
+        dict: authors and date (NOT_SPECIFIED when missing), and published_on
+              (ISO date or None)
+    """
+    if not text:
+        return {'authors': NOT_SPECIFIED, 'date': NOT_SPECIFIED, 'published_on': None}
+    date = find_listing_date(text)
+    return {
+        'authors': find_authors(text),
+        'date': date if date is not None else NOT_SPECIFIED,
+        'published_on': parse_date(date),
+    }
+
+
+def extract_metadata_batch(texts):
+    """
+    Extract metadata from many listing texts.
+
+    Several links often share the same container, so each distinct text is
+    only processed once.
+
+    Args:
+        texts (list): Listing texts (None or empty for unknown)
+
+    Returns:
+        list: One metadata dict per text (see extract_metadata); repeated texts
+              share the same dict
+    """
+    cache = {}
+    results = []
+    for text in texts:
+        metadata = cache.get(text)
+        if metadata is None:
+            metadata = cache[text] = extract_metadata(text)
+        results.append(metadata)
+    return results
+
+
+def extract_result_date(text):
+    """
+    Extract the publication date from the text of a search result.
+
+    Args:
+        text (str): Text of the search result element
+
+    Returns:
+        tuple: (matched date text or "", ISO date or None)
+    """
+    date = find_result_date(text) if text else None
+    if date is None:
+        return "", None
+    return date, parse_date(date)
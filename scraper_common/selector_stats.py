@@ -0,0 +1,252 @@
+"""
+Selector success statistics.
+
+The scrapers try a list of CSS selectors in order until one matches. This
+module counts, per lookup (e.g. "article_content"), how often each selector
+matched (hits) and how often it was tried without matching (misses), and
+moves selectors that keep missing to the end, which saves a browser
+round-trip per skipped selector.
+
+Selectors keep their default (priority) order, except that a selector that
+missed DEMOTE_AFTER times in a row is tried after all the others; its next
+hit restores it. A lower-priority selector is never tried before a
+higher-priority one that still matches now and then, so a page without
+the usual container does not change the selector used for the next pages.
+
+Lookups can be keyed by URL: counts are then kept per URL path pattern
+(see url_pattern()), falling back to the counts of all URLs for a pattern
+that has not been seen yet. Every EXPLORE_EVERY-th lookup of a key uses
+the default order, so a demoted selector that starts matching again after
+a site redesign is noticed. Counts are aged: once a selector has been tried
+MAX_COUNT times, all counts of its key are halved.
+
+The counts are kept in a JSON file between runs, written at most every
+save_interval seconds and when the program exits.
+
+Usage:
+    stats = get_stats()
+    for selector in stats.order('article_content', selectors, url):
+        elements = driver.find_elements(By.CSS_SELECTOR, selector)
+        stats.record('article_content', selector, bool(elements), url)
+        if elements:
+            break
+"""
+
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATS_PATH = 'selector_stats.json'
+
+# Seconds between saves of the statistics file
+SAVE_INTERVAL = 30
+
+# Hits plus misses of a selector after which the counts of its key are halved
+MAX_COUNT = 1000
+
+# Consecutive misses after which a selector is tried after all the others
+DEMOTE_AFTER = 5
+
+# Every n-th lookup of a key tries the selectors in their default order
+EXPLORE_EVERY = 20
+
+# Leading path segments kept in URL patterns
+PATTERN_DEPTH = 1
+
+
+def url_pattern(url, depth=PATTERN_DEPTH):
+    """
+    Reduce a URL to the pattern its statistics are kept under.
+
+    Pages of one site section usually share a template, so the pattern is the
+    host and the first path segments, e.g.
+    https://www.mckinsey.com/industries/retail/our-insights/some-article ->
+    mckinsey.com/industries/*
+
+    Args:
+        url (str): Page URL
+        depth (int): Number of leading path segments to keep
+
+    Returns:
+        str: URL pattern
+    """
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    segments = [segment for segment in parts.path.split('/') if segment]
+    if len(segments) > depth:
+        segments = segments[:depth] + ['*']
+    return '/'.join([host] + segments)
+
+
+class SelectorStats:
+    """Hit and miss counts of CSS selectors, persisted to a JSON file."""
+
+    def __init__(self, path=DEFAULT_STATS_PATH, save_interval=SAVE_INTERVAL, explore_every=EXPLORE_EVERY):
+        """
+        Args:
+            path (str): JSON file holding the counts (None to keep them in memory only)
+            save_interval (float): Minimum seconds between saves
+            explore_every (int): Use the default order for every n-th lookup of a key
+                                 (0 to always use the learned order)
+        """
+        self.path = path
+        self.save_interval = save_interval
+        self.explore_every = explore_every
+        self._counts = None  # key -> selector -> [hits, misses, consecutive misses]
+        self._lookups = {}   # key -> number of order() calls
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def _load(self):
+        counts = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for key, selectors in data.items():
+                    counts[key] = {}
+                    for selector, values in selectors.items():
+                        streak = int(values[2]) if len(values) > 2 else 0
+                        counts[key][selector] = [int(values[0]), int(values[1]), streak]
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning(f"Ignoring unreadable selector statistics {self.path}: {e}")
+                counts = {}
+        self._counts = counts
+
+    def _key_counts(self, key):
+        if self._counts is None:
+            self._load()
+        return self._counts.setdefault(key, {})
+
+    @staticmethod
+    def _keys(lookup, url):
+        """Keys a lookup is counted under: the lookup, and the lookup for the URL pattern."""
+        if url is None:
+            return [lookup]
+        return [f"{lookup} {url_pattern(url)}", lookup]
+
+    def order(self, lookup, selectors, url=None):
+        """
+        Order selectors, moving the ones that keep missing to the end.
+
+        Args:
+            lookup (str): Name of the lookup the selectors are used for
+            selectors (list): Selectors in their default (priority) order
+            url (str, optional): URL of the page the selectors are used on
+
+        Returns:
+            list: The same selectors, reordered
+        """
+        keys = self._keys(lookup, url)
+        with self._lock:
+            self._lookups[keys[0]] = lookups = self._lookups.get(keys[0], 0) + 1
+            if self.explore_every and lookups % self.explore_every == 0:
+                return list(selectors)
+            if self._counts is None:
+                self._load()
+            # The most specific key with counts
+            counts = next((self._counts[key] for key in keys if self._counts.get(key)), None)
+            if not counts:
+                return list(selectors)
+            demoted = {selector for selector in selectors
+                       if counts.get(selector, (0, 0, 0))[2] >= DEMOTE_AFTER}
+        if not demoted:
+            return list(selectors)
+        return ([selector for selector in selectors if selector not in demoted]
+                + [selector for selector in selectors if selector in demoted])
+
+    def record(self, lookup, selector, hit, url=None):
+        """
+        Record whether a selector matched.
+
+        Args:
+            lookup (str): Name of the lookup the selector was used for
+            selector (str): Selector that was tried
+            hit (bool): Whether it matched
+            url (str, optional): URL of the page the selector was used on
+        """
+        with self._lock:
+            for key in self._keys(lookup, url):
+                counts = self._key_counts(key)
+                selector_counts = counts.setdefault(selector, [0, 0, 0])
+                selector_counts[0 if hit else 1] += 1
+                selector_counts[2] = 0 if hit else selector_counts[2] + 1
+                if selector_counts[0] + selector_counts[1] >= MAX_COUNT:
+                    for pair in counts.values():
+                        pair[0] //= 2
+                        pair[1] //= 2
+            self._dirty = True
+            due = self.path and time.monotonic() - self._last_save >= self.save_interval
+        if due:
+            self.save()
+
+    def get_counts(self, lookup, url=None):
+        """
+        Get the counts of a lookup.
+
+        Args:
+            lookup (str): Name of the lookup
+            url (str, optional): Page URL, for the counts of its URL pattern
+
+        Returns:
+            dict: Selector -> (hits, misses, consecutive misses)
+        """
+        with self._lock:
+            if self._counts is None:
+                self._load()
+            counts = self._counts.get(self._keys(lookup, url)[0], {})
+            return {selector: tuple(pair) for selector, pair in counts.items()}
+
+    def save(self):
+        """Write the counts to the statistics file if they changed."""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            data = json.dumps(self._counts, indent=2, sort_keys=True)
+            self._dirty = False
+            self._last_save = time.monotonic()
+        try:
+            temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save selector statistics {self.path}: {e}")
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def _save_at_exit():
+    if _stats is not None:
+        _stats.save()
+
+
+atexit.register(_save_at_exit)
+
+
+def get_stats():
+    """Get the process-wide selector statistics, stored in DEFAULT_STATS_PATH."""
+    global _stats
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                _stats = SelectorStats()
+    return _stats
+
+
+def set_stats(stats):
+    """Replace the process-wide selector statistics (e.g. SelectorStats(path=None) for benchmarks)."""
+    global _stats
+    with _stats_lock:
+        _stats = stats
@@ -20,12 +20,24 @@ import math
 
 # Import utilities
 from cookie_handler import handle_cookies
+# Modules shared with azureml_upload live in the scraper_common package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from scraper_common.metadata_extraction import parse_date
+from scraper_common.selector_stats import get_stats as get_selector_stats
+from published_dates import backfill_published_on
 
 def setup_databases():
     """Connect to the existing SQLite database and create a new one for content if needed."""
     # Connect to the original database
     source_conn = sqlite3.connect('mckinsey_articles.db', check_same_thread=False)
     
+    # Parse the dates of articles scraped before published_on existed, so the newest are processed first
+    backfill = backfill_published_on(source_conn, 'articles')
+    if backfill['parsed']:
+        print(f"Parsed publication dates of {backfill['parsed']} articles", flush=True)
+    
     # Create or connect to content database
     content_db_path = 'mckinsey_article_content.db'
     
@@ -45,11 +57,17 @@ def setup_databases():
         date TEXT,
         url TEXT,
         page_number INTEGER,
-        content TEXT
+        content TEXT,
+        published_on DATE
     )
     ''')
     content_conn.commit()
     
+    # Content stored before published_on existed needs it too, or date filters would skip it
+    backfill = backfill_published_on(content_conn, 'article_content')
+    if backfill['parsed']:
+        print(f"Parsed publication dates of {backfill['parsed']} stored articles", flush=True)
+    
     if db_exists:
         print(f"Connected to existing content database: {content_db_path}", flush=True)
         
@@ -79,6 +97,9 @@ def get_unprocessed_articles(source_conn, content_conn, limit=None):
         query = "SELECT id, title, authors, date, url, page_number FROM articles"
         params = []
     
+    # Newest articles first; articles without a parsed date last
+    query += " ORDER BY published_on IS NULL, published_on DESC, id"
+    
     # Add limit if specified
     if limit:
         query += f" LIMIT {limit}"
@@ -96,8 +117,8 @@ def save_article_content(conn, article_id, title, authors, date, url, page_numbe
     """Save article content to the new database."""
     cursor = conn.cursor()
     cursor.execute(
-        "INSERT INTO article_content (article_id, title, authors, date, url, page_number, content) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        (article_id, title, authors, date, url, page_number, content)
+        "INSERT INTO article_content (article_id, title, authors, date, url, page_number, content, published_on) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (article_id, title, authors, date, url, page_number, content, parse_date(date))
     )
     conn.commit()
     print(f"[OK] Saved article ID {article_id} to database", flush=True)
@@ -170,7 +191,8 @@ def extract_article_content(driver, url):
         # Scroll the page to ensure all content is loaded
         scroll_page(driver)
         
-        # Selectors to try for article content (in priority order)
+        # Selectors to try for article content (in priority order; the one that
+        # usually matches pages like this one is tried first, see selector_stats.py)
         content_selectors = [
             "article .body-content", 
             "article .article-body",
@@ -184,9 +206,11 @@ def extract_article_content(driver, url):
         article_text = ""
         
         # Try each selector
-        for selector in content_selectors:
+        selector_stats = get_selector_stats()
+        for selector in selector_stats.order('article_content', content_selectors, url):
             try:
                 elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                selector_stats.record('article_content', selector, bool(elements), url)
                 if elements:
                     # Use the first matching element
                     article_text = elements[0].text
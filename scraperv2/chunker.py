@@ -0,0 +1,478 @@
+"""
+Split article content into token-bounded, overlapping retrieval chunks.
+
+Articles in article_content are split on paragraph and heading boundaries
+into chunks of at most --max-tokens estimated tokens. Consecutive chunks of
+an article overlap by up to --overlap-tokens, so a passage cut at a chunk
+boundary is still retrievable as a whole. Chunks are stored in a `chunks`
+table next to the content, with their token estimate and character offsets
+in the original article.
+
+Runs are incremental: only articles that are new, whose content changed or
+that were chunked with different settings are (re)chunked.
+
+    python chunker.py -d mckinsey_article_content.db --workers 4
+"""
+
+import sqlite3
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from dedup import duplicate_filter
+
+# Chunk size limits in estimated tokens
+DEFAULT_MAX_TOKENS = 400
+DEFAULT_OVERLAP_TOKENS = 60
+DEFAULT_MIN_TOKENS = 120
+
+# Articles sent to a worker process per task
+DEFAULT_BATCH_SIZE = 50
+
+# Word length covered by one estimated token; long words count as several
+# tokens. Calibrated to ~4.2 characters per token on the article corpus,
+# in line with BPE tokenizers on English prose.
+CHARS_PER_TOKEN = 6
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+PARAGRAPH_PATTERN = re.compile(r"[^\n]+(?:\n(?!\s*\n)[^\n]+)*")
+SENTENCE_PATTERN = re.compile(r"[^.!?]+(?:[.!?]+[\"')\]]*|$)\s*")
+WORD_PATTERN = re.compile(r"\S+\s*")
+
+# Placeholders stored by article_parser when extraction failed
+FAILED_CONTENT_PREFIXES = ("No content could be extracted", "Error: ")
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of model tokens in a text without a tokenizer.
+
+    Every word or punctuation mark counts as one token, plus one more for
+    every further CHARS_PER_TOKEN characters of long words and numbers.
+    """
+    return sum(1 + (len(piece) - 1) // CHARS_PER_TOKEN
+               for piece in TOKEN_PATTERN.findall(text))
+
+
+def is_heading(text):
+    """Heuristically detect a heading line (short, no sentence punctuation)."""
+    text = text.strip()
+    if text.startswith('#'):
+        return True
+    if not text or len(text) > 100 or '\n' in text:
+        return False
+    return text[-1] not in '.!?:;,"\'' and len(text.split()) <= 12
+
+
+def split_units(text, max_tokens):
+    """
+    Split text into (start, end, tokens, is_heading) units of at most max_tokens.
+
+    Units are paragraphs; paragraphs that are too long are split into
+    sentences, and sentences that are still too long into word windows.
+    Offsets refer to the original text.
+    """
+    units = []
+    for match in PARAGRAPH_PATTERN.finditer(text):
+        paragraph = match.group()
+        if not paragraph.strip():
+            continue
+        tokens = estimate_tokens(paragraph)
+        if tokens <= max_tokens:
+            units.append((match.start(), match.end(), tokens, is_heading(paragraph)))
+            continue
+
+        for sentence in SENTENCE_PATTERN.finditer(paragraph):
+            if not sentence.group().strip():
+                continue
+            start = match.start() + sentence.start()
+            tokens = estimate_tokens(sentence.group())
+            if tokens <= max_tokens:
+                units.append((start, match.start() + sentence.end(), tokens, False))
+                continue
+
+            # A single sentence longer than a chunk: cut it into word windows
+            window_start, window_end, window_tokens = None, None, 0
+            for word in WORD_PATTERN.finditer(sentence.group()):
+                word_tokens = estimate_tokens(word.group())
+                if window_start is not None and window_tokens + word_tokens > max_tokens:
+                    units.append((window_start, window_end, window_tokens, False))
+                    window_start, window_tokens = None, 0
+                if window_start is None:
+                    window_start = start + word.start()
+                window_end = start + word.end()
+                window_tokens += word_tokens
+            if window_start is not None:
+                units.append((window_start, window_end, window_tokens, False))
+    return units
+
+
+def chunk_text(text, max_tokens=DEFAULT_MAX_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS,
+               min_tokens=DEFAULT_MIN_TOKENS):
+    """
+    Split a text into token-bounded, overlapping chunks.
+
+    A chunk ends before a unit that would push it over max_tokens, and also
+    at a heading once it holds at least min_tokens, so chunks follow the
+    article's sections where possible. The next chunk repeats the trailing
+    units of the previous one, up to overlap_tokens.
+
+    Args:
+        text (str): Article text
+        max_tokens (int): Maximum estimated tokens per chunk
+        overlap_tokens (int): Maximum estimated tokens repeated between chunks
+        min_tokens (int): Minimum size of a chunk before a heading starts a new one
+
+    Returns:
+        list: Chunks as dicts with content, heading, token_count, char_start and char_end
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+
+    units = split_units(text, max_tokens)
+    chunks = []
+    current = []
+    current_tokens = 0
+    heading = None
+    chunk_heading = None
+
+    def flush():
+        nonlocal current, current_tokens, chunk_heading
+        start, end = current[0][0], current[-1][1]
+        chunks.append({
+            'content': text[start:end].strip(),
+            'heading': chunk_heading,
+            'token_count': estimate_tokens(text[start:end]),
+            'char_start': start,
+            'char_end': end,
+        })
+
+        # Carry the trailing units into the next chunk, unless they are only headings
+        overlap, overlap_tokens_used = [], 0
+        for unit in reversed(current):
+            if overlap_tokens_used + unit[2] > overlap_tokens:
+                break
+            overlap.insert(0, unit)
+            overlap_tokens_used += unit[2]
+        if all(unit[3] for unit in overlap):
+            overlap, overlap_tokens_used = [], 0
+        current, current_tokens = overlap, overlap_tokens_used
+        chunk_heading = None
+
+    for unit in units:
+        starts_section = unit[3] and current_tokens >= min_tokens
+        if current and (starts_section or current_tokens + unit[2] > max_tokens):
+            flush()
+            if starts_section:
+                # Don't carry the previous section's text into the new section
+                current, current_tokens = [], 0
+            while current and current_tokens + unit[2] > max_tokens:
+                current_tokens -= current.pop(0)[2]
+
+        if unit[3]:
+            heading = text[unit[0]:unit[1]].strip().lstrip('#').strip()
+        if chunk_heading is None:
+            chunk_heading = heading
+        current.append(unit)
+        current_tokens += unit[2]
+
+    # Emit the rest, unless it is only overlap already contained in the previous chunk
+    if current and (not chunks or current[-1][1] > chunks[-1]['char_end']):
+        flush()
+    return chunks
+
+
+def content_hash(text):
+    """Return the SHA-1 hex digest of a text."""
+    return hashlib.sha1(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def chunk_articles_batch(articles, max_tokens, overlap_tokens, min_tokens):
+    """
+    Chunk a batch of articles.
+
+    Runs in worker processes, so it only takes and returns plain tuples.
+
+    Returns:
+        list: (article_id, content hash, content length, chunk rows) per article
+    """
+    results = []
+    for article_id, content in articles:
+        content = content or ''
+        if not content.strip() or content.startswith(FAILED_CONTENT_PREFIXES):
+            chunks = []
+        else:
+            chunks = chunk_text(content, max_tokens, overlap_tokens, min_tokens)
+        rows = [(article_id, index, chunk['heading'], chunk['content'], chunk['token_count'],
+                 chunk['char_start'], chunk['char_end'], content_hash(chunk['content']))
+                for index, chunk in enumerate(chunks)]
+        results.append((article_id, content_hash(content), len(content), rows))
+    return results
+
+
+def setup_chunk_tables(conn):
+    """Create the chunk tables if they don't exist."""
+    conn.executescript('''
+    CREATE TABLE IF NOT EXISTS chunks (
+        chunk_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        article_id INTEGER NOT NULL,
+        chunk_index INTEGER NOT NULL,
+        heading TEXT,
+        content TEXT NOT NULL,
+        token_count INTEGER NOT NULL,
+        char_start INTEGER NOT NULL,
+        char_end INTEGER NOT NULL,
+        content_hash TEXT NOT NULL,
+        UNIQUE (article_id, chunk_index)
+    );
+    CREATE TABLE IF NOT EXISTS chunked_articles (
+        article_id INTEGER PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        content_length INTEGER NOT NULL,
+        settings TEXT NOT NULL,
+        chunk_count INTEGER NOT NULL,
+        chunked_at TEXT NOT NULL
+    );
+    ''')
+    conn.commit()
+
+
+def find_stale_articles(conn, settings, rehash=False, skip_duplicates=False):
+    """
+    Return the ids of articles that need to be (re)chunked.
+
+    An article is stale when it was never chunked, was chunked with other
+    settings, or its content length changed. With rehash, the content hash
+    of every article is compared as well. With skip_duplicates, articles
+    recorded as near-duplicates by dedup.py are never stale.
+    """
+    cursor = conn.cursor()
+    condition = duplicate_filter(cursor, 'a.article_id') if skip_duplicates else None
+    cursor.execute(f'''
+    SELECT a.article_id FROM article_content a
+    LEFT JOIN chunked_articles c ON c.article_id = a.article_id
+    WHERE (c.article_id IS NULL OR c.settings != ? OR c.content_length != length(COALESCE(a.content, '')))
+    {'AND ' + condition if condition else ''}
+    ''', (settings,))
+    stale = [row[0] for row in cursor.fetchall()]
+
+    if rehash:
+        known = set(stale)
+        cursor.execute(f'''
+        SELECT a.article_id, a.content, c.content_hash FROM article_content a
+        JOIN chunked_articles c ON c.article_id = a.article_id
+        {'WHERE ' + condition if condition else ''}
+        ''')
+        for article_id, content, recorded_hash in cursor:
+            if article_id not in known and content_hash(content or '') != recorded_hash:
+                stale.append(article_id)
+    return stale
+
+
+def iter_article_batches(conn, article_ids, batch_size):
+    """Yield (article_id, content) batches for the given ids."""
+    cursor = conn.cursor()
+    for offset in range(0, len(article_ids), batch_size):
+        ids = article_ids[offset:offset + batch_size]
+        placeholders = ','.join(['?'] * len(ids))
+        cursor.execute(f"SELECT article_id, content FROM article_content WHERE article_id IN ({placeholders})", ids)
+        yield cursor.fetchall()
+
+
+def chunk_database(db_path, max_tokens=DEFAULT_MAX_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS,
+                   min_tokens=DEFAULT_MIN_TOKENS, workers=1, batch_size=DEFAULT_BATCH_SIZE,
+                   rehash=False, rebuild=False, skip_duplicates=False):
+    """
+    Chunk every new or changed article of a content database.
+
+    Args:
+        db_path (str): Path to the content database
+        max_tokens (int): Maximum estimated tokens per chunk
+        overlap_tokens (int): Maximum estimated tokens repeated between chunks
+        min_tokens (int): Minimum size of a chunk before a heading starts a new one
+        workers (int): Number of worker processes
+        batch_size (int): Articles per worker task
+        rehash (bool): Also detect changed content by hash, not only by length
+        rebuild (bool): Drop all chunks and chunk every article again
+        skip_duplicates (bool): Do not chunk articles recorded as near-duplicates by dedup.py
+                                (and drop their existing chunks)
+
+    Returns:
+        dict: Run statistics
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database {db_path} not found")
+
+    start_time = time.time()
+    settings = json.dumps({'max_tokens': max_tokens, 'overlap_tokens': overlap_tokens,
+                           'min_tokens': min_tokens, 'chars_per_token': CHARS_PER_TOKEN}, sort_keys=True)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        setup_chunk_tables(conn)
+        if rebuild:
+            conn.execute("DELETE FROM chunks")
+            conn.execute("DELETE FROM chunked_articles")
+            conn.commit()
+
+        # Drop chunks of articles that no longer exist
+        conn.execute("DELETE FROM chunks WHERE article_id NOT IN (SELECT article_id FROM article_content)")
+        conn.execute("DELETE FROM chunked_articles WHERE article_id NOT IN (SELECT article_id FROM article_content)")
+        if skip_duplicates:
+            if duplicate_filter(conn.cursor()):
+                conn.execute("DELETE FROM chunks WHERE article_id IN (SELECT article_id FROM duplicate_of)")
+                conn.execute("DELETE FROM chunked_articles WHERE article_id IN (SELECT article_id FROM duplicate_of)")
+            else:
+                print("No duplicate information found (run dedup.py first), chunking all articles", flush=True)
+        conn.commit()
+
+        stale = find_stale_articles(conn, settings, rehash, skip_duplicates)
+        if not stale:
+            print("All articles are already chunked", flush=True)
+            return {'articles': 0, 'chunks': 0, 'seconds': time.time() - start_time}
+
+        print(f"Chunking {len(stale)} articles (max {max_tokens} tokens, overlap {overlap_tokens}) "
+              f"with {workers} worker(s)", flush=True)
+
+        batches = iter_article_batches(conn, stale, batch_size)
+        if len(stale) <= batch_size:
+            workers = 1
+
+        def results():
+            if workers <= 1:
+                for batch in batches:
+                    yield chunk_articles_batch(batch, max_tokens, overlap_tokens, min_tokens)
+                return
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = deque()
+                for batch in batches:
+                    pending.append(executor.submit(chunk_articles_batch, batch, max_tokens, overlap_tokens, min_tokens))
+                    # Keep a bounded number of batches in flight
+                    if len(pending) >= workers * 2:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+
+        article_count = 0
+        chunk_count = 0
+        write_conn = sqlite3.connect(db_path)
+        try:
+            for batch_results in results():
+                now = datetime.now().isoformat(timespec='seconds')
+                with write_conn:
+                    for article_id, digest, length, rows in batch_results:
+                        write_conn.execute("DELETE FROM chunks WHERE article_id = ?", (article_id,))
+                        write_conn.executemany('''
+                        INSERT INTO chunks (article_id, chunk_index, heading, content, token_count,
+                                            char_start, char_end, content_hash)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ''', rows)
+                        write_conn.execute('''
+                        INSERT OR REPLACE INTO chunked_articles
+                        (article_id, content_hash, content_length, settings, chunk_count, chunked_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ''', (article_id, digest, length, settings, len(rows), now))
+                        article_count += 1
+                        chunk_count += len(rows)
+                print(f"  {article_count}/{len(stale)} articles chunked", flush=True)
+        finally:
+            write_conn.close()
+
+        elapsed = time.time() - start_time
+        print(f"Stored {chunk_count} chunks for {article_count} articles in {elapsed:.2f}s "
+              f"({article_count / elapsed if elapsed > 0 else article_count:.0f} articles/s)", flush=True)
+        return {'articles': article_count, 'chunks': chunk_count, 'seconds': elapsed}
+
+    finally:
+        conn.close()
+
+
+def get_article_chunks(conn, article_id):
+    """Return the chunks of one article in order, as (chunk_index, heading, content, token_count) tuples."""
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT chunk_index, heading, content, token_count FROM chunks
+    WHERE article_id = ? ORDER BY chunk_index
+    ''', (article_id,))
+    return cursor.fetchall()
+
+
+def get_chunk_stats(conn):
+    """Return summary statistics of the chunks table."""
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT COUNT(*), COUNT(DISTINCT article_id), AVG(token_count), MAX(token_count), SUM(token_count)
+    FROM chunks
+    ''')
+    chunks, articles, average, largest, total = cursor.fetchone()
+    return {
+        'chunks': chunks,
+        'articles': articles,
+        'avg_tokens': average or 0,
+        'max_tokens': largest or 0,
+        'total_tokens': total or 0,
+    }
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description='Split article content into retrieval chunks.')
+    parser.add_argument('-d', '--database', default='mckinsey_article_content.db',
+                        help='Path to the content database (default: mckinsey_article_content.db)')
+    parser.add_argument('--max-tokens', type=int, default=DEFAULT_MAX_TOKENS,
+                        help=f'Maximum estimated tokens per chunk (default: {DEFAULT_MAX_TOKENS})')
+    parser.add_argument('--overlap-tokens', type=int, default=DEFAULT_OVERLAP_TOKENS,
+                        help=f'Estimated tokens repeated between consecutive chunks (default: {DEFAULT_OVERLAP_TOKENS})')
+    parser.add_argument('--min-tokens', type=int, default=DEFAULT_MIN_TOKENS,
+                        help=f'Minimum chunk size before a heading starts a new chunk (default: {DEFAULT_MIN_TOKENS})')
+    parser.add_argument('-w', '--workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help='Number of worker processes (default: up to 4)')
+    parser.add_argument('-b', '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Articles per worker task (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--rehash', action='store_true',
+                        help='Detect changed articles by content hash instead of length only')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Drop all chunks and chunk every article again')
+    parser.add_argument('--skip-duplicates', action='store_true',
+                        help='Skip articles recorded as near-duplicates by dedup.py (and drop their chunks)')
+    parser.add_argument('--stats', action='store_true',
+                        help='Print chunk statistics and exit')
+
+    args = parser.parse_args()
+
+    try:
+        if args.stats:
+            conn = sqlite3.connect(args.database)
+            try:
+                setup_chunk_tables(conn)
+                stats = get_chunk_stats(conn)
+            finally:
+                conn.close()
+            print(f"{stats['chunks']} chunks for {stats['articles']} articles, "
+                  f"{stats['avg_tokens']:.0f} tokens on average (max {stats['max_tokens']}), "
+                  f"{stats['total_tokens']} tokens in total", flush=True)
+            return
+
+        chunk_database(args.database,
+                       max_tokens=args.max_tokens,
+                       overlap_tokens=args.overlap_tokens,
+                       min_tokens=args.min_tokens,
+                       workers=args.workers,
+                       batch_size=args.batch_size,
+                       rehash=args.rehash,
+                       rebuild=args.rebuild,
+                       skip_duplicates=args.skip_duplicates)
+    except Exception as e:
+        print(f"Error during chunking: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
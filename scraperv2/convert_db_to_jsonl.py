@@ -1,34 +1,551 @@
+"""
+Utility script to export the McKinsey article database to sharded JSON Lines.
+
+Rows are streamed from SQLite in batches and serialized by column name, then
+written as gzip or zstd compressed shards of a configurable number of rows.
+Shards are compressed and written in parallel, and a manifest records the
+row count, size and SHA-256 checksum of every shard.
+
+The upload command pushes the shards to the prompt-flow datastore in
+parallel, one shard per task, and skips shards that were already uploaded
+so that a failed upload can simply be re-run.
+
+With --incremental, the export only writes rows above the high-water mark
+recorded in the manifest and appends them as new shards; the compact command
+rewrites all shards into full-size ones, keeping the newest version of every row.
+"""
+
 import sqlite3
 import json
 import os
+import sys
+import gzip
+import time
+import hashlib
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+# Modules shared with azureml_upload live in the scraper_common package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from scraper_common.export_state import build_selection, get_key_column, get_watermark_column
+
+# Rows fetched from SQLite per batch
+DEFAULT_BATCH_SIZE = 1000
+
+# Rows written per shard
+DEFAULT_SHARD_ROWS = 5000
+
+MANIFEST_NAME = 'manifest.json'
+UPLOAD_STATE_NAME = 'upload_state.json'
+
+COMPRESSION_EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+    'none': '',
+}
+
+
+def compress_bytes(data, compression, level=None):
+    """Compress a shard payload."""
+    if compression == 'gzip':
+        # A fixed mtime keeps the output (and its checksum) reproducible
+        return gzip.compress(data, compresslevel=level or 6, mtime=0)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=level or 3).compress(data)
+    if compression == 'none':
+        return data
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def decompress_bytes(data, compression):
+    """Decompress a shard payload."""
+    if compression == 'gzip':
+        return gzip.decompress(data)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    if compression == 'none':
+        return data
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def read_shard_lines(path, compression):
+    """Return the JSON lines of one shard."""
+    with open(path, 'rb') as f:
+        return decompress_bytes(f.read(), compression).decode('utf-8').splitlines(keepends=True)
+
+
+def write_shard(path, lines, compression, level=None):
+    """
+    Compress and write one shard atomically.
+
+    Args:
+        path (str): Output path of the shard
+        lines (list): Serialized JSON lines, each ending with a newline
+        compression (str): 'gzip', 'zstd' or 'none'
+        level (int, optional): Compression level
+
+    Returns:
+        dict: Manifest entry for the shard
+    """
+    data = ''.join(lines).encode('utf-8')
+    payload = compress_bytes(data, compression, level)
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(temp_path, path)
+
+    return {
+        'file': os.path.basename(path),
+        'rows': len(lines),
+        'bytes': len(payload),
+        'uncompressed_bytes': len(data),
+        'sha256': hashlib.sha256(payload).hexdigest(),
+    }
+
+
+def write_shards(lines, output_dir, table, compression, level=None, shard_rows=DEFAULT_SHARD_ROWS,
+                 workers=4, first_index=0):
+    """
+    Group serialized lines into shards and write them concurrently.
+
+    Args:
+        lines (iterable): JSON lines, each ending with a newline
+        output_dir (str): Directory for the shards
+        table (str): Table name used in the shard file names
+        compression (str): 'gzip', 'zstd' or 'none'
+        level (int, optional): Compression level
+        shard_rows (int): Rows per shard
+        workers (int): Number of shards compressed and written concurrently
+        first_index (int): Index of the first shard file
+
+    Returns:
+        list: Manifest entries of the written shards, in order
+    """
+    extension = '.jsonl' + COMPRESSION_EXTENSIONS[compression]
+    shards = []
+    pending = deque()
+    batch = []
+    shard_index = first_index
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        def flush():
+            nonlocal batch, shard_index
+            path = os.path.join(output_dir, f"{table}-{shard_index:05d}{extension}")
+            pending.append(executor.submit(write_shard, path, batch, compression, level))
+            batch = []
+            shard_index += 1
+            # Bound the number of shards held in memory
+            while len(pending) > max(1, workers) * 2:
+                shards.append(pending.popleft().result())
+
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= shard_rows:
+                flush()
+        if batch:
+            flush()
+
+        while pending:
+            shards.append(pending.popleft().result())
+
+    return shards
+
+
+def save_manifest(output_dir, manifest):
+    """Write the manifest atomically."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def export_to_jsonl_shards(db_path, output_dir, table='articles', columns=None,
+                           shard_rows=DEFAULT_SHARD_ROWS, compression='gzip', level=None,
+                           workers=4, batch_size=DEFAULT_BATCH_SIZE, incremental=False, watermark_column=None):
+    """
+    Export a table to compressed JSON Lines shards with a manifest.
+
+    With ``incremental``, only rows above the high-water mark recorded in the
+    existing manifest (rowid, or ``scraped_at`` when the table has it) are
+    exported, as new shards appended to the manifest.
+
+    Args:
+        db_path (str): Path to the SQLite database
+        output_dir (str): Directory for the shards and manifest
+        table (str): Table to export
+        columns (list, optional): Columns to include (default: all)
+        shard_rows (int): Rows per shard
+        compression (str): 'gzip', 'zstd' or 'none'
+        level (int, optional): Compression level
+        workers (int): Number of shards compressed and written concurrently
+        batch_size (int): Rows fetched from SQLite per batch
+        incremental (bool): Append only rows added since the last export
+        watermark_column (str, optional): Column used as the high-water mark
+
+    Returns:
+        dict: The manifest
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"The database file {db_path} does not exist.")
+    if compression not in COMPRESSION_EXTENSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    start_time = time.time()
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(f"PRAGMA table_info({table})")
+        table_columns = [column[1] for column in cursor.fetchall()]
+        if not table_columns:
+            raise ValueError(f"Table {table} not found in {db_path}")
+
+        selected = columns or table_columns
+        unknown = [col for col in selected if col not in table_columns]
+        if unknown:
+            raise ValueError(f"Unknown columns for table {table}: {unknown}")
+
+        watermark_column = get_watermark_column(cursor, table, watermark_column)
+        previous = None
+        if os.path.exists(os.path.join(output_dir, MANIFEST_NAME)):
+            previous = load_manifest(output_dir)
+
+        is_part = incremental and previous is not None and previous.get('watermark') is not None
+        if is_part:
+            settings = (table, selected, compression, watermark_column)
+            recorded = (previous['table'], previous['columns'], previous['compression'], previous['watermark_column'])
+            if settings != recorded:
+                raise ValueError(f"The export in {output_dir} was made with different settings; "
+                                 f"run a full export to reset it")
+
+        where, params, high_mark = build_selection(cursor, table, watermark_column,
+                                                   previous['watermark'] if is_part else None)
+
+        if is_part:
+            print(f"Exporting new rows of {table} from {db_path} to {output_dir} "
+                  f"({watermark_column} > {previous['watermark']})", flush=True)
+        else:
+            print(f"Exporting {table} from {db_path} to {output_dir} ({compression}, {shard_rows} rows per shard)", flush=True)
+
+        cursor.execute(f"SELECT {', '.join(selected)} FROM {table} {where} ORDER BY {watermark_column}", params)
+
+        def iter_lines():
+            for rows in iter(lambda: cursor.fetchmany(batch_size), []):
+                for row in rows:
+                    # Columns are read by name, so the output matches the actual schema
+                    yield json.dumps({key: row[key] for key in row.keys()}, default=str) + '\n'
+
+        if is_part:
+            first_index = max((int(shard['file'][len(table) + 1:].split('.')[0]) for shard in previous['shards']),
+                              default=-1) + 1
+            shards = previous['shards'] + write_shards(iter_lines(), output_dir, table, compression, level,
+                                                       shard_rows, workers, first_index)
+        else:
+            shards = write_shards(iter_lines(), output_dir, table, compression, level, shard_rows, workers)
+
+            # Remove shards of an earlier export that were not overwritten
+            if previous:
+                written = {shard['file'] for shard in shards}
+                for shard in previous['shards']:
+                    path = os.path.join(output_dir, shard['file'])
+                    if shard['file'] not in written and os.path.exists(path):
+                        os.remove(path)
+
+        manifest = {
+            'source': os.path.basename(db_path),
+            'table': table,
+            'columns': selected,
+            'compression': compression,
+            'created_at': previous['created_at'] if is_part else datetime.now().isoformat(timespec='seconds'),
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'watermark_column': watermark_column,
+            'watermark': high_mark,
+            'key_column': get_key_column(cursor, table),
+            'total_rows': sum(shard['rows'] for shard in shards),
+            'total_bytes': sum(shard['bytes'] for shard in shards),
+            'shards': shards,
+        }
+        save_manifest(output_dir, manifest)
+
+        elapsed = time.time() - start_time
+        if is_part:
+            new_shards = len(shards) - len(previous['shards'])
+            new_rows = manifest['total_rows'] - previous['total_rows']
+            print(f"Appended {new_rows} rows in {new_shards} new shards "
+                  f"({manifest['total_rows']} rows in {len(shards)} shards total) in {elapsed:.2f}s", flush=True)
+        else:
+            print(f"Wrote {manifest['total_rows']} rows to {len(shards)} shards "
+                  f"({manifest['total_bytes'] / 1024:.1f} KB) in {elapsed:.2f}s", flush=True)
+        return manifest
+
+    finally:
+        conn.close()
+
+
+def load_manifest(output_dir):
+    """Load the manifest written by export_to_jsonl_shards()."""
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def verify_shards(output_dir):
+    """
+    Check every shard in the manifest against its recorded checksum.
+
+    Returns:
+        list: Names of shards that are missing or do not match
+    """
+    manifest = load_manifest(output_dir)
+    bad_shards = []
+    for shard in manifest['shards']:
+        path = os.path.join(output_dir, shard['file'])
+        if not os.path.exists(path):
+            bad_shards.append(shard['file'])
+            continue
+        with open(path, 'rb') as f:
+            if hashlib.sha256(f.read()).hexdigest() != shard['sha256']:
+                bad_shards.append(shard['file'])
+    return bad_shards
+
+
+def compact_shards(output_dir, shard_rows=DEFAULT_SHARD_ROWS, level=None, workers=4):
+    """
+    Rewrite all shards of an export into full-size shards.
+
+    Incremental exports leave many small shards behind; compaction merges
+    them and keeps only the newest version of rows that were exported more
+    than once.
+
+    Args:
+        output_dir (str): Directory containing the shards and manifest
+        shard_rows (int): Rows per shard after compaction
+        level (int, optional): Compression level
+        workers (int): Number of shards written concurrently
+
+    Returns:
+        dict: The new manifest
+    """
+    manifest = load_manifest(output_dir)
+    compression = manifest['compression']
+    key_column = manifest.get('key_column')
+    start_time = time.time()
+
+    def iter_keyed_lines():
+        for shard_number, shard in enumerate(manifest['shards']):
+            lines = read_shard_lines(os.path.join(output_dir, shard['file']), compression)
+            for line_number, line in enumerate(lines):
+                record = json.loads(line)
+                key = record.get(key_column) if key_column in record else (shard_number, line_number)
+                yield key, (shard_number, line_number), line
+
+    # First pass: remember where the newest version of every row lives
+    latest = {key: position for key, position, line in iter_keyed_lines()}
+
+    # Second pass: write the newest versions into a staging directory
+    staging_dir = os.path.join(output_dir, '.compact')
+    os.makedirs(staging_dir, exist_ok=True)
+    lines = (line for key, position, line in iter_keyed_lines() if latest[key] == position)
+    shards = write_shards(lines, staging_dir, manifest['table'], compression, level, shard_rows, workers)
+
+    for shard in manifest['shards']:
+        path = os.path.join(output_dir, shard['file'])
+        if os.path.exists(path):
+            os.remove(path)
+    for shard in shards:
+        os.replace(os.path.join(staging_dir, shard['file']), os.path.join(output_dir, shard['file']))
+    os.rmdir(staging_dir)
+
+    previous_count = len(manifest['shards'])
+    manifest.update({
+        'updated_at': datetime.now().isoformat(timespec='seconds'),
+        'total_rows': sum(shard['rows'] for shard in shards),
+        'total_bytes': sum(shard['bytes'] for shard in shards),
+        'shards': shards,
+    })
+    save_manifest(output_dir, manifest)
+
+    print(f"Compacted {previous_count} shards into {len(shards)} ({manifest['total_rows']} rows) "
+          f"in {time.time() - start_time:.2f}s", flush=True)
+    return manifest
+
+
+def upload_shards(output_dir, container, prefix='mckinsey_data_jsonl', connection_string=None, workers=4):
+    """
+    Upload shards and the manifest to Azure Blob Storage, resuming where a previous run stopped.
+
+    A shard is skipped when the local upload state or the existing blob's
+    metadata already records the same checksum.
+
+    Args:
+        output_dir (str): Directory containing the shards and manifest
+        container (str): Blob container backing the prompt-flow datastore
+        prefix (str): Path inside the container (default: mckinsey_data_jsonl)
+        connection_string (str, optional): Storage connection string
+            (default: AZURE_STORAGE_CONNECTION_STRING environment variable)
+        workers (int): Number of shards uploaded concurrently
+
+    Returns:
+        dict: Counts of uploaded, skipped and failed shards
+    """
+    from azure.core.exceptions import ResourceNotFoundError
+    from azure.storage.blob import BlobServiceClient
+
+    connection_string = connection_string or os.environ.get('AZURE_STORAGE_CONNECTION_STRING')
+    if not connection_string:
+        raise ValueError("No storage connection string provided (set AZURE_STORAGE_CONNECTION_STRING)")
+
+    manifest = load_manifest(output_dir)
+    container_client = BlobServiceClient.from_connection_string(connection_string).get_container_client(container)
+
+    state_path = os.path.join(output_dir, UPLOAD_STATE_NAME)
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    state_lock = threading.Lock()
+
+    def save_state():
+        temp_path = state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, state_path)
+
+    def upload(shard):
+        blob_name = f"{prefix.rstrip('/')}/{shard['file']}"
+        if state.get(shard['file']) == shard['sha256']:
+            return 'skipped'
+
+        blob_client = container_client.get_blob_client(blob_name)
+        try:
+            properties = blob_client.get_blob_properties()
+            if properties.metadata.get('sha256') == shard['sha256']:
+                with state_lock:
+                    state[shard['file']] = shard['sha256']
+                    save_state()
+                return 'skipped'
+        except ResourceNotFoundError:
+            pass
+
+        with open(os.path.join(output_dir, shard['file']), 'rb') as f:
+            blob_client.upload_blob(f, overwrite=True,
+                                    metadata={'sha256': shard['sha256'], 'rows': str(shard['rows'])})
+
+        with state_lock:
+            state[shard['file']] = shard['sha256']
+            save_state()
+        return 'uploaded'
+
+    results = {'uploaded': 0, 'skipped': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(upload, shard): shard['file'] for shard in manifest['shards']}
+        for future in as_completed(futures):
+            try:
+                results[future.result()] += 1
+            except Exception as e:
+                results['failed'] += 1
+                print(f"[!] Failed to upload {futures[future]}: {str(e)}", flush=True)
+
+    # Upload the manifest last, so readers only see it once every shard is present
+    if results['failed'] == 0:
+        with open(os.path.join(output_dir, MANIFEST_NAME), 'rb') as f:
+            container_client.upload_blob(f"{prefix.rstrip('/')}/{MANIFEST_NAME}", f, overwrite=True)
+
+    print(f"Upload finished: {results['uploaded']} uploaded, {results['skipped']} already present, "
+          f"{results['failed']} failed", flush=True)
+    return results
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description='Export the McKinsey database to sharded JSON Lines.')
+    subparsers = parser.add_subparsers(dest='command', help='Command to run')
+
+    export_parser = subparsers.add_parser('export', help='Export a table to compressed JSONL shards')
+    export_parser.add_argument('-d', '--database', default='mckinsey_data.db',
+                               help='Path to the database (default: mckinsey_data.db)')
+    export_parser.add_argument('-o', '--output-dir', default='mckinsey_data_jsonl',
+                               help='Directory for shards and manifest (default: mckinsey_data_jsonl)')
+    export_parser.add_argument('-t', '--table', default='articles',
+                               help='Table to export (default: articles)')
+    export_parser.add_argument('--columns', nargs='+', default=None,
+                               help='Columns to include (default: all)')
+    export_parser.add_argument('-s', '--shard-rows', type=int, default=DEFAULT_SHARD_ROWS,
+                               help=f'Rows per shard (default: {DEFAULT_SHARD_ROWS})')
+    export_parser.add_argument('-c', '--compression', choices=sorted(COMPRESSION_EXTENSIONS), default='gzip',
+                               help='Shard compression (default: gzip)')
+    export_parser.add_argument('--level', type=int, default=None,
+                               help='Compression level')
+    export_parser.add_argument('-w', '--workers', type=int, default=4,
+                               help='Shards written concurrently (default: 4)')
+    export_parser.add_argument('--incremental', action='store_true',
+                               help='Only export rows added since the last export, as new shards')
+    export_parser.add_argument('--watermark-column', default=None,
+                               help='Column used as the high-water mark (default: scraped_at if present, else rowid)')
+
+    compact_parser = subparsers.add_parser('compact', help='Merge the shards of incremental exports')
+    compact_parser.add_argument('-o', '--output-dir', default='mckinsey_data_jsonl',
+                                help='Directory with shards and manifest (default: mckinsey_data_jsonl)')
+    compact_parser.add_argument('-s', '--shard-rows', type=int, default=DEFAULT_SHARD_ROWS,
+                                help=f'Rows per shard (default: {DEFAULT_SHARD_ROWS})')
+    compact_parser.add_argument('--level', type=int, default=None,
+                                help='Compression level')
+    compact_parser.add_argument('-w', '--workers', type=int, default=4,
+                                help='Shards written concurrently (default: 4)')
+
+    verify_parser = subparsers.add_parser('verify', help='Verify shard checksums against the manifest')
+    verify_parser.add_argument('-o', '--output-dir', default='mckinsey_data_jsonl',
+                               help='Directory with shards and manifest (default: mckinsey_data_jsonl)')
+
+    upload_parser = subparsers.add_parser('upload', help='Upload shards to the prompt-flow datastore')
+    upload_parser.add_argument('-o', '--output-dir', default='mckinsey_data_jsonl',
+                               help='Directory with shards and manifest (default: mckinsey_data_jsonl)')
+    upload_parser.add_argument('--container', required=True,
+                               help='Blob container backing the datastore')
+    upload_parser.add_argument('--prefix', default='mckinsey_data_jsonl',
+                               help='Path inside the container (default: mckinsey_data_jsonl)')
+    upload_parser.add_argument('-w', '--workers', type=int, default=4,
+                               help='Shards uploaded concurrently (default: 4)')
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+        return
+
+    try:
+        if args.command == 'export':
+            export_to_jsonl_shards(args.database, args.output_dir, table=args.table, columns=args.columns,
+                                   shard_rows=args.shard_rows, compression=args.compression,
+                                   level=args.level, workers=args.workers,
+                                   incremental=args.incremental, watermark_column=args.watermark_column)
+        elif args.command == 'compact':
+            compact_shards(args.output_dir, shard_rows=args.shard_rows, level=args.level, workers=args.workers)
+        elif args.command == 'verify':
+            bad_shards = verify_shards(args.output_dir)
+            if bad_shards:
+                print(f"[!] {len(bad_shards)} shards missing or corrupt: {', '.join(bad_shards)}", flush=True)
+                sys.exit(1)
+            print("[OK] All shards match the manifest", flush=True)
+        elif args.command == 'upload':
+            results = upload_shards(args.output_dir, args.container, prefix=args.prefix, workers=args.workers)
+            if results['failed']:
+                sys.exit(1)
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
 
-# Connect to the SQLite database
-db_path = 'mckinsey_data.db'  # Ensure this path is correct
-if not os.path.exists(db_path):
-    raise FileNotFoundError(f"The database file {db_path} does not exist.")
-
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
-
-# Query to select all articles
-cursor.execute("SELECT * FROM articles")  # Adjust the table name as needed
-articles = cursor.fetchall()
-
-# Convert to JSON Lines format
-output_file = 'mckinsey_data.jsonl'
-with open(output_file, 'w') as jsonl_file:
-    for article in articles:
-        json_line = json.dumps({
-            'id': article[0],  # Assuming the first column is the ID
-            'title': article[1],  # Adjust based on your table structure
-            'url': article[2],
-            'description': article[3],
-            'date_published': article[4],
-            'article_type': article[5]
-        })
-        jsonl_file.write(json_line + '\n')
-
-# Close the database connection
-conn.close()
-
-print(f"Successfully converted database to {output_file} in JSON Lines format.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+"""
+Near-duplicate detection over the article corpus (MinHash + LSH).
+
+The same article is often published under several URLs (/our-insights/ and
+/featured-insights/, podcast pages with a transcript copy, ...). Every copy
+is parsed, exported, chunked and embedded again. This module finds them:
+
+- The content of every article is split into word shingles (runs of
+  --shingle-size consecutive words).
+- A MinHash signature of --num-perm values estimates the Jaccard
+  similarity of two shingle sets as the fraction of equal values.
+- Signatures are split into --bands bands; articles sharing any band
+  are candidate pairs (locality-sensitive hashing), so an article is only
+  compared with a few others instead of the whole corpus.
+- Candidates whose estimated similarity reaches --threshold are
+  duplicates. The article seen first is kept; the others are recorded in
+  the `duplicate_of` table, which exports and indexers can skip.
+
+Signatures and LSH buckets are stored next to the content, so re-runs
+only process new and changed articles.
+
+    python dedup.py -d mckinsey_article_content.db
+    python dedup.py -d mckinsey_article_content.db --list
+"""
+
+import sqlite3
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 16
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_SEED = 1
+
+# Articles read from SQLite and hashed per batch
+DEFAULT_BATCH_SIZE = 200
+
+# Shingles hashed per block (bounds the size of the shingle x permutation matrix)
+SHINGLE_BLOCK_SIZE = 8192
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Multiplier of the polynomial hash combining the word hashes of a shingle
+SHINGLE_BASE = np.uint64(1099511628211)
+
+# Placeholders stored by article_parser when extraction failed
+FAILED_CONTENT_PREFIXES = ("No content could be extracted", "Error: ")
+
+
+def content_hash(text):
+    """Return the SHA-1 hex digest of a text."""
+    return hashlib.sha1(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+class MinHasher:
+    """Computes MinHash signatures of word shingles and their LSH band keys."""
+
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS,
+                 shingle_size=DEFAULT_SHINGLE_SIZE, seed=DEFAULT_SEED):
+        if num_perm % bands:
+            raise ValueError(f"--bands ({bands}) must divide --num-perm ({num_perm})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+
+        # Multiply-shift hash functions: h(x) = (a * x + b) mod 2^64, upper 32 bits
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self._word_hashes = {}
+
+    def settings(self):
+        """Return the settings a stored signature depends on, as a JSON string."""
+        return json.dumps({'num_perm': self.num_perm, 'bands': self.bands,
+                           'shingle_size': self.shingle_size, 'seed': self.seed}, sort_keys=True)
+
+    def threshold(self):
+        """Similarity at which a pair becomes a candidate with probability ~50%."""
+        return (1 / self.bands) ** (1 / self.rows)
+
+    def shingle_hashes(self, text):
+        """Return the distinct 64-bit hashes of the word shingles of a text."""
+        words = WORD_PATTERN.findall(text.lower())
+        if not words:
+            return np.empty(0, dtype=np.uint64)
+
+        cache = self._word_hashes
+        hashes = np.fromiter((cache[word] if word in cache else cache.setdefault(word, zlib.crc32(word.encode('utf-8')))
+                              for word in words), dtype=np.uint64, count=len(words))
+        if len(cache) > 500000:
+            cache.clear()
+
+        size = min(self.shingle_size, len(hashes))
+        shingles = np.zeros(len(hashes) - size + 1, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for offset in range(size):
+                shingles = shingles * SHINGLE_BASE + hashes[offset:offset + len(shingles)]
+        return np.unique(shingles)
+
+    def signature(self, text):
+        """
+        Return the MinHash signature of a text.
+
+        Returns:
+            tuple: (uint32 signature array, or None for texts without words, number of shingles)
+        """
+        shingles = self.shingle_hashes(text)
+        if not len(shingles):
+            return None, 0
+
+        signature = np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        with np.errstate(over='ignore'):
+            for start in range(0, len(shingles), SHINGLE_BLOCK_SIZE):
+                block = shingles[start:start + SHINGLE_BLOCK_SIZE, None]
+                values = ((block * self._a + self._b) >> np.uint64(32)).astype(np.uint32)
+                np.minimum(signature, values.min(axis=0), out=signature)
+        return signature, len(shingles)
+
+    def band_keys(self, signature):
+        """Return one 64-bit bucket key per band of a signature."""
+        keys = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).digest()
+            keys.append(int.from_bytes(digest, 'little', signed=True))
+        return keys
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.count_nonzero(signature == other)) / len(signature)
+
+
+def setup_dedup_tables(conn):
+    """Create the deduplication tables if they don't exist."""
+    conn.executescript('''
+    CREATE TABLE IF NOT EXISTS minhash_signatures (
+        article_id INTEGER PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        content_length INTEGER NOT NULL,
+        settings TEXT NOT NULL,
+        shingle_count INTEGER NOT NULL,
+        signature BLOB,
+        computed_at TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS lsh_buckets (
+        band INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        article_id INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_lsh_buckets_article ON lsh_buckets (article_id);
+    CREATE TABLE IF NOT EXISTS duplicate_of (
+        article_id INTEGER PRIMARY KEY,
+        duplicate_of INTEGER NOT NULL,
+        similarity REAL NOT NULL,
+        detected_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_duplicate_of_original ON duplicate_of (duplicate_of);
+    ''')
+    conn.commit()
+
+
+def duplicate_filter(cursor, column='article_id'):
+    """
+    Return an SQL condition excluding detected duplicates, for exports and indexers.
+
+    Returns:
+        str: The condition, or None when dedup.py has not been run on the database
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='duplicate_of'")
+    if cursor.fetchone() is None:
+        return None
+    return f"{column} NOT IN (SELECT article_id FROM duplicate_of)"
+
+
+def find_stale_articles(conn, settings, rehash=False):
+    """
+    Return the ids of articles whose signature must be (re)computed.
+
+    An article is stale when it has no signature, its signature was computed
+    with other settings, or its content length changed. With rehash, the
+    content hash of every article is compared as well.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT a.article_id FROM article_content a
+    LEFT JOIN minhash_signatures s ON s.article_id = a.article_id
+    WHERE s.article_id IS NULL OR s.settings != ? OR s.content_length != length(COALESCE(a.content, ''))
+    ''', (settings,))
+    stale = [row[0] for row in cursor.fetchall()]
+
+    if rehash:
+        known = set(stale)
+        cursor.execute('''
+        SELECT a.article_id, a.content, s.content_hash FROM article_content a
+        JOIN minhash_signatures s ON s.article_id = a.article_id
+        ''')
+        for article_id, content, recorded_hash in cursor:
+            if article_id not in known and content_hash(content or '') != recorded_hash:
+                stale.append(article_id)
+    return stale
+
+
+def compute_signatures(conn, hasher, article_ids, batch_size=DEFAULT_BATCH_SIZE):
+    """Compute and store the signatures of the given articles."""
+    cursor = conn.cursor()
+    settings = hasher.settings()
+    done = 0
+    for offset in range(0, len(article_ids), batch_size):
+        ids = article_ids[offset:offset + batch_size]
+        placeholders = ','.join(['?'] * len(ids))
+        cursor.execute(f"SELECT article_id, content FROM article_content WHERE article_id IN ({placeholders})", ids)
+
+        now = datetime.now().isoformat(timespec='seconds')
+        rows = []
+        for article_id, content in cursor.fetchall():
+            content = content or ''
+            if content.startswith(FAILED_CONTENT_PREFIXES):
+                signature, shingle_count = None, 0
+            else:
+                signature, shingle_count = hasher.signature(content)
+            rows.append((article_id, content_hash(content), len(content), settings, shingle_count,
+                         signature.tobytes() if signature is not None else None, now))
+
+        with conn:
+            conn.executemany('''
+            INSERT OR REPLACE INTO minhash_signatures
+            (article_id, content_hash, content_length, settings, shingle_count, signature, computed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+        done += len(ids)
+        print(f"  {done}/{len(article_ids)} signatures computed", flush=True)
+
+
+def load_signatures(conn):
+    """Return {article_id: signature} for every article with content."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT article_id, signature FROM minhash_signatures WHERE signature IS NOT NULL")
+    return {article_id: np.frombuffer(blob, dtype=np.uint32) for article_id, blob in cursor}
+
+
+def detect_duplicates(db_path, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS,
+                      shingle_size=DEFAULT_SHINGLE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                      rehash=False, rebuild=False):
+    """
+    Find the near-duplicate articles of a content database.
+
+    Only new and changed articles, and the articles that were recorded as
+    duplicates of a changed one, are matched again. Each of them is compared
+    with the earlier articles sharing an LSH bucket; if the best match reaches
+    the threshold, it is recorded as a duplicate of that match's original.
+
+    Args:
+        db_path (str): Path to the content database
+        threshold (float): Minimum estimated Jaccard similarity of duplicates
+        num_perm (int): MinHash signature size
+        bands (int): Number of LSH bands (must divide num_perm)
+        shingle_size (int): Words per shingle
+        batch_size (int): Articles hashed per batch
+        rehash (bool): Also detect changed content by hash, not only by length
+        rebuild (bool): Drop all signatures and duplicates and start over
+
+    Returns:
+        dict: Run statistics
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database {db_path} not found")
+
+    start_time = time.time()
+    hasher = MinHasher(num_perm, bands, shingle_size)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        setup_dedup_tables(conn)
+        cursor = conn.cursor()
+        if rebuild:
+            conn.execute("DELETE FROM minhash_signatures")
+            conn.execute("DELETE FROM lsh_buckets")
+            conn.execute("DELETE FROM duplicate_of")
+            conn.commit()
+
+        # Articles that were deleted, or whose original was deleted, are forgotten or matched again
+        cursor.execute('''
+        SELECT article_id FROM duplicate_of
+        WHERE duplicate_of NOT IN (SELECT article_id FROM article_content)
+        ''')
+        orphans = [row[0] for row in cursor.fetchall()]
+        for table in ('minhash_signatures', 'lsh_buckets', 'duplicate_of'):
+            conn.execute(f"DELETE FROM {table} WHERE article_id NOT IN (SELECT article_id FROM article_content)")
+        conn.commit()
+
+        stale = find_stale_articles(conn, hasher.settings(), rehash)
+        if stale:
+            print(f"Computing MinHash signatures for {len(stale)} articles "
+                  f"({num_perm} permutations, {bands} bands, {shingle_size}-word shingles)", flush=True)
+            compute_signatures(conn, hasher, stale, batch_size)
+
+        # Duplicates of changed articles must find a new original
+        to_match = set(stale) | set(orphans)
+        if stale:
+            for offset in range(0, len(stale), 500):
+                ids = stale[offset:offset + 500]
+                placeholders = ','.join(['?'] * len(ids))
+                cursor.execute(f"SELECT article_id FROM duplicate_of WHERE duplicate_of IN ({placeholders})", ids)
+                to_match.update(row[0] for row in cursor.fetchall())
+        to_match = sorted(to_match)
+
+        if not to_match:
+            print("No new or changed articles to check for duplicates", flush=True)
+            return {'articles': 0, 'duplicates': 0, 'seconds': time.time() - start_time}
+
+        with conn:
+            for offset in range(0, len(to_match), 500):
+                ids = to_match[offset:offset + 500]
+                placeholders = ','.join(['?'] * len(ids))
+                conn.execute(f"DELETE FROM lsh_buckets WHERE article_id IN ({placeholders})", ids)
+                conn.execute(f"DELETE FROM duplicate_of WHERE article_id IN ({placeholders})", ids)
+
+        # Buckets and originals of the articles that are not matched again
+        signatures = load_signatures(conn)
+        buckets = {}
+        cursor.execute("SELECT band, bucket, article_id FROM lsh_buckets")
+        for band, bucket, article_id in cursor:
+            buckets.setdefault((band, bucket), []).append(article_id)
+        cursor.execute("SELECT article_id, duplicate_of FROM duplicate_of")
+        originals = dict(cursor.fetchall())
+
+        print(f"Matching {len(to_match)} articles against {len(signatures) - len(to_match)} known articles "
+              f"(threshold {threshold}, candidate threshold ~{hasher.threshold():.2f})", flush=True)
+
+        bucket_rows = []
+        duplicate_rows = []
+        candidate_pairs = 0
+        now = datetime.now().isoformat(timespec='seconds')
+        for article_id in to_match:
+            signature = signatures.get(article_id)
+            if signature is None:
+                continue
+            keys = hasher.band_keys(signature)
+
+            candidates = set()
+            for band, key in enumerate(keys):
+                candidates.update(buckets.get((band, key), ()))
+            candidate_pairs += len(candidates)
+
+            best_id, best_similarity = None, threshold
+            for candidate in sorted(candidates):
+                score = similarity(signature, signatures[candidate])
+                if score >= best_similarity and (best_id is None or score > best_similarity):
+                    best_id, best_similarity = candidate, score
+
+            if best_id is not None:
+                original = originals.get(best_id, best_id)
+                originals[article_id] = original
+                duplicate_rows.append((article_id, original, best_similarity, now))
+
+            for band, key in enumerate(keys):
+                buckets.setdefault((band, key), []).append(article_id)
+                bucket_rows.append((band, key, article_id))
+
+        with conn:
+            conn.executemany("INSERT INTO lsh_buckets (band, bucket, article_id) VALUES (?, ?, ?)", bucket_rows)
+            conn.executemany('''
+            INSERT OR REPLACE INTO duplicate_of (article_id, duplicate_of, similarity, detected_at)
+            VALUES (?, ?, ?, ?)
+            ''', duplicate_rows)
+
+        elapsed = time.time() - start_time
+        print(f"Found {len(duplicate_rows)} duplicates among {len(to_match)} articles "
+              f"({candidate_pairs} candidate pairs) in {elapsed:.2f}s", flush=True)
+        return {'articles': len(to_match), 'duplicates': len(duplicate_rows),
+                'candidate_pairs': candidate_pairs, 'seconds': elapsed}
+
+    finally:
+        conn.close()
+
+
+def get_duplicate_ids(conn):
+    """Return the set of article ids recorded as duplicates."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT article_id FROM duplicate_of")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def get_duplicate_groups(conn):
+    """
+    Return the recorded duplicates grouped by their original.
+
+    Returns:
+        list: (original id, original url, [(duplicate id, url, similarity), ...]) tuples,
+              largest groups first
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT d.duplicate_of, o.url, d.article_id, a.url, d.similarity
+    FROM duplicate_of d
+    LEFT JOIN article_content o ON o.article_id = d.duplicate_of
+    LEFT JOIN article_content a ON a.article_id = d.article_id
+    ORDER BY d.duplicate_of, d.article_id
+    ''')
+    groups = {}
+    for original_id, original_url, article_id, url, score in cursor:
+        groups.setdefault((original_id, original_url), []).append((article_id, url, score))
+    return sorted(((original_id, url, members) for (original_id, url), members in groups.items()),
+                  key=lambda group: (-len(group[2]), group[0]))
+
+
+def get_dedup_stats(conn):
+    """Return summary statistics of the detected duplicates."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*), SUM(content_length) FROM minhash_signatures")
+    articles, total_length = cursor.fetchone()
+    cursor.execute('''
+    SELECT COUNT(*), COUNT(DISTINCT d.duplicate_of), SUM(s.content_length)
+    FROM duplicate_of d JOIN minhash_signatures s ON s.article_id = d.article_id
+    ''')
+    duplicates, originals, duplicate_length = cursor.fetchone()
+    return {
+        'articles': articles,
+        'duplicates': duplicates,
+        'originals': originals,
+        'total_chars': total_length or 0,
+        'duplicate_chars': duplicate_length or 0,
+    }
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description='Detect near-duplicate articles with MinHash and LSH.')
+    parser.add_argument('-d', '--database', default='mckinsey_article_content.db',
+                        help='Path to the content database (default: mckinsey_article_content.db)')
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Minimum estimated Jaccard similarity of duplicates (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--num-perm', type=int, default=DEFAULT_NUM_PERM,
+                        help=f'MinHash signature size (default: {DEFAULT_NUM_PERM})')
+    parser.add_argument('--bands', type=int, default=DEFAULT_BANDS,
+                        help=f'Number of LSH bands, must divide --num-perm (default: {DEFAULT_BANDS})')
+    parser.add_argument('--shingle-size', type=int, default=DEFAULT_SHINGLE_SIZE,
+                        help=f'Words per shingle (default: {DEFAULT_SHINGLE_SIZE})')
+    parser.add_argument('-b', '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Articles hashed per batch (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--rehash', action='store_true',
+                        help='Detect changed articles by content hash instead of length only')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Drop all signatures and duplicates and start over')
+    parser.add_argument('--stats', action='store_true',
+                        help='Print duplicate statistics and exit')
+    parser.add_argument('--list', action='store_true',
+                        help='List the duplicate groups and exit')
+
+    args = parser.parse_args()
+
+    try:
+        if args.stats or args.list:
+            if not os.path.exists(args.database):
+                raise FileNotFoundError(f"Database {args.database} not found")
+            conn = sqlite3.connect(args.database)
+            try:
+                setup_dedup_tables(conn)
+                if args.list:
+                    for original_id, url, members in get_duplicate_groups(conn):
+                        print(f"{original_id}: {url}")
+                        for article_id, member_url, score in members:
+                            print(f"  {article_id} ({score:.2f}): {member_url}")
+                stats = get_dedup_stats(conn)
+            finally:
+                conn.close()
+            share = stats['duplicate_chars'] / stats['total_chars'] if stats['total_chars'] else 0
+            print(f"{stats['duplicates']} of {stats['articles']} articles are duplicates of "
+                  f"{stats['originals']} originals ({share:.1%} of the content)", flush=True)
+            return
+
+        detect_duplicates(args.database,
+                          threshold=args.threshold,
+                          num_perm=args.num_perm,
+                          bands=args.bands,
+                          shingle_size=args.shingle_size,
+                          batch_size=args.batch_size,
+                          rehash=args.rehash,
+                          rebuild=args.rebuild)
+    except Exception as e:
+        print(f"Error during duplicate detection: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
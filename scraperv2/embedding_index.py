@@ -0,0 +1,572 @@
+"""
+Dense retrieval index over article chunks, stored as memory-mapped NumPy arrays.
+
+The index directory holds:
+
+    vectors.npy   (capacity x dim) float32 (or float16) unit vectors
+    ids.npy       (capacity,) int64 chunk ids, -1 for deleted rows
+    meta.json     encoder settings, row count and build watermark
+
+Both arrays are opened with numpy.memmap, so several processes serving
+queries share one copy of the index through the page cache. Queries are
+encoded in batches and scored with one matrix multiply per block of the
+index; the top k rows are selected with argpartition instead of a full sort.
+
+Embeddings come from a pluggable encoder. HashingEncoder is deterministic
+and dependency-free, so the index builds and can be tested offline.
+
+    python chunker.py -d mckinsey_article_content.db
+    python embedding_index.py build -d mckinsey_article_content.db -o embedding_index
+    python embedding_index.py query -o embedding_index "how to scale agile teams" -k 5
+"""
+
+import sqlite3
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import time
+import zlib
+
+import numpy as np
+
+DEFAULT_INDEX_DIR = 'embedding_index'
+DEFAULT_DIM = 384
+# float32 rows are multiplied straight from the page cache; float16 halves
+# disk and memory use but every block is converted before the multiply,
+# which only pays off for large query batches
+DEFAULT_DTYPE = 'float32'
+
+# Chunks encoded per batch while building
+DEFAULT_BUILD_BATCH_SIZE = 256
+
+# Index rows scored per matrix multiply; bounds the temporary score matrix
+DEFAULT_BLOCK_ROWS = 65536
+
+# Capacity is grown geometrically so appends rarely copy the arrays
+GROWTH_FACTOR = 1.5
+MIN_CAPACITY = 1024
+
+# Compact the arrays once this share of rows is deleted
+COMPACT_THRESHOLD = 0.2
+
+META_NAME = 'meta.json'
+VECTORS_NAME = 'vectors.npy'
+IDS_NAME = 'ids.npy'
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEncoder:
+    """
+    Deterministic bag-of-words encoder based on feature hashing.
+
+    Words and word bigrams are hashed into ``dim`` buckets with a random
+    sign, weighted by 1 + log(term frequency) and L2-normalized. Similar
+    texts share vocabulary and therefore get a high cosine similarity.
+    """
+
+    name = 'hashing'
+
+    def __init__(self, dim=DEFAULT_DIM, bigrams=True):
+        self.dim = dim
+        self.bigrams = bigrams
+        self._buckets = {}
+
+    def config(self):
+        return {'name': self.name, 'dim': self.dim, 'bigrams': self.bigrams}
+
+    def _bucket(self, token):
+        bucket = self._buckets.get(token)
+        if bucket is None:
+            # crc32 is stable across processes, unlike the salted built-in hash()
+            digest = zlib.crc32(token.encode('utf-8', 'surrogatepass'))
+            bucket = (digest % self.dim, 1.0 if digest & 0x80000000 else -1.0)
+            if len(self._buckets) < 1000000:
+                self._buckets[token] = bucket
+        return bucket
+
+    def encode(self, texts):
+        """
+        Encode texts into unit vectors.
+
+        Args:
+            texts (list): Texts to encode
+
+        Returns:
+            numpy.ndarray: (len(texts), dim) float32 matrix
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = WORD_PATTERN.findall((text or '').lower())
+            counts = {}
+            for word in words:
+                counts[word] = counts.get(word, 0) + 1
+            if self.bigrams:
+                for first, second in zip(words, words[1:]):
+                    bigram = first + ' ' + second
+                    counts[bigram] = counts.get(bigram, 0) + 1
+
+            vector = vectors[row]
+            for token, count in counts.items():
+                index, sign = self._bucket(token)
+                vector[index] += sign * (1.0 + math.log(count))
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class SentenceTransformerEncoder:
+    """Encoder backed by a sentence-transformers model (optional dependency)."""
+
+    name = 'sentence-transformers'
+
+    def __init__(self, model='all-MiniLM-L6-v2', batch_size=64):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("The sentence-transformers encoder requires: pip install sentence-transformers")
+        self.model_name = model
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(model)
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def config(self):
+        return {'name': self.name, 'model': self.model_name}
+
+    def encode(self, texts):
+        return self._model.encode(list(texts), batch_size=self.batch_size, normalize_embeddings=True,
+                                  convert_to_numpy=True).astype(np.float32)
+
+
+# Encoder factories by name; register_encoder() adds more
+ENCODERS = {
+    HashingEncoder.name: HashingEncoder,
+    SentenceTransformerEncoder.name: SentenceTransformerEncoder,
+}
+
+
+def register_encoder(name, factory):
+    """Make an encoder available by name (factory(**config) must return an object with dim and encode())."""
+    ENCODERS[name] = factory
+
+
+def create_encoder(config):
+    """Create an encoder from the config stored in the index metadata."""
+    config = dict(config)
+    name = config.pop('name')
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown encoder: {name}. Available encoders: {sorted(ENCODERS)}")
+    return ENCODERS[name](**config)
+
+
+def top_k(scores, k):
+    """
+    Return the indices and scores of the k highest scores per row, best first.
+
+    Uses argpartition, so only the k selected entries are sorted.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+class EmbeddingIndex:
+    """Memory-mapped matrix of chunk vectors with an id map."""
+
+    def __init__(self, index_dir, writable=False):
+        """
+        Open an existing index.
+
+        Args:
+            index_dir (str): Index directory
+            writable (bool): Open the arrays for appending and deleting
+        """
+        self.index_dir = index_dir
+        self.writable = writable
+        with open(os.path.join(index_dir, META_NAME), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.encoder = None
+        self._open_arrays()
+
+    @classmethod
+    def create(cls, index_dir, encoder, dtype=DEFAULT_DTYPE):
+        """Create an empty index for an encoder."""
+        os.makedirs(index_dir, exist_ok=True)
+        meta = {
+            'encoder': encoder.config(),
+            'dim': encoder.dim,
+            'dtype': dtype,
+            'count': 0,
+            'capacity': 0,
+            'deleted': 0,
+            'watermark': 0,
+            'generation': 0,
+        }
+        cls._allocate(index_dir, meta, MIN_CAPACITY, dtype, encoder.dim)
+        cls._write_meta(index_dir, meta)
+        index = cls(index_dir, writable=True)
+        index.encoder = encoder
+        return index
+
+    @staticmethod
+    def _write_meta(index_dir, meta):
+        path = os.path.join(index_dir, META_NAME)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _allocate(index_dir, meta, capacity, dtype, dim, old_vectors=None, old_ids=None, rows=None):
+        """
+        Write new, larger arrays and swap them in.
+
+        Readers that still map the old files keep a consistent view, since
+        the files are replaced rather than resized.
+        """
+        rows = np.arange(meta['count']) if rows is None else rows
+        vectors_path = os.path.join(index_dir, VECTORS_NAME)
+        ids_path = os.path.join(index_dir, IDS_NAME)
+
+        vectors = np.lib.format.open_memmap(vectors_path + '.tmp', mode='w+', dtype=dtype, shape=(capacity, dim))
+        ids = np.lib.format.open_memmap(ids_path + '.tmp', mode='w+', dtype=np.int64, shape=(capacity,))
+        ids[:] = -1
+        if old_vectors is not None and len(rows):
+            for start in range(0, len(rows), DEFAULT_BLOCK_ROWS):
+                block = rows[start:start + DEFAULT_BLOCK_ROWS]
+                vectors[start:start + len(block)] = old_vectors[block]
+                ids[start:start + len(block)] = old_ids[block]
+        vectors.flush()
+        ids.flush()
+        del vectors, ids
+
+        os.replace(vectors_path + '.tmp', vectors_path)
+        os.replace(ids_path + '.tmp', ids_path)
+        meta['capacity'] = capacity
+        meta['count'] = len(rows)
+
+    def _open_arrays(self):
+        mode = 'r+' if self.writable else 'r'
+        self.vectors = np.load(os.path.join(self.index_dir, VECTORS_NAME), mmap_mode=mode)
+        self.ids = np.load(os.path.join(self.index_dir, IDS_NAME), mmap_mode=mode)
+
+    def __len__(self):
+        return self.meta['count'] - self.meta['deleted']
+
+    def get_encoder(self):
+        """Return the encoder the index was built with."""
+        if self.encoder is None:
+            self.encoder = create_encoder(self.meta['encoder'])
+        return self.encoder
+
+    def save(self):
+        """Flush the arrays and publish the new row count to readers."""
+        self.vectors.flush()
+        self.ids.flush()
+        self._write_meta(self.index_dir, self.meta)
+
+    def append(self, chunk_ids, vectors):
+        """Append vectors (rows are normalized unit vectors) for the given chunk ids."""
+        count = self.meta['count']
+        needed = count + len(chunk_ids)
+        if needed > self.meta['capacity']:
+            capacity = max(MIN_CAPACITY, int(self.meta['capacity'] * GROWTH_FACTOR), needed)
+            old_vectors, old_ids = self.vectors, self.ids
+            self._allocate(self.index_dir, self.meta, capacity, self.meta['dtype'], self.meta['dim'],
+                           old_vectors, old_ids)
+            del old_vectors, old_ids
+            self._open_arrays()
+        self.vectors[count:needed] = vectors.astype(self.meta['dtype'])
+        self.ids[count:needed] = chunk_ids
+        self.meta['count'] = needed
+
+    def delete(self, chunk_ids):
+        """Mark the rows of the given chunk ids as deleted."""
+        count = self.meta['count']
+        rows = np.flatnonzero(np.isin(self.ids[:count], np.asarray(list(chunk_ids), dtype=np.int64)))
+        if len(rows):
+            self.ids[rows] = -1
+            self.vectors[rows] = 0
+            self.meta['deleted'] += len(rows)
+        return len(rows)
+
+    def compact(self):
+        """Rewrite the arrays without deleted rows."""
+        count = self.meta['count']
+        rows = np.flatnonzero(self.ids[:count] >= 0)
+        capacity = max(MIN_CAPACITY, int(len(rows) * GROWTH_FACTOR))
+        old_vectors, old_ids = self.vectors, self.ids
+        self._allocate(self.index_dir, self.meta, capacity, self.meta['dtype'], self.meta['dim'],
+                       old_vectors, old_ids, rows)
+        del old_vectors, old_ids
+        self.meta['deleted'] = 0
+        self.meta['generation'] += 1
+        self._open_arrays()
+
+    def search_vectors(self, queries, k=10, block_rows=DEFAULT_BLOCK_ROWS):
+        """
+        Find the k most similar chunks for a batch of query vectors.
+
+        Args:
+            queries (numpy.ndarray): (n, dim) unit query vectors
+            k (int): Results per query
+            block_rows (int): Index rows scored per matrix multiply
+
+        Returns:
+            tuple: (chunk ids, cosine similarities), each an (n, k) array best first;
+                missing results have id -1
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        count = self.meta['count']
+        best_rows = np.full((len(queries), 0), -1, dtype=np.int64)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+
+        for start in range(0, count, block_rows):
+            end = min(count, start + block_rows)
+            block = np.asarray(self.vectors[start:end], dtype=np.float32)
+            scores = queries @ block.T
+            if self.meta['deleted']:
+                scores[:, self.ids[start:end] < 0] = -np.inf
+
+            rows, block_scores = top_k(scores, k)
+            best_rows = np.concatenate([best_rows, rows + start], axis=1)
+            best_scores = np.concatenate([best_scores, block_scores], axis=1)
+            if best_rows.shape[1] > k:
+                order, best_scores = top_k(best_scores, k)
+                best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+        chunk_ids = np.where(np.isfinite(best_scores), self.ids[best_rows] if best_rows.size else best_rows, -1)
+        return chunk_ids, best_scores
+
+    def search(self, texts, k=10):
+        """
+        Find the k most similar chunks for a batch of query texts.
+
+        Returns:
+            list: One list of (chunk_id, score) pairs per query, best first
+        """
+        chunk_ids, scores = self.search_vectors(self.get_encoder().encode(texts), k)
+        return [[(int(chunk_id), float(score)) for chunk_id, score in zip(row_ids, row_scores) if chunk_id >= 0]
+                for row_ids, row_scores in zip(chunk_ids, scores)]
+
+
+def chunk_text_for_embedding(title, heading, content):
+    """Text that is embedded for a chunk: the article title and section give it context."""
+    return '\n'.join(part for part in (title, heading, content) if part)
+
+
+def build_index(db_path, index_dir=DEFAULT_INDEX_DIR, encoder='hashing', dim=DEFAULT_DIM, dtype=DEFAULT_DTYPE,
+                batch_size=DEFAULT_BUILD_BATCH_SIZE, rebuild=False):
+    """
+    Create or update the embedding index from the chunks table.
+
+    Only chunks added since the last build are encoded. Chunks that no
+    longer exist (their article was re-chunked or removed) are deleted
+    from the index, and the arrays are compacted once enough rows are deleted.
+
+    Args:
+        db_path (str): Content database with a chunks table (see chunker.py)
+        index_dir (str): Index directory
+        encoder (str): Encoder name for a new index
+        dim (int): Vector size for the hashing encoder
+        dtype (str): 'float16' or 'float32' storage for a new index
+        batch_size (int): Chunks encoded per batch
+        rebuild (bool): Discard the existing index and encode every chunk again
+
+    Returns:
+        dict: Build statistics
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database {db_path} not found")
+
+    start_time = time.time()
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        if 'chunks' not in tables:
+            raise ValueError("No chunks table found in database; run chunker.py first")
+
+        if rebuild or not os.path.exists(os.path.join(index_dir, META_NAME)):
+            config = {'name': encoder, 'dim': dim} if encoder == HashingEncoder.name else {'name': encoder}
+            index = EmbeddingIndex.create(index_dir, create_encoder(config), dtype)
+        else:
+            index = EmbeddingIndex(index_dir, writable=True)
+        embedder = index.get_encoder()
+
+        # Remove chunks that were replaced or deleted since the last build
+        current_ids = np.fromiter((row[0] for row in conn.execute("SELECT chunk_id FROM chunks")), dtype=np.int64)
+        indexed_ids = np.asarray(index.ids[:index.meta['count']])
+        stale_ids = indexed_ids[(indexed_ids >= 0) & ~np.isin(indexed_ids, current_ids)]
+        deleted = index.delete(stale_ids) if len(stale_ids) else 0
+
+        cursor = conn.execute('''
+        SELECT k.chunk_id, a.title, k.heading, k.content
+        FROM chunks k LEFT JOIN article_content a ON a.article_id = k.article_id
+        WHERE k.chunk_id > ?
+        ORDER BY k.chunk_id
+        ''' if 'article_content' in tables else '''
+        SELECT chunk_id, NULL, heading, content FROM chunks WHERE chunk_id > ? ORDER BY chunk_id
+        ''', (index.meta['watermark'],))
+
+        added = 0
+        for rows in iter(lambda: cursor.fetchmany(batch_size), []):
+            vectors = embedder.encode([chunk_text_for_embedding(title, heading, content)
+                                       for _, title, heading, content in rows])
+            index.append([row[0] for row in rows], vectors)
+            index.meta['watermark'] = rows[-1][0]
+            added += len(rows)
+            # Publish progress, so an interrupted build resumes where it stopped
+            index.save()
+
+        if index.meta['count'] and index.meta['deleted'] / index.meta['count'] > COMPACT_THRESHOLD:
+            index.compact()
+        index.save()
+
+        elapsed = time.time() - start_time
+        print(f"Embedding index {index_dir}: {added} chunks added, {deleted} removed, "
+              f"{len(index)} vectors ({index.meta['dim']} x {index.meta['dtype']}) in {elapsed:.2f}s", flush=True)
+        return {'added': added, 'deleted': deleted, 'vectors': len(index), 'seconds': elapsed}
+    finally:
+        conn.close()
+
+
+def get_chunk_details(conn, chunk_ids):
+    """Return {chunk_id: dict} with the article and text of the given chunks."""
+    if not chunk_ids:
+        return {}
+    placeholders = ','.join(['?'] * len(chunk_ids))
+    cursor = conn.execute(f'''
+    SELECT k.chunk_id, k.article_id, a.title, a.url, k.heading, k.content
+    FROM chunks k LEFT JOIN article_content a ON a.article_id = k.article_id
+    WHERE k.chunk_id IN ({placeholders})
+    ''', list(chunk_ids))
+    names = ['chunk_id', 'article_id', 'title', 'url', 'heading', 'content']
+    return {row[0]: dict(zip(names, row)) for row in cursor.fetchall()}
+
+
+def benchmark(index_dir, db_path=None, queries=None, count=256, k=10, batch_sizes=(1, 8, 32, 128)):
+    """
+    Measure per-query latency for different query batch sizes.
+
+    Queries are sampled from chunk texts when a database is given,
+    otherwise random vectors are used.
+
+    Returns:
+        dict: Per-query milliseconds by batch size
+    """
+    index = EmbeddingIndex(index_dir)
+    rng = np.random.default_rng(0)
+    if queries is None and db_path:
+        conn = sqlite3.connect(db_path)
+        try:
+            texts = [row[0] for row in conn.execute("SELECT content FROM chunks ORDER BY RANDOM() LIMIT ?", (count,))]
+        finally:
+            conn.close()
+        queries = [' '.join(text.split()[:12]) for text in texts]
+    if queries:
+        vectors = index.get_encoder().encode(queries)
+    else:
+        vectors = rng.standard_normal((count, index.meta['dim'])).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    print(f"Searching {len(index)} vectors ({index.meta['dim']} x {index.meta['dtype']}) with "
+          f"{len(vectors)} queries, k={k}", flush=True)
+    index.search_vectors(vectors[:8], k)
+
+    results = {}
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        for offset in range(0, len(vectors), batch_size):
+            index.search_vectors(vectors[offset:offset + batch_size], k)
+        per_query = (time.perf_counter() - start) * 1000 / len(vectors)
+        results[batch_size] = per_query
+        print(f"  batch {batch_size:>4}: {per_query:8.3f} ms/query", flush=True)
+    return results
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description='Dense embedding index over article chunks.')
+    subparsers = parser.add_subparsers(dest='command', help='Command to run')
+
+    build_parser = subparsers.add_parser('build', help='Create or update the index from the chunks table')
+    build_parser.add_argument('-d', '--database', default='mckinsey_article_content.db',
+                              help='Content database with chunks (default: mckinsey_article_content.db)')
+    build_parser.add_argument('-o', '--index-dir', default=DEFAULT_INDEX_DIR,
+                              help=f'Index directory (default: {DEFAULT_INDEX_DIR})')
+    build_parser.add_argument('--encoder', choices=sorted(ENCODERS), default='hashing',
+                              help='Encoder for a new index (default: hashing)')
+    build_parser.add_argument('--dim', type=int, default=DEFAULT_DIM,
+                              help=f'Vector size of the hashing encoder (default: {DEFAULT_DIM})')
+    build_parser.add_argument('--dtype', choices=['float16', 'float32'], default=DEFAULT_DTYPE,
+                              help=f'Vector storage type (default: {DEFAULT_DTYPE})')
+    build_parser.add_argument('-b', '--batch-size', type=int, default=DEFAULT_BUILD_BATCH_SIZE,
+                              help=f'Chunks encoded per batch (default: {DEFAULT_BUILD_BATCH_SIZE})')
+    build_parser.add_argument('--rebuild', action='store_true',
+                              help='Discard the index and encode every chunk again')
+
+    query_parser = subparsers.add_parser('query', help='Search the index')
+    query_parser.add_argument('text', nargs='+', help='Query text (several queries are searched as one batch)')
+    query_parser.add_argument('-o', '--index-dir', default=DEFAULT_INDEX_DIR,
+                              help=f'Index directory (default: {DEFAULT_INDEX_DIR})')
+    query_parser.add_argument('-d', '--database', default='mckinsey_article_content.db',
+                              help='Content database for chunk details (default: mckinsey_article_content.db)')
+    query_parser.add_argument('-k', type=int, default=5, help='Results per query (default: 5)')
+
+    bench_parser = subparsers.add_parser('bench', help='Measure query latency by batch size')
+    bench_parser.add_argument('-o', '--index-dir', default=DEFAULT_INDEX_DIR,
+                              help=f'Index directory (default: {DEFAULT_INDEX_DIR})')
+    bench_parser.add_argument('-d', '--database', default=None,
+                              help='Content database to sample query texts from (default: random vectors)')
+    bench_parser.add_argument('-n', '--queries', type=int, default=256, help='Number of queries (default: 256)')
+    bench_parser.add_argument('-k', type=int, default=10, help='Results per query (default: 10)')
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+        return
+
+    try:
+        if args.command == 'build':
+            build_index(args.database, args.index_dir, encoder=args.encoder, dim=args.dim, dtype=args.dtype,
+                        batch_size=args.batch_size, rebuild=args.rebuild)
+        elif args.command == 'query':
+            index = EmbeddingIndex(args.index_dir)
+            results = index.search(args.text, k=args.k)
+            conn = sqlite3.connect(args.database) if os.path.exists(args.database) else None
+            try:
+                for text, hits in zip(args.text, results):
+                    details = get_chunk_details(conn, [chunk_id for chunk_id, _ in hits]) if conn else {}
+                    print(f"Query: {text}")
+                    for rank, (chunk_id, score) in enumerate(hits, 1):
+                        chunk = details.get(chunk_id)
+                        if chunk:
+                            print(f"{rank}. [{score:.3f}] {chunk['title']} (chunk {chunk_id})")
+                            print(f"   {' '.join(chunk['content'].split()[:40])}...")
+                        else:
+                            print(f"{rank}. [{score:.3f}] chunk {chunk_id}")
+            finally:
+                if conn:
+                    conn.close()
+        elif args.command == 'bench':
+            benchmark(args.index_dir, args.database, count=args.queries, k=args.k)
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
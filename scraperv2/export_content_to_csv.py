@@ -7,9 +7,42 @@ import csv
 import argparse
 import sys
 import os
-import html
-import re
-import unicodedata
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from text_normalizer import TextNormalizer
+from dedup import duplicate_filter
+
+# Modules shared with azureml_upload live in the scraper_common package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from scraper_common.export_state import ExportState, compact_csv_parts, get_key_column, get_watermark_column
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Excel character limit per cell
+EXCEL_CELL_LIMIT = 32000  # Using 32000 to be safe (actual limit is 32,767)
+
+# Rows fetched from SQLite and normalized per batch
+DEFAULT_BATCH_SIZE = 500
+
+# Buffer size for the CSV output file
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Dialect of the exported CSV files (also used to read them back when compacting)
+CSV_OPTIONS = {
+    'quoting': csv.QUOTE_ALL,
+    'quotechar': '"',
+    'escapechar': '\\',
+    'doublequote': True,
+}
+
+_normalizer = TextNormalizer()
 
 def connect_to_database(db_path):
     """Connect to the SQLite database."""
@@ -25,44 +58,90 @@ def normalize_text(text):
     """
     Normalize and clean text content for CSV export
     """
-    if not isinstance(text, str):
-        return "" if text is None else str(text)
+    return _normalizer.normalize(text)
+
+def sanitize_rows(rows, columns, excel_compatible=True):
+    """
+    Normalize a batch of database rows for CSV output.
     
-    # Decode HTML entities
-    text = html.unescape(text)
+    Runs in worker processes, so it only takes and returns plain tuples/lists.
+    """
+    content_index = columns.index('content') if 'content' in columns else -1
+    sanitized_rows = []
     
-    # Normalize Unicode (NFKC: compatibility decomposition, followed by canonical composition)
-    text = unicodedata.normalize('NFKC', text)
+    for row in rows:
+        # Create a properly sanitized row
+        sanitized_row = []
+        for index, value in enumerate(row):
+            if value is None:
+                sanitized_row.append('')
+            else:
+                # Normalize text to handle special characters
+                value = normalize_text(str(value))
+                
+                # Truncate content if it's too long for Excel
+                if excel_compatible and index == content_index and len(value) > EXCEL_CELL_LIMIT:
+                    value = value[:EXCEL_CELL_LIMIT] + " [truncated for Excel compatibility]"
+                
+                sanitized_row.append(value)
+        
+        sanitized_rows.append(sanitized_row)
     
-    # Replace common problematic characters
-    replacements = {
-        '\u2018': "'", # Left single quote
-        '\u2019': "'", # Right single quote
-        '\u201c': '"', # Left double quote
-        '\u201d': '"', # Right double quote
-        '\u2013': '-', # En dash
-        '\u2014': '--', # Em dash
-        '\u2026': '...', # Ellipsis
-        '\u00A0': ' ', # Non-breaking space
-        # Add more replacements as needed
-    }
+    return sanitized_rows
+
+def iter_sanitized_batches(batches, columns, excel_compatible=True, workers=1):
+    """
+    Normalize row batches, optionally across a process pool, preserving their order.
     
-    for char, replacement in replacements.items():
-        text = text.replace(char, replacement)
-        
-    # Remove control characters except for tabs and newlines
-    text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', text)
+    At most ``2 * workers`` batches are in flight, so memory stays bounded
+    regardless of the table size.
+    """
+    if workers <= 1:
+        for batch in batches:
+            yield sanitize_rows(batch, columns, excel_compatible)
+        return
     
-    return text
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(sanitize_rows, batch, columns, excel_compatible))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def get_peak_rss_mb():
+    """Return (this process, worker processes) peak resident set size in MB, or None if unknown."""
+    if resource is None:
+        return None
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / (1024 * 1024)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / (1024 * 1024)
+    return own, children
 
-def export_to_csv(db_path, csv_path, include_content=True, include_all_columns=False, excel_compatible=True):
-    """Export database content to CSV file with proper encoding throughout."""
+def export_to_csv(db_path, csv_path, include_content=True, include_all_columns=False, excel_compatible=True,
+                  batch_size=DEFAULT_BATCH_SIZE, workers=1, incremental=False, watermark_column=None,
+                  skip_duplicates=False):
+    """Export database content to CSV file with proper encoding throughout.
+    
+    Rows are streamed from SQLite in batches of ``batch_size`` and normalized
+    by ``workers`` processes, so memory use does not grow with the corpus.
+    
+    With ``incremental``, only rows above the high-water mark recorded by the
+    previous export (rowid, or ``scraped_at`` when the table has it) are
+    written, to a new part file next to ``csv_path``. Use compact_export()
+    to merge the parts back into ``csv_path``.
+    
+    With ``skip_duplicates``, articles recorded as near-duplicates by
+    dedup.py are left out.
+    """
     print(f"Exporting from {db_path} to {csv_path}")
+    start_time = time.time()
     
     # Connect to database with explicit UTF-8 handling
     conn = sqlite3.connect(db_path)
     conn.text_factory = str  # Use Python's default string handling
-    conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
     try:
@@ -84,7 +163,7 @@ def export_to_csv(db_path, csv_path, include_content=True, include_all_columns=F
         all_columns = [column[1] for column in cursor.fetchall()]
         
         # Define columns to exclude by default
-        excluded_columns = []  # Keep all columns in the new structure
+        excluded_columns = ['published_on']  # Parsed from date; exported with --all-columns
         
         # Define columns to include
         if include_all_columns:
@@ -96,62 +175,90 @@ def export_to_csv(db_path, csv_path, include_content=True, include_all_columns=F
         if not include_content and 'content' in columns:
             columns = [col for col in columns if col != 'content']
         
-        # Get all data
-        cursor.execute(f"SELECT {', '.join(columns)} FROM {table_name}")
-        rows = cursor.fetchall()
+        # Select everything, or only the rows added since the previous export
+        state = ExportState(csv_path)
+        watermark_column = get_watermark_column(cursor, table_name, watermark_column)
+        where, params, high_mark, is_part = state.selection(cursor, table_name, watermark_column, incremental)
+        output_path = state.next_part_path() if is_part else csv_path
+        
+        if skip_duplicates:
+            condition = duplicate_filter(cursor) if table_name == 'article_content' else None
+            if condition:
+                where = f"WHERE ({where[len('WHERE '):]}) AND {condition}"
+            else:
+                print("No duplicate information found (run dedup.py first), exporting all articles")
+        
+        cursor.execute(f"SELECT COUNT(*) FROM {table_name} {where}", params)
+        total_rows = cursor.fetchone()[0]
         
-        if not rows:
+        if not total_rows:
+            if is_part:
+                print(f"No new articles since the last export ({watermark_column} {state.watermark})")
+                return {'rows': 0, 'seconds': time.time() - start_time, 'rows_per_second': 0.0,
+                        'peak_rss_mb': None, 'output': None}
             print("No data found in the database.")
             return
         
-        print(f"Found {len(rows)} articles to export")
+        if is_part:
+            print(f"Found {total_rows} new articles since the last export, writing {output_path}")
+        else:
+            print(f"Found {total_rows} articles to export")
+        
+        # Stream rows in bounded batches instead of loading the whole table
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table_name} {where} ORDER BY {watermark_column}", params)
+        batches = iter(lambda: cursor.fetchmany(batch_size), [])
+        
+        # Small exports are not worth starting worker processes for
+        if total_rows <= batch_size:
+            workers = 1
         
-        # Excel character limit per cell
-        EXCEL_CELL_LIMIT = 32000  # Using 32000 to be safe (actual limit is 32,767)
+        exported_rows = 0
+        
+        # Write to a temporary file first, so an interrupted run never leaves a partial export
+        temp_path = output_path + '.tmp'
         
         # Write to CSV with explicit UTF-8 encoding
-        with open(csv_path, 'w', newline='', encoding='utf-8-sig') as csv_file:  # UTF-8 with BOM for Excel
-            writer = csv.writer(csv_file, 
-                               quoting=csv.QUOTE_ALL,
-                               quotechar='"',
-                               escapechar='\\',
-                               doublequote=True)
+        with open(temp_path, 'w', newline='', encoding='utf-8-sig',  # UTF-8 with BOM for Excel
+                  buffering=WRITE_BUFFER_SIZE) as csv_file:
+            writer = csv.writer(csv_file, **CSV_OPTIONS)
             
             # Write header
             writer.writerow(columns)
             
             # Write data rows
-            for row in rows:
-                # Convert row to dictionary for easier column access
-                row_dict = dict(row)
-                
-                # Create a properly sanitized row
-                sanitized_row = []
-                for col in columns:
-                    value = row_dict.get(col, '')
-                    if value is None:
-                        sanitized_row.append('')
-                    else:
-                        # Convert to string if it's not already
-                        value = str(value)
-                        
-                        # Normalize text to handle special characters
-                        value = normalize_text(value)
-                        
-                        # Truncate content if it's too long for Excel
-                        if excel_compatible and col == 'content' and len(value) > EXCEL_CELL_LIMIT:
-                            value = value[:EXCEL_CELL_LIMIT] + " [truncated for Excel compatibility]"
-                        
-                        sanitized_row.append(value)
-                
-                writer.writerow(sanitized_row)
+            for sanitized_rows in iter_sanitized_batches(batches, columns, excel_compatible, workers):
+                writer.writerows(sanitized_rows)
+                exported_rows += len(sanitized_rows)
+        
+        os.replace(temp_path, output_path)
+        
+        # A full export supersedes any earlier part files
+        if not is_part:
+            state.clear_parts()
+        state.save(table_name, watermark_column, high_mark, get_key_column(cursor, table_name))
         
-        print(f"Successfully exported {len(rows)} articles to {csv_path}")
+        elapsed = time.time() - start_time
+        rows_per_second = exported_rows / elapsed if elapsed > 0 else float(exported_rows)
+        
+        print(f"Successfully exported {exported_rows} articles to {output_path}")
+        print(f"Export took {elapsed:.2f}s ({rows_per_second:.0f} rows/s, {workers} worker(s), batch size {batch_size})")
+        
+        peak_rss = get_peak_rss_mb()
+        if peak_rss:
+            print(f"Peak RSS: {peak_rss[0]:.1f} MB (workers: {peak_rss[1]:.1f} MB)")
         
         if excel_compatible:
             print(f"Note: Content fields longer than {EXCEL_CELL_LIMIT} characters were truncated for Excel compatibility.")
             print(f"To export full content without truncation, run with --no-excel-limit flag.")
         
+        return {
+            'rows': exported_rows,
+            'seconds': elapsed,
+            'rows_per_second': rows_per_second,
+            'peak_rss_mb': peak_rss[0] if peak_rss else None,
+            'output': output_path,
+        }
+        
     except Exception as e:
         print(f"Error exporting to CSV: {str(e)}")
         raise
@@ -159,6 +266,17 @@ def export_to_csv(db_path, csv_path, include_content=True, include_all_columns=F
     finally:
         conn.close()
 
+def compact_export(csv_path):
+    """
+    Merge the part files of incremental exports into the main CSV file.
+    
+    Rows exported more than once keep only their newest version.
+    
+    Returns:
+        int: Number of rows in the compacted file
+    """
+    return compact_csv_parts(csv_path, **CSV_OPTIONS)
+
 def main():
     """Main function to handle command line arguments."""
     parser = argparse.ArgumentParser(description='Export McKinsey content database to CSV.')
@@ -172,14 +290,35 @@ def main():
                         help='Include all columns including redundant ones')
     parser.add_argument('--no-excel-limit', action='store_true',
                         help='Export full content without Excel cell size limits')
+    parser.add_argument('-b', '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Rows fetched and normalized per batch (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('-w', '--workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help='Number of processes used to normalize rows (default: up to 4)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only export rows added since the last export, to a new part file')
+    parser.add_argument('--watermark-column', default=None,
+                        help='Column used as the high-water mark (default: scraped_at if present, else rowid)')
+    parser.add_argument('--skip-duplicates', action='store_true',
+                        help='Leave out articles recorded as near-duplicates by dedup.py')
+    parser.add_argument('--compact', action='store_true',
+                        help='Merge the part files of incremental exports into the output file and exit')
     
     args = parser.parse_args()
     
     try:
+        if args.compact:
+            compact_export(args.output)
+            return
+        
         export_to_csv(args.database, args.output, 
                       not args.no_content, 
                       args.all_columns, 
-                      not args.no_excel_limit)
+                      not args.no_excel_limit,
+                      batch_size=args.batch_size,
+                      workers=args.workers,
+                      incremental=args.incremental,
+                      watermark_column=args.watermark_column,
+                      skip_duplicates=args.skip_duplicates)
         print("Export completed successfully!")
     except Exception as e:
         print(f"Error during export: {str(e)}", file=sys.stderr)
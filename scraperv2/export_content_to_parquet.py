@@ -0,0 +1,249 @@
+"""
+Utility script to export the McKinsey content database to Parquet or Arrow IPC.
+
+Rows are streamed from SQLite in batches and written as compressed,
+row-group-chunked columnar files with typed columns. Authors and dates are
+dictionary-encoded, since the same values repeat across many articles.
+"""
+
+import sqlite3
+import argparse
+import sys
+import os
+import time
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from text_normalizer import TextNormalizer
+
+# Rows fetched from SQLite per batch
+DEFAULT_BATCH_SIZE = 1000
+
+# Rows per Parquet row group
+DEFAULT_ROW_GROUP_SIZE = 10000
+
+# Column types for the known article columns; anything else is stored as a string
+INTEGER_COLUMNS = {
+    'id': pa.int64(),
+    'article_id': pa.int64(),
+    'page_number': pa.int32(),
+}
+DICTIONARY_COLUMNS = {'authors', 'date'}
+
+_normalizer = TextNormalizer()
+
+
+class DictionaryBuilder:
+    """
+    Builds dictionary arrays whose dictionary only ever grows.
+
+    Each batch reuses the indices of earlier batches, so writers can emit
+    dictionary deltas instead of replacing the dictionary per batch. Only
+    the values new in a batch are converted and appended to the dictionary.
+    """
+
+    def __init__(self):
+        self._indices = {}
+        self._dictionary = pa.array([], type=pa.string())
+
+    def build(self, values):
+        indices = []
+        new_values = []
+        for value in values:
+            if value is None:
+                indices.append(None)
+                continue
+            index = self._indices.get(value)
+            if index is None:
+                index = len(self._indices)
+                self._indices[value] = index
+                new_values.append(value)
+            indices.append(index)
+        if new_values:
+            self._dictionary = pa.concat_arrays([self._dictionary, pa.array(new_values, type=pa.string())])
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, type=pa.int32()),
+            self._dictionary
+        )
+
+
+def find_article_table(cursor):
+    """Return the name of the article table in the database."""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = [row[0] for row in cursor.fetchall()]
+
+    if 'article_content' in tables:
+        return 'article_content'
+    if 'articles' in tables:
+        return 'articles'
+    raise ValueError(f"No article tables found in database. Available tables: {tables}")
+
+
+def build_schema(columns):
+    """Build the Arrow schema for the exported columns."""
+    fields = []
+    for column in columns:
+        if column in INTEGER_COLUMNS:
+            fields.append(pa.field(column, INTEGER_COLUMNS[column]))
+        elif column in DICTIONARY_COLUMNS:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+def rows_to_record_batch(rows, schema, dictionaries, normalize=True):
+    """Convert a batch of SQLite rows into an Arrow record batch."""
+    arrays = []
+    for index, field in enumerate(schema):
+        values = [row[index] for row in rows]
+        if field.name in INTEGER_COLUMNS:
+            arrays.append(pa.array(values, type=field.type))
+            continue
+
+        values = [None if value is None else str(value) for value in values]
+        if normalize:
+            values = [None if value is None else _normalizer.normalize(value) for value in values]
+
+        if field.name in dictionaries:
+            arrays.append(dictionaries[field.name].build(values))
+        else:
+            arrays.append(pa.array(values, type=pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_to_columnar(db_path, output_path, output_format='parquet', include_content=True,
+                       compression='zstd', batch_size=DEFAULT_BATCH_SIZE,
+                       row_group_size=DEFAULT_ROW_GROUP_SIZE, normalize=True):
+    """
+    Export database content to a Parquet or Arrow IPC file.
+
+    Args:
+        db_path (str): Path to the SQLite database
+        output_path (str): Path to the output file
+        output_format (str): 'parquet' or 'arrow'
+        include_content (bool): Include the article content column
+        compression (str): Compression codec ('zstd', 'snappy', 'gzip' or 'lz4' for Arrow)
+        batch_size (int): Rows fetched from SQLite per batch
+        row_group_size (int): Rows per Parquet row group
+        normalize (bool): Apply the same text normalization as the CSV export
+
+    Returns:
+        dict: Export statistics
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database {db_path} not found")
+
+    print(f"Exporting from {db_path} to {output_path} ({output_format}, {compression})")
+    start_time = time.time()
+
+    conn = sqlite3.connect(db_path)
+    conn.text_factory = str
+    cursor = conn.cursor()
+
+    try:
+        table_name = find_article_table(cursor)
+        print(f"Using table: {table_name}")
+
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        columns = [column[1] for column in cursor.fetchall()]
+        if not include_content:
+            columns = [col for col in columns if col != 'content']
+
+        schema = build_schema(columns)
+        dictionaries = {name: DictionaryBuilder() for name in columns if name in DICTIONARY_COLUMNS}
+
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table_name}")
+        batches = iter(lambda: cursor.fetchmany(batch_size), [])
+
+        exported_rows = 0
+        if output_format == 'parquet':
+            writer = pq.ParquetWriter(output_path, schema, compression=compression,
+                                      use_dictionary=sorted(dictionaries))
+            pending = []
+            pending_rows = 0
+            try:
+                for rows in batches:
+                    pending.append(rows_to_record_batch(rows, schema, dictionaries, normalize))
+                    pending_rows += len(rows)
+                    if pending_rows >= row_group_size:
+                        writer.write_table(pa.Table.from_batches(pending), row_group_size=row_group_size)
+                        exported_rows += pending_rows
+                        pending, pending_rows = [], 0
+                if pending:
+                    writer.write_table(pa.Table.from_batches(pending), row_group_size=row_group_size)
+                    exported_rows += pending_rows
+            finally:
+                writer.close()
+        elif output_format == 'arrow':
+            options = ipc.IpcWriteOptions(compression=compression, emit_dictionary_deltas=True)
+            with ipc.new_file(output_path, schema, options=options) as writer:
+                for rows in batches:
+                    writer.write_batch(rows_to_record_batch(rows, schema, dictionaries, normalize))
+                    exported_rows += len(rows)
+        else:
+            raise ValueError(f"Unknown output format: {output_format}")
+
+        elapsed = time.time() - start_time
+        output_size = os.path.getsize(output_path)
+        rows_per_second = exported_rows / elapsed if elapsed > 0 else float(exported_rows)
+
+        print(f"Successfully exported {exported_rows} articles to {output_path}")
+        print(f"Export took {elapsed:.2f}s ({rows_per_second:.0f} rows/s), file size {output_size / 1024:.1f} KB")
+
+        return {
+            'rows': exported_rows,
+            'seconds': elapsed,
+            'rows_per_second': rows_per_second,
+            'bytes': output_size,
+        }
+
+    except Exception as e:
+        print(f"Error exporting to {output_format}: {str(e)}")
+        raise
+
+    finally:
+        conn.close()
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description='Export McKinsey content database to Parquet or Arrow IPC.')
+    parser.add_argument('-d', '--database', default='mckinsey_article_content.db',
+                        help='Path to the content database (default: mckinsey_article_content.db)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Path to the output file (default: mckinsey_articles_export.parquet or .arrow)')
+    parser.add_argument('-f', '--format', choices=['parquet', 'arrow'], default='parquet',
+                        help='Output format (default: parquet)')
+    parser.add_argument('-c', '--compression', default='zstd',
+                        help='Compression codec (default: zstd)')
+    parser.add_argument('--no-content', action='store_true',
+                        help='Exclude article content from the export')
+    parser.add_argument('--raw', action='store_true',
+                        help='Skip text normalization')
+    parser.add_argument('-b', '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Rows fetched per batch (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--row-group-size', type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                        help=f'Rows per Parquet row group (default: {DEFAULT_ROW_GROUP_SIZE})')
+
+    args = parser.parse_args()
+    output = args.output or f"mckinsey_articles_export.{args.format}"
+
+    try:
+        export_to_columnar(args.database, output,
+                           output_format=args.format,
+                           include_content=not args.no_content,
+                           compression=args.compression,
+                           batch_size=args.batch_size,
+                           row_group_size=args.row_group_size,
+                           normalize=not args.raw)
+        print("Export completed successfully!")
+    except Exception as e:
+        print(f"Error during export: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,16 @@ McKinsey link extraction utilities.
 Contains functions for extracting article links and metadata.
 """
 
+import os
+import sys
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
-import re
+
+# Modules shared with azureml_upload live in the scraper_common package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from scraper_common.metadata_extraction import NOT_SPECIFIED, find_authors, find_listing_date, extract_metadata_batch
 
 def extract_article_links(driver, page_number):
     """Extract article links from McKinsey search page."""
@@ -21,6 +28,7 @@ def extract_article_links(driver, page_number):
             
         print(f"[OK] Found {len(links)} potential article links", flush=True)
         
+        candidates = []
         for idx, link in enumerate(links[:10], 1):
             try:
                 title = link.text.strip()
@@ -32,7 +40,8 @@ def extract_article_links(driver, page_number):
                     
                 print(f"  [OK] Found article link: {title}", flush=True)
                 
-                # Extract metadata from parent container
+                # Find the text of the parent container holding the metadata
+                parent_text = None
                 try:
                     parent = link
                     for _ in range(5):  # Try going up a few levels
@@ -40,30 +49,25 @@ def extract_article_links(driver, page_number):
                         parent_text = parent.text
                         if len(parent_text) > 100:  # Found a substantial container
                             break
-                    
-                    # Extract metadata using pattern matching
-                    authors = extract_authors_from_text(parent_text)
-                    date = extract_date_from_text(parent_text)
-                    
-                    links_data.append({
-                        "title": title,
-                        "url": url,
-                        "page_number": page_number,
-                        "authors": authors,
-                        "date": date
-                    })
-                except Exception as e:
-                    links_data.append({
-                        "title": title,
-                        "url": url,
-                        "page_number": page_number,
-                        "authors": "Not specified",
-                        "date": "Not specified"
-                    })
+                except Exception:
+                    parent_text = None
+                
+                candidates.append((title, url, parent_text))
                     
             except Exception as e:
                 print(f"  [!] Error processing link: {str(e)}", flush=True)
         
+        # Extract metadata in one batch (links in the same container share the work)
+        metadata = extract_metadata_batch([parent_text for _, _, parent_text in candidates])
+        for (title, url, _), fields in zip(candidates, metadata):
+            links_data.append({
+                "title": title,
+                "url": url,
+                "page_number": page_number,
+                "authors": fields['authors'],
+                "date": fields['date']
+            })
+        
         print(f"[OK] Extracted {len(links_data)} article links", flush=True)
         return links_data
             
@@ -73,35 +77,12 @@ def extract_article_links(driver, page_number):
 
 def extract_authors_from_text(text):
     """Extract authors from text content using pattern matching."""
-    # Look for author pattern: Starts with "By " and continues until a new line
-    author_match = re.search(r'By\s+([^\.]+?)\n', text)
-    if author_match:
-        return author_match.group(1).strip()
-    
-    # Try alternative patterns
-    author_lines = [line for line in text.split('\n') if line.strip().startswith('By ')]
-    if author_lines:
-        return author_lines[0].replace('By ', '').strip()
-    
-    return "Not specified"
+    return find_authors(text)
 
 def extract_date_from_text(text):
     """Extract date from text content using pattern matching."""
-    # Format: Category | Type | Date
-    date_pattern = re.search(r'\|\s*(\w+\s+\d{1,2},\s*\d{4})', text)
-    if date_pattern:
-        return date_pattern.group(1).strip()
-    
-    # Alternative: Look for month names followed by dates
-    months = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 
-              'August', 'September', 'October', 'November', 'December']
-    
-    for month in months:
-        month_pattern = re.search(r'(' + month + r'\s+\d{1,2},\s*\d{4})', text)
-        if month_pattern:
-            return month_pattern.group(1).strip()
-    
-    return "Not specified"
+    date = find_listing_date(text)
+    return date if date is not None else NOT_SPECIFIED
 
 def extract_authors(article_element):
     """Extract authors from an article element."""
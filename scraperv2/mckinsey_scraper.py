@@ -2,6 +2,7 @@
 McKinsey scraper for extracting article information from search results.
 """
 
+import os
 import time
 import sqlite3
 from concurrent.futures import ThreadPoolExecutor
@@ -16,6 +17,13 @@ import math
 # Import utilities
 from cookie_handler import handle_cookies
 from link_extractor import extract_article_links, extract_authors, extract_date
+# Modules shared with azureml_upload live in the scraper_common package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from scraper_common.metadata_extraction import parse_date
+from scraper_common.selector_stats import get_stats as get_selector_stats
+from published_dates import ensure_published_on
 
 def setup_database():
     """Set up SQLite database for storing articles."""
@@ -28,10 +36,14 @@ def setup_database():
         authors TEXT,
         date TEXT,
         url TEXT UNIQUE,
-        page_number INTEGER
+        page_number INTEGER,
+        published_on DATE
     )
     ''')
     conn.commit()
+    
+    # Databases created before published_on existed get the column and its index
+    ensure_published_on(conn, 'articles')
     return conn
 
 def save_to_database(conn, articles):
@@ -45,8 +57,9 @@ def save_to_database(conn, articles):
     for article in articles:
         try:
             cursor.execute(
-                "INSERT INTO articles (title, authors, date, url, page_number) VALUES (?, ?, ?, ?, ?)",
-                (article['title'], article['authors'], article['date'], article['url'], article['page_number'])
+                "INSERT INTO articles (title, authors, date, url, page_number, published_on) VALUES (?, ?, ?, ?, ?, ?)",
+                (article['title'], article['authors'], article['date'], article['url'], article['page_number'],
+                 parse_date(article['date']))
             )
             inserted_count += 1
         except sqlite3.IntegrityError:
@@ -122,9 +135,12 @@ def scrape_page(page_number, driver):
         
         articles_data = []
         found_container = False
+        title_selectors = ["h2 a", "h3 a", "h4 a", ".title a", "a.title"]
         
-        # Try to find article containers with selectors
-        for selector in selectors:
+        # Try to find article containers with selectors, the one that usually
+        # yields articles first (see selector_stats.py)
+        selector_stats = get_selector_stats()
+        for selector in selector_stats.order('search_containers', selectors, page_url):
             articles = driver.find_elements(By.CSS_SELECTOR, selector)
             if articles:
                 found_container = True
@@ -135,13 +151,14 @@ def scrape_page(page_number, driver):
                     try:
                         # Find title and URL
                         title_element = None
-                        title_selectors = ["h2 a", "h3 a", "h4 a", ".title a", "a.title"]
                         
-                        for title_selector in title_selectors:
+                        for title_selector in selector_stats.order('search_titles', title_selectors, page_url):
                             try:
                                 title_element = article.find_element(By.CSS_SELECTOR, title_selector)
+                                selector_stats.record('search_titles', title_selector, True, page_url)
                                 break
                             except:
+                                selector_stats.record('search_titles', title_selector, False, page_url)
                                 continue
                         
                         if not title_element:
@@ -176,9 +193,14 @@ def scrape_page(page_number, driver):
                     except Exception as e:
                         print(f"Error extracting article data: {str(e)}", flush=True)
                 
+                # Containers only count as a match if they yielded articles
+                selector_stats.record('search_containers', selector, bool(articles_data), page_url)
+                
                 # If we found and processed articles, break out of selector loop
                 if articles_data:
                     break
+            else:
+                selector_stats.record('search_containers', selector, False, page_url)
         
         # If no articles found with selectors, try direct link extraction
         if not found_container or not articles_data:
@@ -0,0 +1,352 @@
+"""
+Offline benchmarks for the parsing hot paths.
+
+Times the search page and metadata parsers against the fixtures checked into
+this directory, with no browser or network:
+
+- parse_articles and get_total_results_and_pages (azureml_upload/mckinsey_scraper.py)
+  on mckinsey_search_debug.html as saved, and on search pages rendered from
+  its result template with the rows of mckinsey_articles_links.csv
+- extract_authors_from_text and extract_date_from_text (link_extractor.py) on
+  listing texts built from mckinsey_articles_links.csv and on the article
+  texts of mckinsey_articles_export.csv
+- normalize_text (export_content_to_csv.py) on every cell of
+  mckinsey_articles_export.csv
+
+Each case is repeated and reported as operations (calls) per second. The
+results can be saved as baselines and later runs checked against them:
+
+    python parser_benchmark.py --save
+    python parser_benchmark.py --check --threshold 0.2
+"""
+
+import argparse
+import csv
+import html
+import importlib.util
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+
+from link_extractor import extract_authors_from_text, extract_date_from_text
+from export_content_to_csv import normalize_text
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRAPER_PATH = os.path.join(BASE_DIR, '..', 'azureml_upload', 'mckinsey_scraper.py')
+SEARCH_HTML = os.path.join(BASE_DIR, 'mckinsey_search_debug.html')
+LINKS_CSV = os.path.join(BASE_DIR, 'mckinsey_articles_links.csv')
+EXPORT_CSV = os.path.join(BASE_DIR, 'mckinsey_articles_export.csv')
+DEFAULT_BASELINES = os.path.join(BASE_DIR, 'parser_benchmark_baselines.json')
+
+# Results per rendered search page, and number of rendered pages
+RESULTS_PER_PAGE = 10
+RENDERED_PAGES = 20
+
+DEFAULT_REPEAT = 5
+
+# Minimum duration of one measured round (inputs are looped until it is reached)
+MIN_ROUND_TIME = 0.2
+
+# Allowed slowdown against the baseline before --check fails (0.2 = 20% fewer ops/s)
+DEFAULT_THRESHOLD = 0.2
+
+# Marker of the result templates in mckinsey_search_debug.html
+TEMPLATES_MARKER = '<div class="search-result-templates">'
+
+# Result count rendered above the results, where get_total_results_and_pages looks for it
+COUNT_TEMPLATE = '<p class="search-results-count">Showing {first}-{last} of {total} results</p>'
+
+ITEM_TEMPLATE = """
+        <div class="item">
+            <div class="text-wrapper">
+                <a href="{url}" class="item-title-link">
+                    <h3 class="headline">{title}</h3>
+                </a>
+                <small class="subtitle u-mt-1">{byline}</small>
+                <p class="description">{title}</p>
+                <small class="subtitle">Article | {date}</small>
+            </div>
+        </div>"""
+
+
+def read_csv(path):
+    """Read a CSV fixture as a list of rows (the header row is skipped)."""
+    csv.field_size_limit(sys.maxsize)
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.reader(f))
+    return rows[1:]
+
+
+def load_scraper():
+    """
+    Import azureml_upload/mckinsey_scraper.py under its own module name.
+
+    It shares its file name with this directory's mckinsey_scraper.py, and
+    imports database_utils from its own directory.
+    """
+    scraper_dir = os.path.dirname(os.path.abspath(SCRAPER_PATH))
+    if scraper_dir not in sys.path:
+        sys.path.append(scraper_dir)
+    spec = importlib.util.spec_from_file_location('azureml_mckinsey_scraper', SCRAPER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # Debug snapshots would be written for sampled or failed pages
+    import debug_capture
+    debug_capture.set_capture(debug_capture.DebugCapture(mode='off'))
+    # Selector statistics are kept in memory instead of selector_stats.json
+    from scraper_common import selector_stats
+    selector_stats.set_stats(selector_stats.SelectorStats(path=None))
+    # Per-article log lines would dominate the timings and flood the output
+    logging.getLogger(module.__name__).setLevel(logging.ERROR)
+    return module
+
+
+def render_search_pages(search_html, links, pages=RENDERED_PAGES, per_page=RESULTS_PER_PAGE):
+    """
+    Render search result pages the way the site's JavaScript fills the result template.
+
+    Args:
+        search_html (str): Saved search page (with its templates)
+        links (list): Rows of mckinsey_articles_links.csv
+        pages (int): Number of pages to render
+        per_page (int): Results per page
+
+    Returns:
+        list: HTML of each page
+    """
+    if TEMPLATES_MARKER not in search_html:
+        raise ValueError(f"Result templates not found in {SEARCH_HTML}")
+    rendered = []
+    for page in range(pages):
+        rows = links[page * per_page:(page + 1) * per_page]
+        if not rows:
+            break
+        items = ''.join(ITEM_TEMPLATE.format(
+            url=html.escape(row[4]),
+            title=html.escape(row[1]),
+            byline='' if row[2] == 'Not specified' else 'By ' + html.escape(row[2]),
+            date=html.escape(row[3]),
+        ) for row in rows)
+        first = page * per_page + 1
+        count = COUNT_TEMPLATE.format(first=first, last=first + len(rows) - 1, total=len(links))
+        page_html = search_html.replace(
+            TEMPLATES_MARKER, f'{count}\n<div class="search-results">{items}\n</div>\n{TEMPLATES_MARKER}', 1)
+        rendered.append(page_html)
+    return rendered
+
+
+def listing_texts(links):
+    """Build the text of each search listing container (title, byline, category | type | date)."""
+    texts = []
+    for row in links:
+        byline = '' if row[2] == 'Not specified' else f"By {row[2]}\n"
+        texts.append(f"{row[1]}\n{byline}Insights | Article | {row[3]}\n")
+    return texts
+
+
+def build_cases():
+    """
+    Load the fixtures and build the benchmark cases.
+
+    Returns:
+        list: (name, function, inputs, count_result) tuples; count_result tells
+              whether one call's result counts as a hit
+    """
+    scraper = load_scraper()
+    with open(SEARCH_HTML, 'r', encoding='utf-8') as f:
+        search_html = f.read()
+    links = read_csv(LINKS_CSV)
+    export_rows = read_csv(EXPORT_CSV)
+
+    pages = render_search_pages(search_html, links)
+    listings = listing_texts(links)
+    contents = [row[-1] for row in export_rows]
+    cells = [cell for row in export_rows for cell in row]
+
+    def specified(result):
+        return result != 'Not specified'
+
+    def found_pages(result):
+        return result[0] > 0
+
+    return [
+        ('parse_articles[search_debug]', scraper.parse_articles, [search_html], len),
+        ('parse_articles[rendered]', scraper.parse_articles, pages, len),
+        ('get_total_results_and_pages[search_debug]', scraper.get_total_results_and_pages, [search_html], found_pages),
+        ('get_total_results_and_pages[rendered]', scraper.get_total_results_and_pages, pages, found_pages),
+        ('extract_authors_from_text[listing]', extract_authors_from_text, listings, specified),
+        ('extract_authors_from_text[content]', extract_authors_from_text, contents, specified),
+        ('extract_date_from_text[listing]', extract_date_from_text, listings, specified),
+        ('extract_date_from_text[content]', extract_date_from_text, contents, specified),
+        ('normalize_text[export]', normalize_text, cells, len),
+    ]
+
+
+def measure(function, inputs, count_result, repeat=DEFAULT_REPEAT, min_time=MIN_ROUND_TIME):
+    """
+    Time a function over its inputs.
+
+    Args:
+        function (callable): Function taking one input
+        inputs (list): Inputs of one pass
+        count_result (callable): Maps a result to a number (or bool) summed into 'results'
+        repeat (int): Number of measured rounds
+        min_time (float): Minimum seconds per round
+
+    Returns:
+        dict: Best and median operations per second, and the summed results of one pass
+    """
+    # One unmeasured pass warms caches and gives the result summary
+    start = time.perf_counter()
+    results = sum(int(count_result(function(value))) for value in inputs)
+    elapsed = time.perf_counter() - start
+    passes = max(1, int(min_time / max(elapsed, 1e-9)))
+
+    rates = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(passes):
+            for value in inputs:
+                function(value)
+        rates.append(passes * len(inputs) / (time.perf_counter() - start))
+
+    return {
+        'ops_per_sec': max(rates),
+        'median_ops_per_sec': statistics.median(rates),
+        'calls': passes * len(inputs) * repeat,
+        'results': results,
+    }
+
+
+def run_benchmarks(only=None, repeat=DEFAULT_REPEAT, min_time=MIN_ROUND_TIME):
+    """
+    Run the benchmark cases.
+
+    Args:
+        only (list, optional): Substrings selecting the cases to run
+        repeat (int): Number of measured rounds per case
+        min_time (float): Minimum seconds per round
+
+    Returns:
+        dict: Case name -> measurement
+    """
+    cases = build_cases()
+    if only:
+        cases = [case for case in cases if any(part in case[0] for part in only)]
+        if not cases:
+            raise ValueError(f"No benchmark matches {', '.join(only)}")
+
+    results = {}
+    for name, function, inputs, count_result in cases:
+        results[name] = measure(function, inputs, count_result, repeat, min_time)
+        print(f"  {name:<44} {results[name]['ops_per_sec']:12,.1f} ops/s  "
+              f"(median {results[name]['median_ops_per_sec']:,.1f}, {len(inputs)} inputs, "
+              f"{results[name]['results']} results)", flush=True)
+    return results
+
+
+def load_baselines(path):
+    """Load stored baselines (an empty dict if the file does not exist)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baselines(path, results):
+    """Store the results as baselines, together with the environment they were measured in."""
+    baselines = load_baselines(path)
+    baselines.setdefault('cases', {})
+    for name, result in results.items():
+        baselines['cases'][name] = {'ops_per_sec': round(result['ops_per_sec'], 1), 'results': result['results']}
+    baselines['environment'] = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'measured_at': time.strftime('%Y-%m-%d'),
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def check_baselines(results, baselines, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare results with the baselines.
+
+    A case regresses when its ops/s drop more than threshold below the
+    baseline, or when its result summary differs (the parser output changed).
+
+    Returns:
+        list: Descriptions of the regressions
+    """
+    regressions = []
+    cases = baselines.get('cases', {})
+    for name, result in results.items():
+        baseline = cases.get(name)
+        if not baseline:
+            print(f"  {name:<44} no baseline", flush=True)
+            continue
+        change = result['ops_per_sec'] / baseline['ops_per_sec'] - 1
+        print(f"  {name:<44} {change:+7.1%} vs {baseline['ops_per_sec']:,.1f} ops/s", flush=True)
+        if change < -threshold:
+            regressions.append(f"{name}: {result['ops_per_sec']:,.1f} ops/s is {-change:.1%} below "
+                               f"the baseline of {baseline['ops_per_sec']:,.1f} ops/s")
+        if baseline.get('results') is not None and result['results'] != baseline['results']:
+            regressions.append(f"{name}: {result['results']} results, baseline has {baseline['results']}")
+    return regressions
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark the parsing hot paths on the checked-in fixtures.')
+    parser.add_argument('-k', '--only', action='append', help='Run only cases whose name contains this text (can be repeated)')
+    parser.add_argument('-r', '--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f'Measured rounds per case (default: {DEFAULT_REPEAT})')
+    parser.add_argument('--min-time', type=float, default=MIN_ROUND_TIME,
+                        help=f'Minimum seconds per round (default: {MIN_ROUND_TIME})')
+    parser.add_argument('-b', '--baselines', default=DEFAULT_BASELINES,
+                        help='Baselines file (default: parser_benchmark_baselines.json next to this script)')
+    parser.add_argument('--save', action='store_true', help='Store the results as the new baselines')
+    parser.add_argument('--check', action='store_true', help='Fail when a case regresses against the baselines')
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Allowed slowdown for --check, as a fraction (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+
+    args = parser.parse_args()
+
+    try:
+        print(f"Running parser benchmarks ({args.repeat} rounds of at least {args.min_time}s per case)", flush=True)
+        results = run_benchmarks(args.only, args.repeat, args.min_time)
+
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+
+        if args.check:
+            baselines = load_baselines(args.baselines)
+            if not baselines:
+                raise FileNotFoundError(f"No baselines in {args.baselines}; run with --save first")
+            print(f"Comparing with {args.baselines} (threshold {args.threshold:.0%})", flush=True)
+            regressions = check_baselines(results, baselines, args.threshold)
+            if regressions:
+                print("Regressions:", file=sys.stderr)
+                for regression in regressions:
+                    print(f"  {regression}", file=sys.stderr)
+                sys.exit(2)
+            print("No regressions", flush=True)
+
+        if args.save:
+            save_baselines(args.baselines, results)
+            print(f"Saved baselines to {args.baselines}", flush=True)
+    except Exception as e:
+        print(f"Error during benchmark: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+Normalized publication dates for the article tables.
+
+Scraped dates are free text ("March 12, 2024", "Not specified", ...). This
+module adds an indexed published_on DATE column (ISO 'YYYY-MM-DD' text,
+NULL when the date could not be parsed) next to the raw date column,
+backfills it for existing rows, and provides the queries that use the index:
+date-range filters and newest-first keyset pagination, which reads only the
+requested page instead of scanning and parsing the whole table.
+
+Usage:
+    python published_dates.py backfill -d mckinsey_articles.db
+    python published_dates.py stats -d mckinsey_article_content.db
+    python published_dates.py newest -d mckinsey_articles.db --last-days 365 -n 20
+"""
+
+import argparse
+import sqlite3
+import sys
+import os
+import time
+from datetime import date, datetime, timedelta
+
+# Modules shared with azureml_upload live in the scraper_common package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from scraper_common.metadata_extraction import parse_date
+
+PUBLISHED_COLUMN = 'published_on'
+
+# Raw date columns, in order of preference
+DATE_COLUMNS = ('date', 'date_published')
+
+# Rows parsed and updated per transaction by backfill_published_on()
+DEFAULT_BATCH_SIZE = 1000
+
+DEFAULT_PAGE_SIZE = 20
+
+
+def get_table_columns(conn, table):
+    """
+    Return the column names of a table.
+
+    Raises:
+        ValueError: If the table does not exist
+    """
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+    if row is None:
+        raise ValueError(f"Table {table} not found")
+    return [column[1] for column in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def detect_date_column(conn, table):
+    """Return the raw date column of a table (see DATE_COLUMNS), or None."""
+    columns = get_table_columns(conn, table)
+    return next((column for column in DATE_COLUMNS if column in columns), None)
+
+
+def get_dated_tables(conn):
+    """Return the tables that have a raw date column."""
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+    return [table for table in tables if detect_date_column(conn, table)]
+
+
+def to_iso_date(value):
+    """Normalize a filter bound (date, datetime or string) to 'YYYY-MM-DD'."""
+    if value is None:
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    parsed = parse_date(str(value))
+    if parsed is None:
+        raise ValueError(f"Unrecognized date: {value}")
+    return parsed
+
+
+def days_ago(days):
+    """Return the ISO date a number of days before today (for "last N days" filters)."""
+    return (date.today() - timedelta(days=days)).isoformat()
+
+
+def ensure_published_on(conn, table):
+    """
+    Add the published_on column and its index to a table if they are missing.
+
+    Args:
+        conn (sqlite3.Connection): Database connection
+        table (str): Table name
+
+    Returns:
+        bool: True if the column was added
+    """
+    added = PUBLISHED_COLUMN not in get_table_columns(conn, table)
+    with conn:
+        if added:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {PUBLISHED_COLUMN} DATE")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{PUBLISHED_COLUMN} ON {table}({PUBLISHED_COLUMN})")
+    return added
+
+
+def backfill_published_on(conn, table, date_column=None, batch_size=DEFAULT_BATCH_SIZE, reparse=False):
+    """
+    Fill published_on from the raw date column.
+
+    Rows are read in rowid order in batches, so the table is never held in
+    memory and each batch is its own short transaction.
+
+    Args:
+        conn (sqlite3.Connection): Database connection
+        table (str): Table name
+        date_column (str, optional): Raw date column (default: detected)
+        batch_size (int): Rows per batch
+        reparse (bool): Parse every row again, not only rows without published_on
+
+    Returns:
+        dict: Number of rows scanned and parsed
+    """
+    date_column = date_column or detect_date_column(conn, table)
+    if date_column not in get_table_columns(conn, table):
+        raise ValueError(f"Table {table} has no date column")
+    ensure_published_on(conn, table)
+
+    condition = '' if reparse else f"AND {PUBLISHED_COLUMN} IS NULL"
+    select_sql = (f"SELECT rowid, {date_column} FROM {table} "
+                  f"WHERE rowid > ? {condition} ORDER BY rowid LIMIT ?")
+    update_sql = f"UPDATE {table} SET {PUBLISHED_COLUMN} = ? WHERE rowid = ?"
+
+    parsed_values = {}
+    scanned = parsed = 0
+    last_rowid = -1
+    while True:
+        rows = conn.execute(select_sql, (last_rowid, batch_size)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for rowid, value in rows:
+            if value not in parsed_values:
+                parsed_values[value] = parse_date(value) if isinstance(value, str) else None
+            published_on = parsed_values[value]
+            if published_on is not None:
+                parsed += 1
+            if published_on is not None or reparse:
+                updates.append((published_on, rowid))
+        with conn:
+            conn.executemany(update_sql, updates)
+        scanned += len(rows)
+        last_rowid = rows[-1][0]
+
+    return {'table': table, 'scanned': scanned, 'parsed': parsed, 'unparsed': scanned - parsed}
+
+
+def date_range_condition(date_from=None, date_to=None, column=PUBLISHED_COLUMN):
+    """
+    Build an indexable SQL condition for an inclusive date range.
+
+    Args:
+        date_from: Earliest date (date, datetime or date string), or None
+        date_to: Latest date, or None
+        column (str): Column (or qualified column) holding ISO dates
+
+    Returns:
+        tuple: (SQL condition or '', list of parameters)
+    """
+    conditions, params = [], []
+    if date_from is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(to_iso_date(date_from))
+    if date_to is not None:
+        conditions.append(f"{column} <= ?")
+        params.append(to_iso_date(date_to))
+    return ' AND '.join(conditions), params
+
+
+def _newest_sql(conn, table, columns, date_from, date_to, after):
+    """Build the keyset pagination statement and its parameters."""
+    available = get_table_columns(conn, table)
+    if PUBLISHED_COLUMN not in available:
+        raise ValueError(f"Table {table} has no {PUBLISHED_COLUMN} column; run the backfill first")
+    columns = list(columns) if columns else available
+    unknown = [column for column in columns if column not in available]
+    if unknown:
+        raise ValueError(f"Unknown columns for {table}: {', '.join(unknown)}")
+
+    conditions = [f"{PUBLISHED_COLUMN} IS NOT NULL"]
+    range_condition, params = date_range_condition(date_from, date_to)
+    if range_condition:
+        conditions.append(range_condition)
+    if after is not None:
+        conditions.append(f"({PUBLISHED_COLUMN}, rowid) < (?, ?)")
+        params.extend([after[0], after[1]])
+
+    sql = (f"SELECT rowid, {PUBLISHED_COLUMN}, {', '.join(columns)} FROM {table} "
+           f"WHERE {' AND '.join(conditions)} "
+           f"ORDER BY {PUBLISHED_COLUMN} DESC, rowid DESC LIMIT ?")
+    return sql, params, columns
+
+
+def get_newest(conn, table, limit=DEFAULT_PAGE_SIZE, after=None, date_from=None, date_to=None, columns=None):
+    """
+    Return one page of rows, newest first.
+
+    Pages are addressed by the (published_on, rowid) of the last row of the
+    previous page rather than by an offset, so every page is read straight
+    from the published_on index. Rows without a parsed date are skipped.
+
+    Args:
+        conn (sqlite3.Connection): Database connection
+        table (str): Table name
+        limit (int): Rows per page
+        after (tuple, optional): Cursor returned with the previous page
+        date_from: Earliest date (inclusive), or None
+        date_to: Latest date (inclusive), or None
+        columns (list, optional): Columns to return (default: all)
+
+    Returns:
+        tuple: (list of row dicts, cursor for the next page or None)
+    """
+    sql, params, columns = _newest_sql(conn, table, columns, date_from, date_to, after)
+    rows = conn.execute(sql, params + [limit]).fetchall()
+    results = [dict(zip(columns, row[2:])) for row in rows]
+    cursor = (rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+    return results, cursor
+
+
+def iter_newest(conn, table, page_size=DEFAULT_PAGE_SIZE, date_from=None, date_to=None, columns=None):
+    """Yield rows newest first, reading one keyset page at a time."""
+    after = None
+    while True:
+        rows, after = get_newest(conn, table, page_size, after, date_from, date_to, columns)
+        yield from rows
+        if after is None:
+            break
+
+
+def explain_newest(conn, table, date_from=None, date_to=None):
+    """Return the query plan of a newest-first page (to check that the index is used)."""
+    sql, params, _ = _newest_sql(conn, table, [PUBLISHED_COLUMN], date_from, date_to, ('9999-12-31', 0))
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params + [1])]
+
+
+def get_date_stats(conn, table, date_column=None):
+    """
+    Summarize published_on for a table.
+
+    Returns:
+        dict: Row counts, date range and the most common unparsed raw dates
+    """
+    date_column = date_column or detect_date_column(conn, table)
+    if PUBLISHED_COLUMN not in get_table_columns(conn, table):
+        total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        return {'table': table, 'total': total, 'dated': 0, 'undated': total, 'oldest': None,
+                'newest': None, 'unparsed_samples': [], 'migrated': False}
+
+    total, dated, oldest, newest = conn.execute(
+        f"SELECT COUNT(*), COUNT({PUBLISHED_COLUMN}), MIN({PUBLISHED_COLUMN}), MAX({PUBLISHED_COLUMN}) "
+        f"FROM {table}").fetchone()
+    samples = conn.execute(
+        f"SELECT {date_column}, COUNT(*) FROM {table} WHERE {PUBLISHED_COLUMN} IS NULL "
+        f"GROUP BY {date_column} ORDER BY COUNT(*) DESC LIMIT 5").fetchall()
+    return {'table': table, 'total': total, 'dated': dated, 'undated': total - dated, 'oldest': oldest,
+            'newest': newest, 'unparsed_samples': samples, 'migrated': True}
+
+
+def parse_cursor(value):
+    """Parse a 'YYYY-MM-DD:rowid' cursor given on the command line."""
+    published_on, separator, rowid = value.rpartition(':')
+    if not separator:
+        raise ValueError(f"Invalid cursor {value}; expected YYYY-MM-DD:rowid")
+    return to_iso_date(published_on), int(rowid)
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description='Normalized publication dates for the article tables.')
+    subparsers = parser.add_subparsers(dest='command', help='Command to run')
+
+    def add_common_arguments(command_parser):
+        command_parser.add_argument('-d', '--database', default='mckinsey_articles.db',
+                                    help='Path to the database (default: mckinsey_articles.db)')
+        command_parser.add_argument('-t', '--table', action='append',
+                                    help='Table to use (default: every table with a date column)')
+
+    backfill_parser = subparsers.add_parser('backfill', help='Add published_on and parse the existing dates')
+    add_common_arguments(backfill_parser)
+    backfill_parser.add_argument('--date-column', default=None, help='Raw date column (default: detected)')
+    backfill_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                                 help=f'Rows per transaction (default: {DEFAULT_BATCH_SIZE})')
+    backfill_parser.add_argument('--reparse', action='store_true', help='Parse every row again')
+
+    stats_parser = subparsers.add_parser('stats', help='Show parsed date coverage')
+    add_common_arguments(stats_parser)
+
+    newest_parser = subparsers.add_parser('newest', help='List rows newest first')
+    add_common_arguments(newest_parser)
+    newest_parser.add_argument('-n', '--limit', type=int, default=DEFAULT_PAGE_SIZE,
+                               help=f'Rows per page (default: {DEFAULT_PAGE_SIZE})')
+    newest_parser.add_argument('--from', dest='date_from', default=None, help='Earliest date (YYYY-MM-DD)')
+    newest_parser.add_argument('--to', dest='date_to', default=None, help='Latest date (YYYY-MM-DD)')
+    newest_parser.add_argument('--last-days', type=int, default=None, help='Only the last N days')
+    newest_parser.add_argument('--after', default=None, help='Cursor printed with the previous page')
+    newest_parser.add_argument('--explain', action='store_true', help='Print the query plan')
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        sys.exit(1)
+
+    try:
+        if not os.path.exists(args.database):
+            raise FileNotFoundError(f"Database {args.database} not found")
+        conn = sqlite3.connect(args.database)
+        try:
+            tables = args.table or get_dated_tables(conn)
+            if not tables:
+                raise ValueError(f"No table with a date column in {args.database}")
+
+            if args.command == 'backfill':
+                for table in tables:
+                    start_time = time.time()
+                    result = backfill_published_on(conn, table, args.date_column, args.batch_size, args.reparse)
+                    print(f"{table}: parsed {result['parsed']} of {result['scanned']} rows "
+                          f"({result['unparsed']} without a recognizable date) in {time.time() - start_time:.2f}s",
+                          flush=True)
+
+            elif args.command == 'stats':
+                for table in tables:
+                    stats = get_date_stats(conn, table)
+                    if not stats['migrated']:
+                        print(f"{table}: {stats['total']} rows, no {PUBLISHED_COLUMN} column (run backfill)")
+                        continue
+                    print(f"{table}: {stats['dated']} of {stats['total']} rows dated, "
+                          f"{stats['oldest']} to {stats['newest']}")
+                    for value, count in stats['unparsed_samples']:
+                        print(f"  unparsed: {value!r} ({count} rows)")
+
+            elif args.command == 'newest':
+                date_from = days_ago(args.last_days) if args.last_days is not None else args.date_from
+                after = parse_cursor(args.after) if args.after else None
+                for table in tables:
+                    if args.explain:
+                        for line in explain_newest(conn, table, date_from, args.date_to):
+                            print(f"[plan] {line}")
+                    columns = [column for column in ('title', PUBLISHED_COLUMN, 'url')
+                               if column in get_table_columns(conn, table)]
+                    rows, cursor = get_newest(conn, table, args.limit, after, date_from, args.date_to, columns)
+                    for row in rows:
+                        print(f"{row.get(PUBLISHED_COLUMN)}  {row.get('title')}  {row.get('url', '')}")
+                    if cursor:
+                        print(f"Next page: --after {cursor[0]}:{cursor[1]}")
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
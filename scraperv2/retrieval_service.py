@@ -0,0 +1,455 @@
+"""
+Local HTTP service returning the article passages most relevant to a change initiative.
+
+The service answers from the local content database: from the embedding
+index over the chunks (embedding_index.py) when it exists, otherwise from
+the FTS5 full-text index (search_index.py).
+
+- Concurrent requests are micro-batched: queries arriving within
+  --batch-wait-ms of each other are searched together, so the embedding
+  backend scores all of them in one matrix product.
+- Results are kept in an LRU cache keyed on the normalized form fields,
+  and identical requests in flight share one search.
+- GET /stats reports cache hits, batch sizes, latency percentiles and
+  throughput.
+
+    python retrieval_service.py -d mckinsey_article_content.db --port 8081
+
+    POST /retrieve  {"formData": {...}, "k": 5}  or  {"query": "...", "k": 5}
+    GET  /stats
+    GET  /health
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from search_index import SearchIndex, percentile
+
+DEFAULT_PORT = 8081
+DEFAULT_K = 5
+MAX_K = 20
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_BATCH_WAIT_MS = 5
+DEFAULT_PASSAGE_CHARS = 1200
+
+# Passages of the same article returned for one query at most
+MAX_PASSAGES_PER_ARTICLE = 2
+
+# Latency samples kept for the percentiles, and window of the recent throughput
+LATENCY_SAMPLES = 2048
+THROUGHPUT_WINDOW_SECONDS = 60
+
+# Form fields of the change initiative form that describe what to look for
+QUERY_FIELDS = ('change_initiative_name', 'industry', 'services_provided', 'department',
+                'targeted_business_goals', 'change_details')
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_field(value):
+    """Lowercase a form value and collapse its whitespace (lists are sorted)."""
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return ', '.join(sorted(normalize_field(item) for item in value if normalize_field(item)))
+    return WHITESPACE_PATTERN.sub(' ', str(value)).strip().lower()
+
+
+def build_query(form):
+    """
+    Build the search text and cache key for a request.
+
+    Args:
+        form (dict): Change initiative form fields, or {'query': text}
+
+    Returns:
+        tuple: (query text, normalized fields used as cache key)
+    """
+    if form.get('query'):
+        fields = (('query', normalize_field(form['query'])),)
+    else:
+        fields = tuple((name, normalize_field(form.get(name))) for name in QUERY_FIELDS)
+    text = ' '.join(value for _, value in fields if value)
+    return text, fields
+
+
+class LRUCache:
+    """Least-recently-used cache of a fixed number of entries."""
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """Return a cached value (None when missing) and mark it as recently used."""
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full."""
+        if self.max_size <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class EmbeddingBackend:
+    """Passages from the embedding index over the chunks table."""
+
+    name = 'embedding'
+
+    def __init__(self, db_path, index_dir):
+        from embedding_index import EmbeddingIndex
+
+        self.index = EmbeddingIndex(index_dir)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+
+    def search(self, queries, k):
+        """Search a batch of query texts; returns one passage list per query."""
+        from embedding_index import get_chunk_details
+
+        vectors = self.index.get_encoder().encode(queries)
+        # Fetch extra candidates, since at most MAX_PASSAGES_PER_ARTICLE per article are kept
+        chunk_ids, scores = self.index.search_vectors(vectors, k * 3)
+        details = get_chunk_details(self.conn, sorted({int(chunk_id) for chunk_id in chunk_ids.ravel() if chunk_id >= 0}))
+
+        results = []
+        for row_ids, row_scores in zip(chunk_ids, scores):
+            passages = []
+            per_article = {}
+            for chunk_id, score in zip(row_ids, row_scores):
+                chunk = details.get(int(chunk_id))
+                if chunk is None or per_article.get(chunk['article_id'], 0) >= MAX_PASSAGES_PER_ARTICLE:
+                    continue
+                per_article[chunk['article_id']] = per_article.get(chunk['article_id'], 0) + 1
+                passages.append({
+                    'article_id': chunk['article_id'],
+                    'title': chunk['title'],
+                    'url': chunk['url'],
+                    'heading': chunk['heading'],
+                    'text': chunk['content'],
+                    'score': float(score),
+                })
+                if len(passages) >= k:
+                    break
+            results.append(passages)
+        return results
+
+    def close(self):
+        self.conn.close()
+
+
+class FullTextBackend:
+    """Passages from the FTS5 full-text index (one snippet per article)."""
+
+    name = 'fts'
+
+    def __init__(self, db_path):
+        self.index = SearchIndex(db_path)
+        if not self.index.exists():
+            raise ValueError(f"No full-text index in {db_path}; run search_index.py build first")
+
+    def search(self, queries, k):
+        """Search a batch of query texts; returns one passage list per query."""
+        results = []
+        for query in queries:
+            hits = self.index.search(query, k=k, highlight=('', ''), snippet_tokens=64)
+            results.append([{
+                'article_id': hit['article_id'],
+                'title': hit['title'],
+                'url': hit['url'],
+                'heading': None,
+                'text': hit['snippet'],
+                'score': -hit['score'],
+            } for hit in hits])
+        return results
+
+    def close(self):
+        self.index.close()
+
+
+def open_backend(db_path, index_dir, backend='auto'):
+    """Open the embedding backend when its index exists (or is requested), else the full-text one."""
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database {db_path} not found")
+    if backend == 'embedding' or (backend == 'auto' and os.path.exists(os.path.join(index_dir, 'meta.json'))):
+        return EmbeddingBackend(db_path, index_dir)
+    return FullTextBackend(db_path)
+
+
+class ServiceStats:
+    """Request counters, batch sizes and latency percentiles of the service."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_queries = 0
+        self.largest_batch = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.search_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.recent = deque()
+
+    def record_request(self, milliseconds):
+        now = time.time()
+        self.requests += 1
+        self.latencies.append(milliseconds)
+        self.recent.append(now)
+        while self.recent and self.recent[0] < now - THROUGHPUT_WINDOW_SECONDS:
+            self.recent.popleft()
+
+    def record_batch(self, size, milliseconds):
+        self.batches += 1
+        self.batched_queries += size
+        self.largest_batch = max(self.largest_batch, size)
+        self.search_latencies.append(milliseconds)
+
+    def snapshot(self, cache_size):
+        """Return the statistics as a JSON-serializable dict."""
+        uptime = time.time() - self.started
+        latencies = list(self.latencies)
+        search_latencies = list(self.search_latencies)
+        return {
+            'uptime_seconds': round(uptime, 1),
+            'requests': self.requests,
+            'errors': self.errors,
+            'cache_hits': self.cache_hits,
+            'cache_hit_rate': round(self.cache_hits / self.requests, 3) if self.requests else 0.0,
+            'cache_entries': cache_size,
+            'coalesced': self.coalesced,
+            'batches': self.batches,
+            'avg_batch_size': round(self.batched_queries / self.batches, 2) if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+            'requests_per_second': round(self.requests / uptime, 2) if uptime > 0 else 0.0,
+            'recent_requests_per_second': round(len(self.recent) / min(uptime, THROUGHPUT_WINDOW_SECONDS), 2)
+            if uptime > 0 else 0.0,
+            'latency_ms': {name: round(percentile(latencies, fraction), 3) if latencies else None
+                           for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))},
+            'search_batch_ms': {name: round(percentile(search_latencies, fraction), 3) if search_latencies else None
+                                for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))},
+        }
+
+
+class RetrievalService:
+    """Micro-batching, caching front of a retrieval backend."""
+
+    def __init__(self, backend, cache_size=DEFAULT_CACHE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 batch_wait_ms=DEFAULT_BATCH_WAIT_MS, passage_chars=DEFAULT_PASSAGE_CHARS):
+        self.backend = backend
+        self.cache = LRUCache(cache_size)
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.passage_chars = passage_chars
+        self.stats = ServiceStats()
+        self._pending = {}
+        self._queue = None
+        self._worker = None
+        # SQLite and the index are used from a single thread, one batch at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='retrieval')
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run_batches())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+        self.backend.close()
+
+    async def retrieve(self, form, k=DEFAULT_K):
+        """
+        Return the passages for a request.
+
+        Returns:
+            tuple: (list of passages, whether they came from the cache)
+        """
+        start = time.perf_counter()
+        text, fields = build_query(form)
+        if not text:
+            raise ValueError("The request has no query text or form fields to search for")
+        key = (fields, k)
+
+        passages = self.cache.get(key)
+        cached = passages is not None
+        if cached:
+            self.stats.cache_hits += 1
+        elif key in self._pending:
+            # An identical request is already being searched
+            self.stats.coalesced += 1
+            passages = await asyncio.shield(self._pending[key])
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = future
+            try:
+                await self._queue.put((text, k, future))
+                passages = await asyncio.shield(future)
+                self.cache.put(key, passages)
+            finally:
+                self._pending.pop(key, None)
+
+        self.stats.record_request((time.perf_counter() - start) * 1000)
+        return passages, cached
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Queries asking for different k are searched with the largest one
+            k = max(item[1] for item in batch)
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self._executor, self.backend.search,
+                                                     [item[0] for item in batch], k)
+            except Exception as e:
+                self.stats.errors += len(batch)
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats.record_batch(len(batch), (time.perf_counter() - start) * 1000)
+
+            for (_, item_k, future), passages in zip(batch, results):
+                if not future.done():
+                    future.set_result([self._trim(passage) for passage in passages[:item_k]])
+
+    def _trim(self, passage):
+        text = passage['text'] or ''
+        if len(text) > self.passage_chars:
+            text = text[:self.passage_chars].rsplit(' ', 1)[0] + '...'
+        return dict(passage, text=text)
+
+
+async def handle_retrieve(request):
+    service = request.app['service']
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return web.json_response({'error': 'Request body must be JSON'}, status=400)
+    if not isinstance(body, dict):
+        return web.json_response({'error': 'Request body must be a JSON object'}, status=400)
+
+    form = body.get('formData') if isinstance(body.get('formData'), dict) else body
+    try:
+        k = max(1, min(MAX_K, int(body.get('k', DEFAULT_K))))
+    except (TypeError, ValueError):
+        return web.json_response({'error': 'k must be a number'}, status=400)
+
+    start = time.perf_counter()
+    try:
+        passages, cached = await service.retrieve(form, k)
+    except ValueError as e:
+        return web.json_response({'error': str(e)}, status=400)
+    except Exception as e:
+        print(f"Error retrieving passages: {str(e)}", file=sys.stderr, flush=True)
+        return web.json_response({'error': 'Retrieval failed', 'details': str(e)}, status=500)
+
+    return web.json_response({
+        'passages': passages,
+        'cached': cached,
+        'backend': service.backend.name,
+        'took_ms': round((time.perf_counter() - start) * 1000, 3),
+    })
+
+
+async def handle_stats(request):
+    service = request.app['service']
+    stats = service.stats.snapshot(len(service.cache))
+    stats['backend'] = service.backend.name
+    return web.json_response(stats)
+
+
+async def handle_health(request):
+    return web.json_response({'status': 'ok', 'backend': request.app['service'].backend.name})
+
+
+def create_app(service):
+    """Create the aiohttp application serving a RetrievalService."""
+    app = web.Application(client_max_size=1024 * 1024)
+    app['service'] = service
+    app.router.add_post('/retrieve', handle_retrieve)
+    app.router.add_get('/stats', handle_stats)
+    app.router.add_get('/health', handle_health)
+
+    async def on_startup(app):
+        await service.start()
+
+    async def on_cleanup(app):
+        await service.stop()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description='Serve relevant article passages over HTTP.')
+    parser.add_argument('-d', '--database', default='mckinsey_article_content.db',
+                        help='Path to the content database (default: mckinsey_article_content.db)')
+    parser.add_argument('-e', '--embedding-dir', default='embedding_index',
+                        help='Embedding index directory (default: embedding_index)')
+    parser.add_argument('--backend', choices=['auto', 'embedding', 'fts'], default='auto',
+                        help='Search backend (default: embedding index if it exists, else full-text)')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT,
+                        help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help=f'Cached requests (default: {DEFAULT_CACHE_SIZE}, 0 disables the cache)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Maximum queries searched together (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--batch-wait-ms', type=float, default=DEFAULT_BATCH_WAIT_MS,
+                        help=f'Time to wait for more queries before searching (default: {DEFAULT_BATCH_WAIT_MS})')
+    parser.add_argument('--passage-chars', type=int, default=DEFAULT_PASSAGE_CHARS,
+                        help=f'Maximum characters per returned passage (default: {DEFAULT_PASSAGE_CHARS})')
+
+    args = parser.parse_args()
+
+    try:
+        backend = open_backend(args.database, args.embedding_dir, args.backend)
+        service = RetrievalService(backend, cache_size=args.cache_size, batch_size=args.batch_size,
+                                   batch_wait_ms=args.batch_wait_ms, passage_chars=args.passage_chars)
+        print(f"Serving {backend.name} retrieval from {args.database} on http://{args.host}:{args.port}", flush=True)
+        web.run_app(create_app(service), host=args.host, port=args.port, print=None)
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
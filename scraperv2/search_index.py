@@ -0,0 +1,531 @@
+"""
+SQLite FTS5 full-text index over article content with BM25 search.
+
+The index is an external-content FTS5 table: it stores only the inverted
+index and reads titles and text from the content table itself. Triggers on
+the content table keep it in sync, so articles saved by article_parser (or
+by the azureml_upload scraper) are searchable as soon as they are committed.
+
+Writers that use INSERT OR REPLACE on the content table must enable
+PRAGMA recursive_triggers, otherwise the replaced row is not removed from
+the index.
+
+    python search_index.py build -d mckinsey_article_content.db
+    python search_index.py query -d mckinsey_article_content.db "supply chain resilience" -k 5
+    python search_index.py bench -d mckinsey_article_content.db
+"""
+
+import sqlite3
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from functools import lru_cache
+
+# Modules shared with azureml_upload live in the scraper_common package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from scraper_common.metadata_extraction import parse_date as _parse_date
+from published_dates import PUBLISHED_COLUMN, to_iso_date
+
+# Index layouts for the two content databases of the project
+SCHEMAS = {
+    # scraperv2: mckinsey_article_content.db, written by article_parser.py
+    'scraperv2': {
+        'index': 'article_search',
+        'table': 'article_content',
+        'rowid': 'article_id',
+        'columns': ('title', 'authors', 'content'),
+        'weights': (10.0, 3.0, 1.0),
+        'joins': '',
+        'fields': {
+            'article_id': 'c.article_id',
+            'title': 'c.title',
+            'authors': 'c.authors',
+            'date': 'c.date',
+            'url': 'c.url',
+        },
+        'date': 'c.date',
+        # Table and expression of the parsed publication date (see published_dates.py)
+        'published_on': ('article_content', 'c.published_on'),
+    },
+    # azureml_upload: mckinsey_data.db, ArticleContent.full_content
+    'azureml': {
+        'index': 'article_contents_search',
+        'table': 'article_contents',
+        'rowid': 'id',
+        'columns': ('title', 'authors', 'full_content'),
+        'weights': (10.0, 3.0, 1.0),
+        'joins': 'LEFT JOIN articles a ON a.id = c.article_id',
+        'fields': {
+            'article_id': 'c.article_id',
+            'title': 'c.title',
+            'authors': 'c.authors',
+            'date': 'a.date_published',
+            'url': 'c.url',
+        },
+        'date': 'a.date_published',
+        'published_on': ('articles', 'a.published_on'),
+    },
+}
+
+# unicode61 with diacritics folding, plus Porter stemming for English text
+TOKENIZER = 'porter unicode61 remove_diacritics 2'
+
+QUERY_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+DEFAULT_SNIPPET_TOKENS = 24
+
+
+@lru_cache(maxsize=65536)
+def parse_date(value):
+    """
+    Convert a scraped date ('July 15, 2020', '2020-07-15', ...) to ISO format.
+
+    Only used for databases without a published_on column.
+
+    Returns:
+        str: 'YYYY-MM-DD', or None if the value is not a recognizable date
+    """
+    return _parse_date(value)
+
+
+def build_match_query(text, mode='any'):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word is quoted, so user input can never be parsed as FTS5 syntax.
+
+    Args:
+        text (str): Search text
+        mode (str): 'any' to match any word (ranked by BM25), 'all' to require every word,
+            'phrase' to match the words as a phrase
+
+    Returns:
+        str: MATCH expression, or None if the text has no searchable words
+    """
+    terms = [f'"{term}"' for term in QUERY_TERM_PATTERN.findall(text)]
+    if not terms:
+        return None
+    if mode == 'phrase':
+        return '"' + ' '.join(term.strip('"') for term in terms) + '"'
+    if mode == 'all':
+        return ' AND '.join(terms)
+    if mode == 'any':
+        return ' OR '.join(terms)
+    raise ValueError(f"Unknown query mode: {mode}")
+
+
+def detect_schema(conn):
+    """Return the name of the schema matching the tables in a database."""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    for name, schema in SCHEMAS.items():
+        if schema['table'] in tables:
+            return name
+    raise ValueError(f"No article content table found in database. Available tables: {sorted(tables)}")
+
+
+class SearchIndex:
+    """Full-text index over one content database."""
+
+    def __init__(self, db_path, schema=None):
+        """
+        Open a content database for indexing and searching.
+
+        Args:
+            db_path (str): Path to the SQLite database
+            schema (str, optional): Key of SCHEMAS (default: detected from the tables)
+        """
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Database {db_path} not found")
+
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.create_function('published_date', 1, parse_date, deterministic=True)
+        self.schema_name = schema or detect_schema(self.conn)
+        self.schema = SCHEMAS[self.schema_name]
+        self.date_expression = self._get_date_expression()
+        self._search_sql = {}
+
+    def close(self):
+        self.conn.close()
+
+    def _get_date_expression(self):
+        """Return the SQL expression of the publication date used by the date filters."""
+        table, expression = self.schema['published_on']
+        raw_date = f"published_date({self.schema['date']})"
+        columns = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+        if PUBLISHED_COLUMN in columns:
+            # Rows stored before the column was backfilled have no published_on yet
+            return f"COALESCE({expression}, {raw_date})"
+        # Databases that were not migrated yet: parse the raw dates while filtering
+        return raw_date
+
+    def exists(self):
+        """Return True if the index table exists."""
+        row = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                                (self.schema['index'],)).fetchone()
+        return row is not None
+
+    def create(self, rebuild=True):
+        """
+        Create the index and its sync triggers, then index the existing rows.
+
+        The content rowid column gets a unique index unless it is the primary
+        key: FTS5 looks content rows up by it for every result, and duplicate
+        values would corrupt the index.
+
+        Args:
+            rebuild (bool): Rebuild the index from the content table
+
+        Returns:
+            int: Number of indexed rows
+        """
+        index, table, rowid = self.schema['index'], self.schema['table'], self.schema['rowid']
+        columns = ', '.join(self.schema['columns'])
+        new_values = ', '.join(f'new.{column}' for column in self.schema['columns'])
+        old_values = ', '.join(f'old.{column}' for column in self.schema['columns'])
+
+        start_time = time.time()
+        self._ensure_rowid_index()
+        with self.conn:
+            self.conn.executescript(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+                {columns},
+                content='{table}',
+                content_rowid='{rowid}',
+                tokenize='{TOKENIZER}'
+            );
+            CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {index}(rowid, {columns}) VALUES (new.{rowid}, {new_values});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {index}({index}, rowid, {columns}) VALUES ('delete', old.{rowid}, {old_values});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {rowid}, {columns} ON {table} BEGIN
+                INSERT INTO {index}({index}, rowid, {columns}) VALUES ('delete', old.{rowid}, {old_values});
+                INSERT INTO {index}(rowid, {columns}) VALUES (new.{rowid}, {new_values});
+            END;
+            ''')
+            if rebuild:
+                self.conn.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+        count = self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        print(f"Indexed {count} rows of {table} into {index} in {time.time() - start_time:.2f}s", flush=True)
+        return count
+
+    def _ensure_rowid_index(self):
+        table, rowid = self.schema['table'], self.schema['rowid']
+        primary_keys = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})") if row[5]]
+        if primary_keys == [rowid]:
+            return
+        duplicates = self.conn.execute(f'''
+            SELECT COUNT(*) FROM (SELECT {rowid} FROM {table} GROUP BY {rowid} HAVING COUNT(*) > 1)
+        ''').fetchone()[0]
+        if duplicates:
+            raise ValueError(f"{duplicates} {rowid} values occur more than once in {table}; "
+                             f"remove the duplicate rows before building the index")
+        with self.conn:
+            self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_{rowid} ON {table}({rowid})")
+
+    def drop(self):
+        """Remove the index and its triggers."""
+        index = self.schema['index']
+        with self.conn:
+            self.conn.executescript(f'''
+            DROP TRIGGER IF EXISTS {index}_ai;
+            DROP TRIGGER IF EXISTS {index}_ad;
+            DROP TRIGGER IF EXISTS {index}_au;
+            DROP TABLE IF EXISTS {index};
+            ''')
+
+    def optimize(self):
+        """Merge the index b-trees into one, which makes queries faster after many updates."""
+        index = self.schema['index']
+        with self.conn:
+            self.conn.execute(f"INSERT INTO {index}({index}) VALUES ('optimize')")
+
+    def check(self):
+        """Return True if the index matches the content table."""
+        index = self.schema['index']
+        try:
+            self.conn.execute(f"INSERT INTO {index}({index}, rank) VALUES ('integrity-check', 1)")
+            return True
+        except sqlite3.DatabaseError:
+            return False
+
+    def _get_search_sql(self, filter_keys):
+        """
+        Build (and cache) the ranking statement for a set of filters.
+
+        Ranking only reads BM25 scores; snippets are built afterwards for the
+        top k rows, since snippet() is far more expensive than bm25() and
+        would otherwise run for every matching article.
+        """
+        sql = self._search_sql.get(filter_keys)
+        if sql is not None:
+            return sql
+
+        schema = self.schema
+        index = schema['index']
+        weights = ', '.join(str(weight) for weight in schema['weights'])
+
+        joins = ''
+        conditions = [f'{index} MATCH :query']
+        if filter_keys:
+            joins = f"JOIN {schema['table']} c ON c.{schema['rowid']} = {index}.rowid {schema['joins']}"
+        if 'date_from' in filter_keys:
+            conditions.append(f"{self.date_expression} >= :date_from")
+        if 'date_to' in filter_keys:
+            conditions.append(f"{self.date_expression} <= :date_to")
+        if 'author' in filter_keys:
+            conditions.append(f"{schema['fields']['authors']} LIKE '%' || :author || '%'")
+
+        sql = f'''
+        SELECT {index}.rowid, bm25({index}, {weights}) AS score
+        FROM {index}
+        {joins}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY score
+        LIMIT :k
+        '''
+        self._search_sql[filter_keys] = sql
+        return sql
+
+    def _get_details_sql(self, count):
+        """Build the statement returning fields and snippets of the ranked rows."""
+        schema = self.schema
+        index = schema['index']
+        content_column = len(schema['columns']) - 1
+        fields = ', '.join(f'{expression} AS {name}' for name, expression in schema['fields'].items())
+        placeholders = ', '.join(['?'] * count)
+        return f'''
+        SELECT {index}.rowid, {fields},
+               snippet({index}, {content_column}, ?, ?, '...', ?) AS snippet
+        FROM {index}
+        JOIN {schema['table']} c ON c.{schema['rowid']} = {index}.rowid
+        {schema['joins']}
+        WHERE {index} MATCH ? AND {index}.rowid IN ({placeholders})
+        '''
+
+    def search(self, query, k=10, filters=None, mode='any', raw=False, highlight=('[', ']'),
+               snippet_tokens=DEFAULT_SNIPPET_TOKENS):
+        """
+        Search the index.
+
+        Args:
+            query (str): Search text
+            k (int): Maximum number of results
+            filters (dict, optional): 'date_from' / 'date_to' (inclusive, dates or date strings)
+                and 'author' (substring of the authors field)
+            mode (str): How words are combined, see build_match_query()
+            raw (bool): Pass the query to FTS5 unchanged (FTS5 query syntax)
+            highlight (tuple): Markers placed around matched terms in snippets
+            snippet_tokens (int): Maximum snippet length in tokens
+
+        Returns:
+            list: Results as dicts with article_id, title, authors, date, url, score and snippet,
+                best match first (lower BM25 scores are better)
+        """
+        match = query if raw else build_match_query(query, mode)
+        if not match:
+            return []
+
+        filters = {key: value for key, value in (filters or {}).items() if value not in (None, '')}
+        unknown = set(filters) - {'date_from', 'date_to', 'author'}
+        if unknown:
+            raise ValueError(f"Unknown search filters: {sorted(unknown)}")
+
+        params = {'query': match, 'k': k}
+        for key in ('date_from', 'date_to'):
+            if key in filters:
+                params[key] = to_iso_date(filters[key])
+        if 'author' in filters:
+            params['author'] = filters['author']
+
+        ranked = self.conn.execute(self._get_search_sql(tuple(sorted(filters))), params).fetchall()
+        if not ranked:
+            return []
+
+        cursor = self.conn.execute(self._get_details_sql(len(ranked)),
+                                   [highlight[0], highlight[1], snippet_tokens, match] + [row[0] for row in ranked])
+        names = [column[0] for column in cursor.description][1:]
+        details = {row[0]: dict(zip(names, row[1:])) for row in cursor.fetchall()}
+
+        results = []
+        for rowid, score in ranked:
+            result = details[rowid]
+            result['score'] = score
+            results.append(result)
+        return results
+
+
+def search(db_path, query, k=10, filters=None, mode='any'):
+    """Search a content database once (opens and closes the index)."""
+    index = SearchIndex(db_path)
+    try:
+        return index.search(query, k=k, filters=filters, mode=mode)
+    finally:
+        index.close()
+
+
+def sample_queries(index, count, seed=0):
+    """Build benchmark queries from two or three words of random article titles."""
+    titles = [row[0] for row in index.conn.execute(f"SELECT title FROM {index.schema['table']} WHERE title IS NOT NULL")]
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = [word for word in QUERY_TERM_PATTERN.findall(rng.choice(titles)) if len(word) > 3] if titles else []
+        if words:
+            queries.append(' '.join(rng.sample(words, min(len(words), rng.randint(2, 3)))))
+    return queries
+
+
+def percentile(values, fraction):
+    """Return the given percentile of a list of numbers."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def benchmark(db_path, queries=None, count=200, k=10, filters=None, compare_like=True):
+    """
+    Measure search latency, optionally against a LIKE scan of the content column.
+
+    Args:
+        db_path (str): Path to the content database
+        queries (list, optional): Queries to run (default: sampled from article titles)
+        count (int): Number of sampled queries
+        k (int): Results per query
+        filters (dict, optional): Filters applied to every query
+        compare_like (bool): Also time a LIKE scan for the first word of each query
+
+    Returns:
+        dict: Latency percentiles in milliseconds
+    """
+    index = SearchIndex(db_path)
+    try:
+        if not index.exists():
+            index.create()
+        queries = queries or sample_queries(index, count)
+        if not queries:
+            raise ValueError("No queries to benchmark")
+
+        # Warm up the page cache and the statement cache
+        for query in queries[:10]:
+            index.search(query, k=k, filters=filters)
+
+        timings = []
+        hits = 0
+        for query in queries:
+            start = time.perf_counter()
+            hits += len(index.search(query, k=k, filters=filters))
+            timings.append((time.perf_counter() - start) * 1000)
+
+        results = {
+            'queries': len(queries),
+            'p50_ms': percentile(timings, 0.50),
+            'p95_ms': percentile(timings, 0.95),
+            'p99_ms': percentile(timings, 0.99),
+            'max_ms': max(timings),
+            'avg_hits': hits / len(queries),
+        }
+        print(f"FTS5 search over {index.schema['table']} ({len(queries)} queries, k={k}): "
+              f"p50 {results['p50_ms']:.2f} ms, p95 {results['p95_ms']:.2f} ms, "
+              f"p99 {results['p99_ms']:.2f} ms, {results['avg_hits']:.1f} hits/query", flush=True)
+
+        if compare_like:
+            content_column = index.schema['columns'][-1]
+            like_sql = (f"SELECT {index.schema['rowid']} FROM {index.schema['table']} "
+                        f"WHERE {content_column} LIKE ?")
+            like_timings = []
+            for query in queries[:50]:
+                term = QUERY_TERM_PATTERN.findall(query)[0]
+                start = time.perf_counter()
+                index.conn.execute(like_sql, (f'%{term}%',)).fetchall()
+                like_timings.append((time.perf_counter() - start) * 1000)
+            results['like_p50_ms'] = percentile(like_timings, 0.50)
+            results['like_p95_ms'] = percentile(like_timings, 0.95)
+            print(f"LIKE scan baseline ({len(like_timings)} queries): p50 {results['like_p50_ms']:.2f} ms, "
+                  f"p95 {results['like_p95_ms']:.2f} ms", flush=True)
+
+        return results
+    finally:
+        index.close()
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description='Full-text search index over article content.')
+    subparsers = parser.add_subparsers(dest='command', help='Command to run')
+
+    def add_database_argument(command_parser):
+        command_parser.add_argument('-d', '--database', default='mckinsey_article_content.db',
+                                    help='Path to the content database (default: mckinsey_article_content.db)')
+        command_parser.add_argument('--schema', choices=sorted(SCHEMAS), default=None,
+                                    help='Database layout (default: detected from the tables)')
+
+    build_parser = subparsers.add_parser('build', help='Create the index and sync triggers and index all rows')
+    add_database_argument(build_parser)
+    build_parser.add_argument('--optimize', action='store_true', help='Merge the index after building')
+
+    query_parser = subparsers.add_parser('query', help='Search the index')
+    add_database_argument(query_parser)
+    query_parser.add_argument('text', help='Search text')
+    query_parser.add_argument('-k', type=int, default=10, help='Number of results (default: 10)')
+    query_parser.add_argument('--mode', choices=['any', 'all', 'phrase'], default='any',
+                              help='How words are combined (default: any)')
+    query_parser.add_argument('--from', dest='date_from', default=None, help='Earliest publication date (YYYY-MM-DD)')
+    query_parser.add_argument('--to', dest='date_to', default=None, help='Latest publication date (YYYY-MM-DD)')
+    query_parser.add_argument('--author', default=None, help='Only articles by this author')
+
+    bench_parser = subparsers.add_parser('bench', help='Measure search latency')
+    add_database_argument(bench_parser)
+    bench_parser.add_argument('-n', '--queries', type=int, default=200, help='Number of sampled queries (default: 200)')
+    bench_parser.add_argument('-k', type=int, default=10, help='Results per query (default: 10)')
+
+    drop_parser = subparsers.add_parser('drop', help='Remove the index and its triggers')
+    add_database_argument(drop_parser)
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+        return
+
+    try:
+        if args.command == 'bench':
+            benchmark(args.database, count=args.queries, k=args.k)
+            return
+
+        index = SearchIndex(args.database, args.schema)
+        try:
+            if args.command == 'build':
+                index.create()
+                if args.optimize:
+                    index.optimize()
+            elif args.command == 'drop':
+                index.drop()
+                print(f"Dropped {index.schema['index']}", flush=True)
+            elif args.command == 'query':
+                if not index.exists():
+                    raise ValueError("The search index does not exist; run the build command first")
+                filters = {'date_from': args.date_from, 'date_to': args.date_to, 'author': args.author}
+                results = index.search(args.text, k=args.k, filters=filters, mode=args.mode)
+                for rank, result in enumerate(results, 1):
+                    print(f"{rank}. {result['title']} ({result['date']}) score {result['score']:.2f}")
+                    print(f"   {result['url']}")
+                    print(f"   {result['snippet']}")
+                if not results:
+                    print("No results", flush=True)
+        finally:
+            index.close()
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()